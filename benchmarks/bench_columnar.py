@@ -0,0 +1,57 @@
+"""
+Benchmark of the memory held by normalized tables: lists of row dictionaries against
+columnar.ColumnarTable, for the bundled branch files repeated --scale times.
+
+Usage (from the repository root):
+    python benchmarks/bench_columnar.py --scale 50
+"""
+import argparse
+import contextlib
+import glob
+import io
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+import etl  # noqa: E402
+
+DATA_GLOB = os.path.join(os.path.dirname(__file__), "..", "data", "*_??-??-????_*.csv")
+
+
+def load_rows(scale):
+    lines = []
+    for file_path in sorted(glob.glob(DATA_GLOB)):
+        with open(file_path, newline="", encoding="utf-8") as csvfile:
+            lines.extend(csvfile.readlines()[1:])
+    with contextlib.redirect_stdout(io.StringIO()):
+        return etl.transform(etl.extract(["header\n"] + lines * scale))
+
+
+def measure(rows, columnar_tables):
+    """
+    :return: Tuple of (bytes still allocated by the tables, seconds to normalize).
+    """
+    tracemalloc.start()
+    start = time.perf_counter()
+    tables = etl.normalize(rows, columnar_tables=columnar_tables)
+    elapsed = time.perf_counter() - start
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del tables
+    return size, elapsed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scale", type=int, default=50, help="times to repeat the bundled data files")
+    args = parser.parse_args()
+
+    rows = load_rows(args.scale)
+    print(f"transactions={len(rows)}")
+    results = {name: measure(rows, columnar_tables) for name, columnar_tables in [("dicts", False), ("columnar", True)]}
+    for name, (size, elapsed) in results.items():
+        print(f"{name:10} resident_mb={size / 1e6:.1f} seconds={elapsed:.3f}")
+    print(f"reduction={results['dicts'][0] / results['columnar'][0]:.1f}x")
@@ -0,0 +1,64 @@
+"""
+Cold-start benchmark: import time of the Lambda handler module, measured with
+python -X importtime in fresh interpreters, checked against import_time_budget.json.
+Also fails if any module the handler should only load on first use (boto3, psycopg2,
+pandas, ...) is imported eagerly.
+
+Usage (from the repository root):
+    python benchmarks/bench_import_time.py --runs 5
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src")
+BUDGET_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "import_time_budget.json")
+
+
+def measure_import(module, forbidden_modules):
+    """
+    Imports module in a fresh interpreter.
+    :return: Tuple of (cumulative import time in ms, forbidden modules that were loaded).
+    """
+    check = f"import sys, {module}; print(','.join(m for m in {forbidden_modules!r} if m in sys.modules))"
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", check],
+        cwd=SRC_DIR, capture_output=True, text=True, check=True,
+    )
+    # Lines look like "import time:   self [us] | cumulative | imported package"
+    cumulative_us = None
+    for line in result.stderr.splitlines():
+        fields = [field.strip() for field in line.split("|")]
+        if len(fields) == 3 and fields[2] == module:
+            cumulative_us = int(fields[1])
+    loaded = [name for name in result.stdout.strip().split(",") if name]
+    return cumulative_us / 1000, loaded
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5, help="fresh interpreters to start; the fastest run counts")
+    args = parser.parse_args()
+
+    with open(BUDGET_PATH) as file:
+        budget = json.load(file)
+
+    timings = []
+    loaded = []
+    for _ in range(args.runs):
+        import_ms, loaded = measure_import(budget["module"], budget["forbidden_modules"])
+        timings.append(import_ms)
+    best_ms = min(timings)
+
+    print(f"module={budget['module']} best_ms={best_ms:.1f} "
+          f"runs_ms={[round(timing, 1) for timing in timings]} budget_ms={budget['max_import_ms']}")
+    failed = False
+    if best_ms > budget["max_import_ms"]:
+        print(f"FAIL: import took {best_ms:.1f} ms, over the {budget['max_import_ms']} ms budget")
+        failed = True
+    if loaded:
+        print(f"FAIL: imported eagerly: {', '.join(loaded)}")
+        failed = True
+    sys.exit(1 if failed else 0)
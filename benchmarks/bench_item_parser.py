@@ -0,0 +1,91 @@
+"""
+Benchmark of basket item parsing: the original two-regex parse_items against item_parser,
+both as JSON-ready dicts (parse_items) and as interned Product records (parse_products).
+
+Usage (from the repository root):
+    python benchmarks/bench_item_parser.py --scale 50
+"""
+import argparse
+import contextlib
+import csv
+import glob
+import io
+import os
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+import item_parser  # noqa: E402
+
+DATA_GLOB = os.path.join(os.path.dirname(__file__), "..", "data", "*_??-??-????_*.csv")
+
+
+# The implementation item_parser replaced, kept here as the baseline
+def legacy_parse_items(items_column):
+    parsed_items = []
+    try:
+        items = items_column.split(',')
+        regex_with_variant = r"^(?P<size>\w+)\s+(?P<item_name>[a-zA-Z\s]+)\s+-\s+(?P<variant>[a-zA-Z\s]+)\s+-\s+(?P<price>[0-9.]+)$"
+        regex_without_variant = r"^(?P<size>\w+)\s+(?P<item_name>[a-zA-Z\s]+)\s+-\s+(?P<price>[0-9.]+)$"
+        for item in items:
+            item = item.strip()
+            match = re.match(regex_with_variant, item)
+            if match:
+                parsed_items.append({
+                    "item_name": match.group("item_name").strip(),
+                    "variant": match.group("variant").strip(),
+                    "size": match.group("size").strip(),
+                    "price": float(match.group("price").strip())
+                })
+                continue
+            match = re.match(regex_without_variant, item)
+            if match:
+                parsed_items.append({
+                    "item_name": match.group("item_name").strip(),
+                    "variant": None,
+                    "size": match.group("size").strip(),
+                    "price": float(match.group("price").strip())
+                })
+                continue
+            else:
+                print(f"Item format not matched: {item}")
+        return parsed_items
+    except Exception as e:
+        print(f"Error parsing items: {e}")
+    return parsed_items
+
+
+def load_items_columns(scale):
+    columns = []
+    for file_path in sorted(glob.glob(DATA_GLOB)):
+        with open(file_path, newline="", encoding="utf-8") as csvfile:
+            columns.extend(row[3] for row in csv.reader(csvfile))
+    return columns * scale
+
+
+def run(parse, columns):
+    item_count = 0
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        for column in columns:
+            item_count += len(parse(column))
+    elapsed = time.perf_counter() - start
+    return item_count, elapsed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scale", type=int, default=50, help="times to repeat the bundled data files")
+    args = parser.parse_args()
+
+    columns = load_items_columns(args.scale)
+    print(f"rows={len(columns)}")
+    for name, parse in [
+        ("legacy", legacy_parse_items),
+        ("parse_items", item_parser.parse_items),
+        ("parse_products", item_parser.parse_products),
+    ]:
+        items, elapsed = run(parse, columns)
+        print(f"{name:15} items={items} seconds={elapsed:.3f} items_per_sec={items / elapsed:,.0f}")
@@ -0,0 +1,79 @@
+"""
+Rows/sec benchmark of the sql_utils load strategies against the local Postgres container
+(src/docker-compose.yml, credentials from .env as used by load_data.py).
+
+Usage (from the repository root, with the container running):
+    python benchmarks/bench_load.py --rows 50000
+"""
+import argparse
+import functools
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from load_data import connect_to_database  # noqa: E402
+from utils import sql_utils  # noqa: E402
+
+TABLE_NAME = "bench_transactions"
+COLUMNS = ["branch_id", "timestamp", "total_amount", "payment_method"]
+
+
+def make_rows(row_count):
+    random.seed(0)
+    return [
+        (random.randint(1, 10), f"2024-04-21 {9 + i % 8:02d}:{i % 60:02d}:00",
+         round(random.uniform(1, 20), 2), random.choice(["CASH", "CARD"]))
+        for i in range(row_count)
+    ]
+
+
+# The per-row path save_data_in_db used before batching, kept as the baseline
+def executemany_rows(cursor, table_name, columns, rows):
+    placeholders = ", ".join(["%s"] * len(columns))
+    cursor.executemany(f"INSERT INTO {table_name} ({', '.join(columns)}) VALUES ({placeholders})", rows)
+    return len(rows)
+
+
+def run(connection, loader, rows):
+    with connection.cursor() as cursor:
+        cursor.execute(f"TRUNCATE {TABLE_NAME}")
+        connection.commit()
+        start = time.perf_counter()
+        round_trips = loader(cursor, TABLE_NAME, COLUMNS, rows)
+        connection.commit()
+        return time.perf_counter() - start, round_trips
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=50000)
+    parser.add_argument("--page-sizes", type=int, nargs="+", default=[100, 500, 1000],
+                        help="INSERT page sizes to compare")
+    args = parser.parse_args()
+
+    connection = connect_to_database()
+    if not connection:
+        sys.exit("Database connection failed.")
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"CREATE TEMP TABLE {TABLE_NAME} (branch_id INT, timestamp TIMESTAMP, "
+            "total_amount NUMERIC(10, 2), payment_method VARCHAR(50))"
+        )
+    connection.commit()
+
+    rows = make_rows(args.rows)
+    loaders = [("executemany", executemany_rows)]
+    for page_size in args.page_sizes:
+        loaders.append((f"insert/{page_size}", functools.partial(sql_utils.insert_rows, page_size=page_size)))
+    loaders.append(("copy", sql_utils.copy_rows_from_stdin))
+
+    for name, loader in loaders:
+        elapsed, round_trips = run(connection, loader, rows)
+        print(f"{name:12} rows={len(rows)} round_trips={round_trips} seconds={elapsed:.3f} "
+              f"rows_per_sec={len(rows) / elapsed:,.0f}")
+
+    connection.close()
@@ -0,0 +1,120 @@
+"""
+Loads the same synthetic branch files into the local Postgres container (src/docker-compose.yml,
+credentials from .env as used by load_data.py) through utils/load_utils, one load per file as
+the Lambda does, two ways, each into a fresh scratch schema:
+
+  cold_cache  the dimension cache is emptied before every file, as in a new Lambda container,
+              so every load stages and merges its branches and products
+  warm_cache  the cache is kept between files, so loads whose branches and products are
+              all known only record their ids
+
+and reports seconds and statements sent (round trips) for each.
+
+Usage (from the repository root, with the container running):
+    python benchmarks/bench_load_batches.py --rows 2000 --days 10
+"""
+import argparse
+import contextlib
+from datetime import datetime, timedelta
+import io
+import os
+import sys
+import tempfile
+import time
+from unittest.mock import patch
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCH_DIR, "..", "src"))
+
+import etl  # noqa: E402
+from generate_branch_files import write_branch_files  # noqa: E402
+from load_data import connect_to_database  # noqa: E402
+from utils import dimension_utils, load_utils, sql_utils  # noqa: E402
+
+SCHEMA_FILE = os.path.join(BENCH_DIR, "..", "database", "create_schema.sql")
+
+
+def transform_files(work_dir, rows, branches, days):
+    """
+    :return: List of the transformed rows of every file, one list per file.
+    """
+    files = []
+    with contextlib.redirect_stdout(io.StringIO()):
+        for day in range(days):
+            date = datetime(2024, 4, 21) + timedelta(days=day)
+            for file_path in write_branch_files(work_dir, rows=rows, branches=branches, seed=day, date=date):
+                with open(file_path, newline="", encoding="utf-8") as csvfile:
+                    files.append(etl.transform(etl.extract(csvfile)))
+    return files
+
+
+class CountingCursor:
+    """
+    Counts the statements and COPYs a cursor sends, i.e. its round trips.
+    """
+
+    def __init__(self, cursor):
+        self.cursor = cursor
+        self.round_trips = 0
+
+    def execute(self, *args):
+        self.round_trips += 1
+        return self.cursor.execute(*args)
+
+    def copy_expert(self, *args):
+        self.round_trips += 1
+        return self.cursor.copy_expert(*args)
+
+    def __getattr__(self, name):
+        return getattr(self.cursor, name)
+
+
+def run(connection, files, batch_size, warm_cache):
+    cursor = connection.cursor()
+    cursor.execute("DROP SCHEMA IF EXISTS bench_load CASCADE; CREATE SCHEMA bench_load; SET search_path TO bench_load;")
+    with open(SCHEMA_FILE) as file:
+        cursor.execute(file.read())
+    connection.commit()
+
+    sql_utils._partitions_ready.clear()
+    dimension_utils.forget_keys()
+    counting_cursor = CountingCursor(cursor)
+    with patch.object(dimension_utils, "_snapshot_loaded", True):
+        start = time.perf_counter()
+        for rows in files:
+            if not warm_cache:
+                dimension_utils.forget_keys()
+            load_utils.begin_load(counting_cursor)
+            for tables in etl.iter_normalize(rows, batch_size):
+                load_utils.load_batch(connection, counting_cursor, tables)
+            load_utils.commit_load(connection, counting_cursor)
+        seconds = time.perf_counter() - start
+
+    cursor.execute("SELECT COUNT(*) FROM transactions")
+    transactions = cursor.fetchone()[0]
+    cursor.execute("DROP SCHEMA bench_load CASCADE;")
+    connection.commit()
+    return seconds, counting_cursor.round_trips, transactions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=2000, help="transactions per day, across all branches")
+    parser.add_argument("--branches", type=int, default=5)
+    parser.add_argument("--days", type=int, default=10)
+    parser.add_argument("--batch-size", type=int, default=etl.DEFAULT_BATCH_SIZE)
+    args = parser.parse_args()
+
+    connection = connect_to_database()
+    if not connection:
+        sys.exit("Database connection failed.")
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        files = transform_files(work_dir, args.rows, args.branches, args.days)
+
+    for name, warm_cache in (("cold_cache", False), ("warm_cache", True)):
+        seconds, round_trips, transactions = run(connection, files, args.batch_size, warm_cache)
+        print(f"{name:10} files={len(files)} transactions={transactions} seconds={seconds:.3f} "
+              f"round_trips={round_trips} rows_per_sec={transactions / seconds:,.0f}")
+
+    connection.close()
@@ -0,0 +1,108 @@
+"""
+Size and speed of the normalized-table outputs: JSON (normalise_data.save_data_to_json),
+CSV (save_data_to_csv) and partitioned Parquet (utils.parquet_utils), on synthetic branch
+files. Reading back is timed as each format is normally consumed: json.load, csv.reader and
+a pyarrow dataset scan.
+
+Usage (from the repository root):
+    python benchmarks/bench_parquet.py --rows 100000
+    python benchmarks/bench_parquet.py --rows 100000 --compression zstd --columnar
+"""
+import argparse
+import contextlib
+import csv
+import io
+import json
+import os
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCH_DIR, "..", "src"))
+
+import etl  # noqa: E402
+import normalise_data  # noqa: E402
+from generate_branch_files import write_branch_files  # noqa: E402
+from utils import parquet_utils  # noqa: E402
+
+# Imported up front so the first Parquet write is not charged for loading pyarrow
+import pyarrow.dataset  # noqa: E402,F401
+import pyarrow.parquet  # noqa: E402,F401
+
+
+def normalize_files(file_paths, columnar_tables):
+    rows = []
+    with contextlib.redirect_stdout(io.StringIO()):
+        for file_path in file_paths:
+            with open(file_path, newline="", encoding="utf-8") as csvfile:
+                rows.extend(etl.transform(etl.extract(csvfile)))
+    return etl.normalize(rows, columnar_tables=columnar_tables)
+
+
+def folder_size(path):
+    return sum(os.path.getsize(os.path.join(root, name)) for root, _, names in os.walk(path) for name in names)
+
+
+def write_rowwise(tables, out_dir, save, extension):
+    os.makedirs(out_dir)
+    with contextlib.redirect_stdout(io.StringIO()):
+        for table_name, data in tables.items():
+            save(data, os.path.join(out_dir, f"{table_name}.{extension}"))
+
+
+def read_json(out_dir):
+    for file_name in os.listdir(out_dir):
+        with open(os.path.join(out_dir, file_name)) as file:
+            json.load(file)
+
+
+def read_csv(out_dir):
+    for file_name in os.listdir(out_dir):
+        with open(os.path.join(out_dir, file_name), newline="") as file:
+            for _ in csv.reader(file):
+                pass
+
+
+def read_parquet(out_dir):
+    for table_name in os.listdir(out_dir):
+        parquet_utils.read_table(out_dir, table_name)
+
+
+def timed(func, *args):
+    start = time.perf_counter()
+    func(*args)
+    return time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=100000, help="transactions across all branches")
+    parser.add_argument("--branches", type=int, default=10)
+    parser.add_argument("--compression", default=parquet_utils.DEFAULT_COMPRESSION)
+    parser.add_argument("--columnar", action="store_true", help="normalize into columnar.ColumnarTable tables")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        file_paths = write_branch_files(os.path.join(work_dir, "input"), rows=args.rows, branches=args.branches)
+        tables = normalize_files(file_paths, args.columnar)
+        print(f"transactions={len(tables['transactions'])} product_transactions={len(tables['product_transactions'])} "
+              f"input_mb={folder_size(os.path.join(work_dir, 'input')) / 1e6:.1f}")
+
+        formats = [
+            ("json", lambda path: write_rowwise(tables, path, normalise_data.save_data_to_json, "json"), read_json),
+            ("csv", lambda path: write_rowwise(tables, path, normalise_data.save_data_to_csv, "csv"), read_csv),
+            ("parquet", lambda path: parquet_utils.write_tables(tables, path, compression=args.compression),
+             read_parquet),
+        ]
+        results = {}
+        for name, write, read in formats:
+            out_dir = os.path.join(work_dir, name)
+            write_seconds = timed(write, out_dir)
+            read_seconds = timed(read, out_dir)
+            results[name] = folder_size(out_dir)
+            print(f"{name:8} size_mb={results[name] / 1e6:7.2f} write_seconds={write_seconds:.3f} "
+                  f"read_seconds={read_seconds:.3f}")
+
+    print(f"parquet is {results['json'] / results['parquet']:.0f}x smaller than json, "
+          f"{results['csv'] / results['parquet']:.0f}x smaller than csv")
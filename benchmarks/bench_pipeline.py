@@ -0,0 +1,187 @@
+"""
+End-to-end benchmark of extract -> transform -> normalize (and optionally the loaders,
+against the local Postgres container) on synthetic branch files at several sizes.
+
+Every size runs in a fresh interpreter so its peak RSS is its own. Results go to a JSON
+file named after the current commit, and --compare prints the change against an older one.
+
+Usage (from the repository root):
+    python benchmarks/bench_pipeline.py                          # 10k, 100k and 1M rows
+    python benchmarks/bench_pipeline.py --rows 10000 --engine python pandas
+    python benchmarks/bench_pipeline.py --load                   # also load into local Postgres
+    python benchmarks/bench_pipeline.py --compare benchmarks/results/pipeline_abc1234.json
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCH_DIR, "..", "src"))
+
+import etl  # noqa: E402
+from generate_branch_files import write_branch_files  # noqa: E402
+
+RESULTS_DIR = os.path.join(BENCH_DIR, "results")
+DEFAULT_SIZES = [10000, 100000, 1000000]
+
+
+def timed(stages, name, rows, func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    elapsed = time.perf_counter() - start
+    stage = stages.setdefault(name, {"seconds": 0.0, "rows": 0})
+    stage["seconds"] += elapsed
+    stage["rows"] += rows(result) if rows else 0
+    return result
+
+
+def run_python_engine(file_path, stages):
+    with open(file_path, newline="", encoding="utf-8") as csvfile:
+        data = timed(stages, "extract", len, etl.extract, csvfile)
+    data = timed(stages, "transform", len, etl.transform, data)
+    return timed(stages, "normalize", lambda tables: len(tables["transactions"]), etl.normalize, data)
+
+
+def run_pandas_engine(file_path, stages):
+    import pandas_engine
+    with open(file_path, newline="", encoding="utf-8") as csvfile:
+        return timed(stages, "pandas", lambda tables: len(tables["transactions"]), pandas_engine.normalize_file, csvfile)
+
+
+def load_tables(connection, tables, stages):
+    from utils import load_utils
+    cursor = connection.cursor()
+    start = time.perf_counter()
+    # One file per load, as the Lambda does it
+    load_utils.begin_load(cursor)
+    load_utils.load_batch(connection, cursor, tables)
+    load_utils.commit_load(connection, cursor)
+    stage = stages.setdefault("load", {"seconds": 0.0, "rows": 0})
+    stage["seconds"] += time.perf_counter() - start
+    stage["rows"] += len(tables["transactions"])
+
+
+def run_size(rows, engine, branches, load):
+    """
+    Generates rows transactions and runs them through the pipeline, in this process.
+    :return: Result dictionary for the results file.
+    """
+    stages = {}
+    connection = None
+    if load:
+        from load_data import connect_to_database
+        from utils import sql_utils
+        connection = connect_to_database()
+        if not connection:
+            sys.exit("Database connection failed.")
+        sql_utils.ensure_db_schema(connection, connection.cursor())
+
+    if engine == "pandas":
+        # Import outside the timed region; the Lambda pays this once per container
+        import pandas_engine  # noqa: F401
+
+    with tempfile.TemporaryDirectory() as out_dir:
+        file_paths = write_branch_files(out_dir, rows=rows, branches=branches, malformed_rate=0.001)
+        input_bytes = sum(os.path.getsize(file_path) for file_path in file_paths)
+        start = time.perf_counter()
+        # Keep the parser's per-item messages for malformed rows out of the results
+        with contextlib.redirect_stdout(io.StringIO()):
+            for file_path in file_paths:
+                run = run_pandas_engine if engine == "pandas" else run_python_engine
+                tables = run(file_path, stages)
+                if connection:
+                    load_tables(connection, tables, stages)
+        elapsed = time.perf_counter() - start
+
+    if connection:
+        connection.close()
+    for stage in stages.values():
+        stage["rows_per_sec"] = round(stage["rows"] / stage["seconds"]) if stage["seconds"] else None
+        stage["seconds"] = round(stage["seconds"], 4)
+    return {
+        "rows": rows,
+        "engine": engine,
+        "files": len(file_paths),
+        "input_bytes": input_bytes,
+        "seconds": round(elapsed, 4),
+        "rows_per_sec": round(rows / elapsed),
+        # ru_maxrss is in kilobytes on Linux
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        "stages": stages,
+    }
+
+
+def run_in_subprocess(rows, engine, branches, load):
+    command = [sys.executable, __file__, "--single", str(rows), "--engine", engine, "--branches", str(branches)]
+    if load:
+        command.append("--load")
+    result = subprocess.run(command, capture_output=True, text=True, check=True)
+    return json.loads(result.stdout)
+
+
+def current_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BENCH_DIR,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def compare(results, baseline_path):
+    with open(baseline_path) as file:
+        baseline = {(result["rows"], result["engine"]): result for result in json.load(file)["results"]}
+    for result in results:
+        old = baseline.get((result["rows"], result["engine"]))
+        if old:
+            change = (result["rows_per_sec"] / old["rows_per_sec"] - 1) * 100
+            print(f"rows={result['rows']} engine={result['engine']} rows_per_sec {old['rows_per_sec']:,} -> "
+                  f"{result['rows_per_sec']:,} ({change:+.1f}%) peak_rss_mb {old['peak_rss_mb']} -> "
+                  f"{result['peak_rss_mb']}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, nargs="+", default=DEFAULT_SIZES, help="transaction counts to run")
+    parser.add_argument("--engine", nargs="+", choices=["python", "pandas"], default=["python"])
+    parser.add_argument("--branches", type=int, default=10, help="branch files the rows are split across")
+    parser.add_argument("--load", action="store_true", help="also load into the local Postgres from .env")
+    parser.add_argument("--output", help="results file (default: benchmarks/results/pipeline_<commit>.json)")
+    parser.add_argument("--compare", help="earlier results file to compare against")
+    parser.add_argument("--single", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.single:
+        print(json.dumps(run_size(args.single, args.engine[0], args.branches, args.load)))
+        sys.exit(0)
+
+    results = []
+    for engine in args.engine:
+        for rows in args.rows:
+            result = run_in_subprocess(rows, engine, args.branches, args.load)
+            results.append(result)
+            print(f"rows={rows} engine={engine} seconds={result['seconds']} rows_per_sec={result['rows_per_sec']:,} "
+                  f"peak_rss_mb={result['peak_rss_mb']}")
+
+    commit = current_commit()
+    output_path = args.output or os.path.join(RESULTS_DIR, f"pipeline_{commit}.json")
+    os.makedirs(os.path.dirname(output_path), exist_ok=True)
+    with open(output_path, "w") as file:
+        json.dump({
+            "commit": commit,
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "results": results,
+        }, file, indent=4)
+    print(f"Results written to {output_path}")
+
+    if args.compare:
+        compare(results, args.compare)
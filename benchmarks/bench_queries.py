@@ -0,0 +1,161 @@
+"""
+Dashboard query latency on the local Postgres container (src/docker-compose.yml, credentials
+from .env as used by load_data.py), before and after the physical layout of
+utils/schema_utils.py: the same synthetic months of branch files are loaded into a baseline
+schema (plain tables, primary keys only, as before schema version 4) and into the layout
+create_db_tables builds (transactions partitioned by month, join columns indexed). Each
+query runs --repeat times per schema and the median is reported.
+
+Usage (from the repository root, with the container running):
+    python benchmarks/bench_queries.py --days 180 --branches 10 --rows-per-day 200
+"""
+import argparse
+import contextlib
+from datetime import datetime, timedelta
+import io
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCH_DIR, "..", "src"))
+
+import etl  # noqa: E402
+from generate_branch_files import write_branch_files  # noqa: E402
+from load_data import connect_to_database  # noqa: E402
+from utils import schema_utils, sql_utils  # noqa: E402
+
+# The Postgres tables as they were before schema version 4
+BASELINE_DDL = [
+    "CREATE TABLE branches (branch_id SERIAL PRIMARY KEY, name VARCHAR(255) NOT NULL, "
+    "location VARCHAR(255) NOT NULL);",
+    "CREATE TABLE transactions (payment_id SERIAL PRIMARY KEY, branch_id INT NOT NULL REFERENCES branches, "
+    "timestamp TIMESTAMP NOT NULL, total_amount NUMERIC(10, 2) NOT NULL, payment_method VARCHAR(50) NOT NULL);",
+    "CREATE TABLE products (product_id SERIAL PRIMARY KEY, name VARCHAR(255) NOT NULL, variant VARCHAR(255), "
+    "size VARCHAR(50), price NUMERIC(10, 2) NOT NULL);",
+    "CREATE TABLE product_transactions (product_transactions_id SERIAL PRIMARY KEY, "
+    "payment_id INT NOT NULL REFERENCES transactions, product_id INT NOT NULL REFERENCES products, "
+    "quantity INT NOT NULL);",
+]
+
+QUERIES = {
+    "daily_revenue_per_branch": """
+        SELECT CAST(timestamp AS DATE), branch_id, SUM(total_amount)
+        FROM transactions
+        WHERE timestamp >= %(month_start)s AND timestamp < %(month_end)s
+        GROUP BY 1, 2
+    """,
+    "top_products_for_branch": """
+        SELECT p.name, p.variant, p.size, SUM(pt.quantity) AS sold
+        FROM transactions t
+        JOIN product_transactions pt ON pt.payment_id = t.payment_id
+        JOIN products p ON p.product_id = pt.product_id
+        WHERE t.branch_id = %(branch_id)s AND t.timestamp >= %(month_start)s AND t.timestamp < %(month_end)s
+        GROUP BY 1, 2, 3
+        ORDER BY sold DESC
+        LIMIT 10
+    """,
+    "basket_lookup": """
+        SELECT p.name, p.size, pt.quantity
+        FROM product_transactions pt
+        JOIN products p ON p.product_id = pt.product_id
+        WHERE pt.payment_id = %(payment_id)s
+    """,
+    "payment_split_for_branch": """
+        SELECT payment_method, COUNT(*), SUM(total_amount)
+        FROM transactions
+        WHERE branch_id = %(branch_id)s AND timestamp >= %(month_start)s AND timestamp < %(month_end)s
+        GROUP BY 1
+    """,
+}
+
+
+def normalize_days(work_dir, days, branches, rows_per_day, start):
+    """
+    One file per branch per day, as the branches upload them, normalized as a single batch so
+    the local ids can be loaded as they are.
+    """
+    rows = []
+    with contextlib.redirect_stdout(io.StringIO()):
+        for day in range(days):
+            date = start + timedelta(days=day)
+            day_dir = os.path.join(work_dir, f"{date:%Y-%m-%d}")
+            for file_path in write_branch_files(day_dir, rows=rows_per_day * branches, branches=branches,
+                                                seed=day, date=date):
+                with open(file_path, newline="", encoding="utf-8") as csvfile:
+                    rows.extend(etl.transform(etl.extract(csvfile)))
+    return etl.normalize(rows)
+
+
+def create_schema(connection, cursor, schema_name, optimised, tables):
+    cursor.execute(f"DROP SCHEMA IF EXISTS {schema_name} CASCADE; CREATE SCHEMA {schema_name}; "
+                   f"SET search_path TO {schema_name};")
+    for statement in schema_utils.create_table_statements(schema_utils.POSTGRES) if optimised else BASELINE_DDL:
+        cursor.execute(statement)
+    if optimised:
+        sql_utils._partitions_ready.clear()
+        sql_utils.ensure_month_partitions(cursor, tables["transactions"])
+    # Keep the ids the batch was normalized with, so every schema holds identical rows
+    for table_name in ("branches", "transactions", "products", "product_transactions"):
+        columns = list(tables[table_name][0])
+        sql_utils.copy_rows_from_stdin(cursor, table_name, columns,
+                                       [[row[column] for column in columns] for row in tables[table_name]])
+    cursor.execute("ANALYZE;")
+    connection.commit()
+
+
+def median_ms(cursor, query, params, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        cursor.execute(query, params)
+        cursor.fetchall()
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--days", type=int, default=180)
+    parser.add_argument("--branches", type=int, default=10)
+    parser.add_argument("--rows-per-day", type=int, default=200, help="transactions per branch per day")
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    connection = connect_to_database()
+    if not connection:
+        sys.exit("Database connection failed.")
+    cursor = connection.cursor()
+
+    start = datetime(2024, 1, 1)
+    with tempfile.TemporaryDirectory() as work_dir:
+        tables = normalize_days(work_dir, args.days, args.branches, args.rows_per_day, start)
+    print(f"transactions={len(tables['transactions'])} product_transactions={len(tables['product_transactions'])}")
+
+    # A month from the middle of the range, the first branch and a basket from that month
+    middle = start + timedelta(days=args.days // 2)
+    month_start = middle.replace(day=1)
+    params = {
+        "month_start": month_start,
+        "month_end": (month_start + timedelta(days=32)).replace(day=1),
+        "branch_id": 1,
+        "payment_id": next(row["payment_id"] for row in tables["transactions"]
+                           if row["timestamp"] >= f"{middle:%Y-%m-%d}"),
+    }
+
+    results = {}
+    for schema_name, optimised in (("bench_baseline", False), ("bench_layout", True)):
+        create_schema(connection, cursor, schema_name, optimised, tables)
+        for name, query in QUERIES.items():
+            results[name, optimised] = median_ms(cursor, query, params, args.repeat)
+
+    for name in QUERIES:
+        baseline, layout = results[name, False], results[name, True]
+        print(f"{name:26} baseline_ms={baseline:8.2f} layout_ms={layout:8.2f} speedup={baseline / layout:5.1f}x")
+
+    for schema_name in ("bench_baseline", "bench_layout"):
+        cursor.execute(f"DROP SCHEMA {schema_name} CASCADE;")
+    connection.commit()
+    connection.close()
@@ -0,0 +1,59 @@
+"""
+Micro-benchmark of timestamp conversion: datetime.strptime against the timestamps module.
+
+Usage (from the repository root):
+    python benchmarks/bench_timestamps.py --scale 200
+"""
+import argparse
+import csv
+from datetime import datetime
+import glob
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+import timestamps  # noqa: E402
+
+DATA_GLOB = os.path.join(os.path.dirname(__file__), "..", "data", "*_??-??-????_*.csv")
+
+
+def load_timestamps(scale):
+    values = []
+    for file_path in sorted(glob.glob(DATA_GLOB)):
+        with open(file_path, newline="", encoding="utf-8") as csvfile:
+            values.extend(row[0] for row in csv.reader(csvfile))
+    return values * scale
+
+
+def strptime_format(value):
+    return datetime.strptime(value, "%d/%m/%Y %H:%M").strftime("%Y-%m-%d %H:%M:%S")
+
+
+def strptime_parse(value):
+    return datetime.strptime(value, "%d/%m/%Y %H:%M")
+
+
+def run(convert, values):
+    start = time.perf_counter()
+    for value in values:
+        convert(value)
+    return time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scale", type=int, default=200, help="times to repeat the bundled data files")
+    args = parser.parse_args()
+
+    values = load_timestamps(args.scale)
+    print(f"timestamps={len(values)}")
+    for name, convert in [
+        ("strptime+strftime", strptime_format),
+        ("format_timestamp", timestamps.format_timestamp),
+        ("strptime", strptime_parse),
+        ("parse_timestamp", timestamps.parse_timestamp),
+    ]:
+        elapsed = run(convert, values)
+        print(f"{name:18} seconds={elapsed:.3f} per_sec={len(values) / elapsed:,.0f}")
@@ -0,0 +1,143 @@
+"""
+Generates synthetic branch CSV files in the same 7-column, headerless format as the
+files in data/ (timestamp, location, customer, items, total, payment method, card number).
+
+Each branch gets one file named like the real uploads, e.g. leeds_21-04-2024_09-00-00.csv.
+As with the real files, etl.extract drops the first row of each file.
+
+Malformed rows carry basket items the item parser rejects (it reports and skips them), so
+the pipeline still runs end to end while the error path is exercised.
+
+Usage (from the repository root):
+    python benchmarks/generate_branch_files.py --rows 100000 --branches 10 --out-dir /tmp/branches
+"""
+import argparse
+import csv
+from datetime import datetime, timedelta
+import os
+import random
+
+BRANCH_NAMES = [
+    "Leeds", "Edinburgh", "Chesterfield", "Uppingham", "York", "Bristol", "Cardiff",
+    "Glasgow", "Norwich", "Exeter", "Durham", "Bath", "Oxford", "Cambridge", "Belfast",
+]
+FIRST_NAMES = ["Jesse", "Rose", "Albert", "Zoe", "Priya", "Tom", "Aisha", "Liam", "Mei", "Omar"]
+LAST_NAMES = ["Franco", "Jackson", "Kenney", "Brown", "Patel", "Smith", "Khan", "Murphy", "Chen", "Ali"]
+
+# (item name, variants, regular price); large costs LARGE_SURCHARGE more
+BASE_MENU = [
+    ("Latte", [None], 2.15),
+    ("Flat white", [None], 2.15),
+    ("Americano", [None], 1.95),
+    ("Iced americano", [None], 2.15),
+    ("Mocha", [None], 2.30),
+    ("Chai latte", [None], 2.30),
+    ("Filter coffee", [None], 1.50),
+    ("Hot Chocolate", [None], 1.40),
+    ("Flavoured latte", ["Hazelnut", "Caramel", "Vanilla"], 2.55),
+    ("Flavoured iced latte", ["Hazelnut", "Caramel", "Vanilla"], 2.75),
+    ("Speciality Tea", ["Green", "Earl Grey", "Fruit", "Peppermint", "English breakfast"], 1.30),
+    ("Smoothies", ["Glowing Greens", "Carrot Kick"], 2.00),
+]
+SIZES = ["Regular", "Large"]
+LARGE_SURCHARGE = 0.40
+MALFORMED_ITEMS = ["Mystery item", "Large Latte - ", "Regular - 2.15", "Large Latte 2.45"]
+
+
+def build_menu(menu_size):
+    """
+    :return: List of (item text, price) pairs, real menu items first, then made-up specials.
+    """
+    menu = []
+    for name, variants, price in BASE_MENU:
+        for variant in variants:
+            for size in SIZES:
+                size_price = price + (LARGE_SURCHARGE if size == "Large" else 0)
+                label = f"{size} {name} - {variant}" if variant else f"{size} {name}"
+                menu.append((f"{label} - {size_price:.2f}", round(size_price, 2)))
+    special = 0
+    while len(menu) < menu_size:
+        price = 1.50 + (special % 20) * 0.10
+        menu.append((f"Regular Special blend - Roast {special_name(special)} - {price:.2f}", round(price, 2)))
+        special += 1
+    return menu[:menu_size]
+
+
+def special_name(number):
+    # Variants may only contain letters and spaces, so number the specials A, B, ..., Z, AA, ...
+    name = ""
+    number += 1
+    while number:
+        number, remainder = divmod(number - 1, 26)
+        name = chr(ord("A") + remainder) + name
+    return name
+
+
+def branch_names(branch_count):
+    names = BRANCH_NAMES[:branch_count]
+    names += [f"Branch {number}" for number in range(len(names) + 1, branch_count + 1)]
+    return names
+
+
+def generate_rows(rng, branch, row_count, menu, min_basket=1, max_basket=6, malformed_rate=0.0,
+                  start=datetime(2024, 4, 21, 8, 0)):
+    """
+    :return: Generator of 7-field rows for one branch, in time order.
+    """
+    # Spread the transactions over a 12 hour trading day; very large files run on into later days
+    step_seconds = max(1, 12 * 3600 // max(row_count, 1))
+    for number in range(row_count):
+        basket = rng.choices(menu, k=rng.randint(min_basket, max_basket))
+        items = [text for text, _ in basket]
+        if malformed_rate and rng.random() < malformed_rate:
+            items[rng.randrange(len(items))] = rng.choice(MALFORMED_ITEMS)
+        payment_method = rng.choice(["CASH", "CARD"])
+        card_number = str(rng.randrange(10 ** 15, 10 ** 16)) if payment_method == "CARD" else ""
+        yield [
+            (start + timedelta(seconds=number * step_seconds)).strftime("%d/%m/%Y %H:%M"),
+            branch,
+            f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}",
+            ", ".join(items),
+            f"{sum(price for _, price in basket):.2f}",
+            payment_method,
+            card_number,
+        ]
+
+
+def write_branch_files(out_dir, rows=10000, branches=5, menu_size=50, min_basket=1, max_basket=6,
+                       malformed_rate=0.0, seed=0, date=datetime(2024, 4, 21)):
+    """
+    Writes rows transactions split evenly across branches files.
+    :return: List of the written file paths.
+    """
+    rng = random.Random(seed)
+    menu = build_menu(menu_size)
+    os.makedirs(out_dir, exist_ok=True)
+    file_paths = []
+    names = branch_names(branches)
+    for index, branch in enumerate(names):
+        branch_rows = rows // branches + (1 if index < rows % branches else 0)
+        file_path = os.path.join(out_dir, f"{branch.lower().replace(' ', '-')}_{date:%d-%m-%Y}_09-00-00.csv")
+        with open(file_path, "w", newline="", encoding="utf-8") as csvfile:
+            csv.writer(csvfile, lineterminator="\n").writerows(
+                generate_rows(rng, branch, branch_rows, menu, min_basket, max_basket, malformed_rate,
+                              start=date.replace(hour=8)))
+        file_paths.append(file_path)
+    return file_paths
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=10000, help="transactions in total, across all branches")
+    parser.add_argument("--branches", type=int, default=5)
+    parser.add_argument("--menu-size", type=int, default=50, help="distinct products on the menu")
+    parser.add_argument("--min-basket", type=int, default=1)
+    parser.add_argument("--max-basket", type=int, default=6)
+    parser.add_argument("--malformed-rate", type=float, default=0.0, help="share of rows with an unparseable item")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out-dir", default="generated_data")
+    args = parser.parse_args()
+
+    paths = write_branch_files(args.out_dir, args.rows, args.branches, args.menu_size, args.min_basket,
+                               args.max_basket, args.malformed_rate, args.seed)
+    print(f"Wrote {args.rows} rows to {len(paths)} files in {args.out_dir}")
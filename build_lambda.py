@@ -0,0 +1,116 @@
+"""
+Builds the Lambda deployment folder: only the modules the handler can import, plus the
+packages in requirements-lambda.txt. Tests, local scripts, notebooks and data stay out of
+the zip, which keeps it small and the cold start short.
+
+The runtime modules are found by following the imports of the handler (including imports
+made inside functions), so a new module is packaged as soon as the handler path uses it.
+
+Usage (from the repository root):
+    python3 build_lambda.py                 # build into build/lambda
+    python3 build_lambda.py --skip-pip      # only refresh the runtime modules
+    python3 build_lambda.py --list          # print the runtime modules and exit
+"""
+import argparse
+import ast
+import os
+import shutil
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+SRC_DIR = os.path.join(ROOT, "src")
+BUILD_DIR = os.path.join(ROOT, "build", "lambda")
+REQUIREMENTS = os.path.join(ROOT, "requirements-lambda.txt")
+HANDLER_MODULES = ["cafe_etl_lambda.py"]
+# Imported by the handler path but never run in Lambda, e.g. the pandas engine (pipeline.ENGINE_PANDAS)
+LOCAL_ONLY_MODULES = ["pandas_engine.py"]
+
+
+def _imported_names(source_path):
+    """
+    :return: Dotted names of every module a file imports, at any depth of the file.
+    """
+    with open(source_path, encoding="utf-8") as file:
+        tree = ast.parse(file.read(), source_path)
+    names = set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            names.update(alias.name for alias in node.names)
+        elif isinstance(node, ast.ImportFrom) and node.module and not node.level:
+            names.add(node.module)
+            # "from utils import s3_utils" imports the module utils.s3_utils
+            names.update(f"{node.module}.{alias.name}" for alias in node.names)
+    return names
+
+
+def _module_path(name, src_dir):
+    relative_path = os.path.join(*name.split("."))
+    for candidate in (relative_path + ".py", os.path.join(relative_path, "__init__.py")):
+        if os.path.isfile(os.path.join(src_dir, candidate)):
+            return candidate
+    return None
+
+
+def find_runtime_modules(src_dir=SRC_DIR, handlers=HANDLER_MODULES, local_only=LOCAL_ONLY_MODULES):
+    """
+    Follows the imports of the handlers through src. Anything that does not resolve to a
+    file in src (the standard library, boto3, psycopg2, ...) is left to the runtime or pip.
+    utils is a namespace package, which is why this walks the AST rather than using modulefinder.
+    Modules in local_only, and whatever only they import, are left out.
+    :return: Sorted paths, relative to src_dir, of the source files the handlers import.
+    """
+    found = set()
+    pending = list(handlers)
+    while pending:
+        path = pending.pop()
+        if path in found:
+            continue
+        found.add(path)
+        for name in _imported_names(os.path.join(src_dir, path)):
+            module_path = _module_path(name, src_dir)
+            if module_path and module_path not in found and module_path not in local_only:
+                pending.append(module_path)
+    return sorted(found)
+
+
+def copy_modules(paths, src_dir=SRC_DIR, build_dir=BUILD_DIR):
+    """
+    Replaces the project modules in build_dir. Installed packages are left in place, so a
+    --skip-pip build reuses the ones from the previous full build.
+    """
+    if os.path.isdir(build_dir):
+        for name in os.listdir(build_dir):
+            if name.endswith(".py") and os.path.exists(os.path.join(src_dir, name)):
+                os.remove(os.path.join(build_dir, name))
+        shutil.rmtree(os.path.join(build_dir, "utils"), ignore_errors=True)
+    for path in paths:
+        target = os.path.join(build_dir, path)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        shutil.copy2(os.path.join(src_dir, path), target)
+
+
+def pip_install(build_dir=BUILD_DIR):
+    # Same wheels as the Lambda runtime: manylinux x86_64, CPython 3.12
+    subprocess.run([
+        sys.executable, "-m", "pip", "install", "--platform", "manylinux2014_x86_64",
+        f"--target={build_dir}", "--implementation", "cp", "--python-version", "3.12",
+        "--only-binary=:all:", "--upgrade", "-r", REQUIREMENTS,
+    ], check=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--skip-pip", action="store_true", help="do not install requirements-lambda.txt")
+    parser.add_argument("--list", action="store_true", help="print the runtime modules and exit")
+    args = parser.parse_args()
+
+    runtime_modules = find_runtime_modules()
+    if args.list:
+        print("\n".join(runtime_modules))
+        sys.exit(0)
+
+    copy_modules(runtime_modules)
+    print(f"Copied {len(runtime_modules)} runtime modules to {BUILD_DIR}")
+    if not args.skip_pip:
+        pip_install()
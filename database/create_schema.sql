@@ -1,24 +1,32 @@
+-- schema_version: 5
+-- Keep in step with SCHEMA_VERSION in src/utils/sql_utils.py.
+-- execute_schema.py only runs this script when the database is behind that version,
+-- so every statement must also be safe on a database created by an older version.
+
 -- Create the branches table
-CREATE TABLE branches
+CREATE TABLE IF NOT EXISTS branches
 (
     branch_id SERIAL PRIMARY KEY,
     name VARCHAR(255) NOT NULL,
     location VARCHAR(255) NOT NULL
 );
 
--- Create the transactions table
-CREATE TABLE transactions
+-- Create the transactions table, range-partitioned by month on timestamp.
+-- The loader creates each month's partition (transactions_YYYY_MM) before loading into it.
+CREATE TABLE IF NOT EXISTS transactions
 (
-    payment_id SERIAL PRIMARY KEY,
+    payment_id SERIAL,
     branch_id INT NOT NULL,
     timestamp TIMESTAMP NOT NULL,
     total_amount NUMERIC(10, 2) NOT NULL,
     payment_method VARCHAR(50) NOT NULL,
+    occurrence INT NOT NULL DEFAULT 1,
+    PRIMARY KEY (payment_id, timestamp),
     FOREIGN KEY (branch_id) REFERENCES branches(branch_id)
-);
+) PARTITION BY RANGE (timestamp);
 
 -- Create the products table
-CREATE TABLE products
+CREATE TABLE IF NOT EXISTS products
 (
     product_id SERIAL PRIMARY KEY,
     name VARCHAR(255) NOT NULL,
@@ -27,13 +35,96 @@ CREATE TABLE products
     price NUMERIC(10, 2) NOT NULL
 );
 
--- Create the product_transactions table
-CREATE TABLE product_transactions
+-- Create the product_transactions table.
+-- payment_id has no foreign key: the partitioned transactions table is keyed on (payment_id, timestamp).
+CREATE TABLE IF NOT EXISTS product_transactions
 (
     product_transactions_id SERIAL PRIMARY KEY,
     payment_id INT NOT NULL,
     product_id INT NOT NULL,
     quantity INT NOT NULL,
-    FOREIGN KEY (payment_id) REFERENCES transactions(payment_id),
     FOREIGN KEY (product_id) REFERENCES products(product_id)
 );
+
+-- Databases from before version 4 have an unpartitioned transactions table; move its rows
+-- into the partitioned layout, keeping every payment_id (POSTGRES_PARTITION_TRANSACTIONS in
+-- src/utils/schema_utils.py)
+DO $$
+DECLARE
+    month_start DATE;
+BEGIN
+    IF (SELECT relkind FROM pg_class WHERE oid = to_regclass('transactions')) = 'r' THEN
+        ALTER TABLE product_transactions DROP CONSTRAINT IF EXISTS product_transactions_payment_id_fkey;
+        ALTER TABLE transactions RENAME TO transactions_unpartitioned;
+        ALTER TABLE transactions_unpartitioned RENAME CONSTRAINT transactions_pkey TO transactions_unpartitioned_pkey;
+        CREATE TABLE transactions (
+            payment_id SERIAL,
+            branch_id INT NOT NULL,
+            timestamp TIMESTAMP NOT NULL,
+            total_amount NUMERIC(10, 2) NOT NULL,
+            payment_method VARCHAR(50) NOT NULL,
+            PRIMARY KEY (payment_id, timestamp),
+            FOREIGN KEY (branch_id) REFERENCES branches(branch_id)
+        ) PARTITION BY RANGE (timestamp);
+        FOR month_start IN SELECT DISTINCT CAST(date_trunc('month', timestamp) AS DATE) FROM transactions_unpartitioned LOOP
+            EXECUTE format('CREATE TABLE %I PARTITION OF transactions FOR VALUES FROM (%L) TO (%L)',
+                           'transactions_' || to_char(month_start, 'YYYY_MM'),
+                           month_start, CAST(month_start + INTERVAL '1 month' AS DATE));
+        END LOOP;
+        INSERT INTO transactions SELECT * FROM transactions_unpartitioned;
+        PERFORM setval(pg_get_serial_sequence('transactions', 'payment_id'), COALESCE(MAX(payment_id), 0) + 1, false)
+            FROM transactions;
+        DROP TABLE transactions_unpartitioned;
+    END IF;
+END $$;
+
+-- Databases from before version 5 have no occurrence column; number the stored sales that
+-- share a natural key in payment_id order (sql_utils.add_transaction_occurrence)
+DO $$
+BEGIN
+    IF NOT EXISTS (SELECT 1 FROM information_schema.columns WHERE table_schema = current_schema()
+                   AND table_name = 'transactions' AND column_name = 'occurrence') THEN
+        ALTER TABLE transactions ADD COLUMN occurrence INT NOT NULL DEFAULT 1;
+        UPDATE transactions SET occurrence = numbered.occurrence
+            FROM (SELECT payment_id, ROW_NUMBER() OVER (PARTITION BY branch_id, timestamp, total_amount, payment_method
+                                                        ORDER BY payment_id) AS occurrence FROM transactions) numbered
+            WHERE transactions.payment_id = numbered.payment_id;
+    END IF;
+END $$;
+
+-- Indexes for the dashboard filters and the product_transactions joins
+CREATE INDEX IF NOT EXISTS transactions_branch_timestamp_idx ON transactions (branch_id, timestamp);
+CREATE INDEX IF NOT EXISTS product_transactions_payment_id_idx ON product_transactions (payment_id);
+CREATE INDEX IF NOT EXISTS product_transactions_product_id_idx ON product_transactions (product_id);
+
+-- Ledger of loaded files, so re-sent or re-run files are skipped
+CREATE TABLE IF NOT EXISTS processed_files
+(
+    source_key VARCHAR(1024) NOT NULL,
+    fingerprint VARCHAR(128) NOT NULL,
+    row_count INT NOT NULL,
+    processed_at TIMESTAMP NOT NULL,
+    PRIMARY KEY (source_key, fingerprint)
+);
+
+-- Daily rollups read by the dashboards, kept up to date by every load
+CREATE TABLE IF NOT EXISTS daily_branch_sales
+(
+    sales_date DATE NOT NULL,
+    branch_id INT NOT NULL,
+    payment_method VARCHAR(50) NOT NULL,
+    revenue NUMERIC(12, 2) NOT NULL,
+    transaction_count INT NOT NULL,
+    item_count INT NOT NULL,
+    PRIMARY KEY (sales_date, branch_id, payment_method)
+);
+
+CREATE TABLE IF NOT EXISTS daily_product_sales
+(
+    sales_date DATE NOT NULL,
+    branch_id INT NOT NULL,
+    product_id INT NOT NULL,
+    quantity INT NOT NULL,
+    revenue NUMERIC(12, 2) NOT NULL,
+    PRIMARY KEY (sales_date, branch_id, product_id)
+);
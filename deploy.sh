@@ -23,17 +23,15 @@ aws cloudformation deploy --stack-name "${team_name}-deployment-bucket" \
     --parameter-overrides \
       TeamName="${team_name}";
 
+# Assemble build/lambda: only the modules the handler imports, plus requirements-lambda.txt
+# installed for python 3.12. On windows may need to use `py` not `python3`
+echo ""
+echo "Doing lambda build..."
 if [ -z "${SKIP_PIP_INSTALL:-}" ]; then
-    echo ""
-    echo "Doing pip install..."
-    # Install dependencies from requirements-lambda.txt into src directory with python 3.12
-    # On windows may need to use `py` not `python3`
-    python3 -m pip install --platform manylinux2014_x86_64 \
-        --target=./src --implementation cp --python-version 3.12 \
-        --only-binary=:all: --upgrade -r requirements-lambda.txt;
+    python3 build_lambda.py;
 else
-    echo ""
     echo "Skipping pip install"
+    python3 build_lambda.py --skip-pip;
 fi
 
 # Create an updated ETL packaged template "etl-stack-packaged.yml" from the default "etl-stack.yml"
@@ -0,0 +1,196 @@
+"""
+Runs the ETL over a directory or glob of branch CSV files, for local backfills.
+
+Extract, transform and normalize run per file in a process pool. The parent process
+loads every file through a single database connection, each file in one transaction.
+
+Usage (from src):
+    python batch_runner.py ../data
+    python batch_runner.py "../data/leeds_*.csv" --workers 8 --engine pandas
+    python batch_runner.py ../data --no-load
+    python batch_runner.py ../data --manifest backfill.sqlite
+    python batch_runner.py ../data --no-load --parquet ../data/parquet
+
+Files already recorded in the processing ledger with the same content hash are skipped,
+so a restarted backfill picks up where it stopped. The ledger is the warehouse's
+processed_files table unless --manifest points at a SQLite file.
+"""
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+import contextlib
+import glob
+import io
+import os
+import time
+
+import etl
+from utils import load_utils, manifest_utils, parquet_utils, sql_utils
+
+# Branch files are named <branch>_<dd-mm-YYYY>_<HH-MM-SS>.csv; the normalized
+# output files written next to them (branches.csv, ...) must not match
+BRANCH_FILE_PATTERN = "*_??-??-????_*.csv"
+ENGINES = ["python", "pandas"]
+
+
+def expand_paths(paths):
+    """
+    :param paths: Directories, files or glob patterns.
+    :return: Sorted list of unique branch file paths.
+    """
+    file_paths = set()
+    for path in paths:
+        if os.path.isdir(path):
+            file_paths.update(glob.glob(os.path.join(path, BRANCH_FILE_PATTERN)))
+        else:
+            file_paths.update(glob.glob(path))
+    return sorted(file_paths)
+
+
+def normalize_local_file(file_path, engine="python"):
+    """
+    Extracts, transforms and normalizes one file. Runs inside a worker process.
+    :return: Tuple of (normalized tables, transactions, seconds spent).
+    """
+    start = time.perf_counter()
+    # Keep the parser's per-item messages out of the runner's report
+    with contextlib.redirect_stdout(io.StringIO()):
+        with open(file_path, newline="", encoding="utf-8") as csvfile:
+            if engine == "pandas":
+                import pandas_engine
+                tables = pandas_engine.normalize_file(csvfile)
+            else:
+                tables = etl.normalize(etl.transform(etl.extract(csvfile)))
+    return tables, len(tables["transactions"]), time.perf_counter() - start
+
+
+def load_tables(connection, cursor, tables, ledger_entry=None):
+    """
+    Loads one file's tables, with its daily rollups, as a single load_utils unit of work.
+    Every file numbers its branches and products from 1, so each is its own load.
+    :param ledger_entry: Tuple of (source_key, fingerprint, row_count) to mark processed in the
+        same transaction, when the ledger lives in the warehouse, or None.
+    """
+    try:
+        load_utils.begin_load(cursor)
+        load_utils.load_batch(connection, cursor, tables)
+        if ledger_entry:
+            manifest_utils.mark_processed(connection, cursor, *ledger_entry, commit=False)
+        load_utils.commit_load(connection, cursor)
+    except Exception:
+        # The connection loads the next file, so leave no transaction open
+        load_utils.abort_load(connection)
+        raise
+
+
+def filter_unprocessed(file_paths, manifest):
+    """
+    :param manifest: Tuple of (connection, cursor) of the ledger.
+    :return: Tuple of (file paths still to load, fingerprints by path, reports for skipped files).
+    """
+    pending = []
+    fingerprints = {}
+    skipped = []
+    for file_path in file_paths:
+        fingerprint = manifest_utils.local_fingerprint(file_path)
+        if manifest_utils.is_processed(manifest[1], manifest_utils.local_source_key(file_path), fingerprint):
+            print(f"{file_path}: already processed, skipping")
+            skipped.append({"file": file_path, "status": "skipped"})
+        else:
+            pending.append(file_path)
+            fingerprints[file_path] = fingerprint
+    return pending, fingerprints, skipped
+
+
+def run_files(file_paths, workers=None, engine="python", connection=None, manifest=None, parquet_dir=None):
+    """
+    Normalizes the files in a process pool and, when a connection is given, loads each one
+    as soon as it is ready, in file order.
+    :param connection: Open database connection, or None to skip loading.
+    :param manifest: Tuple of (connection, cursor) of the processing ledger, or None to load every file.
+    :param parquet_dir: Folder to also write each file's tables to as Parquet, one load per file, or None.
+    :return: List of per-file report dictionaries.
+    """
+    reports = []
+    fingerprints = {}
+    if manifest:
+        file_paths, fingerprints, reports = filter_unprocessed(file_paths, manifest)
+
+    cursor = connection.cursor() if connection else None
+    # A ledger in the warehouse commits with the load; a separate one (e.g. SQLite) after it
+    shared_ledger = bool(manifest) and manifest[0] is connection
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(normalize_local_file, file_path, engine) for file_path in file_paths]
+        for file_path, future in zip(file_paths, futures):
+            try:
+                tables, rows, seconds = future.result()
+                if parquet_dir:
+                    parquet_utils.write_tables(tables, parquet_dir)
+                ledger_entry = (manifest_utils.local_source_key(file_path), fingerprints[file_path], rows) \
+                    if manifest else None
+                if connection:
+                    load_start = time.perf_counter()
+                    load_tables(connection, cursor, tables, ledger_entry if shared_ledger else None)
+                    seconds += time.perf_counter() - load_start
+                if manifest and not shared_ledger:
+                    manifest_utils.mark_processed(*manifest, *ledger_entry)
+            except Exception as e:
+                print(f"{file_path}: failed: {e}")
+                reports.append({"file": file_path, "status": "failed", "error": str(e)})
+                continue
+            reports.append({"file": file_path, "status": "ok", "rows": rows, "seconds": seconds})
+            print(f"{file_path}: rows={rows} seconds={seconds:.3f} rows_per_sec={rows / seconds:,.0f}")
+    return reports
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("paths", nargs="+", help="directories, files or glob patterns of branch CSV files")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: CPU count)")
+    parser.add_argument("--engine", choices=ENGINES, default="python", help="transform engine")
+    parser.add_argument("--no-load", action="store_true",
+                        help="normalize only, without a database or the processing ledger")
+    parser.add_argument("--manifest", help="SQLite file to use as the processing ledger instead of the warehouse")
+    parser.add_argument("--force", action="store_true", help="load every file, ignoring the processing ledger")
+    parser.add_argument("--parquet", help="also write the normalized tables as Parquet to this folder (needs pyarrow)")
+    args = parser.parse_args(argv)
+
+    file_paths = expand_paths(args.paths)
+    if not file_paths:
+        print("No branch files found.")
+        return 1
+
+    connection = None
+    if not args.no_load:
+        # Only needed when loading, so --no-load runs without psycopg2
+        from load_data import connect_to_database
+        connection = connect_to_database()
+        if not connection:
+            print("Database connection failed. Exiting.")
+            return 1
+        sql_utils.ensure_db_schema(connection, connection.cursor())
+
+    manifest = None
+    if connection and not args.force:
+        manifest = (manifest_utils.open_sqlite_manifest(args.manifest) if args.manifest
+                    else (connection, connection.cursor()))
+
+    start = time.perf_counter()
+    try:
+        reports = run_files(file_paths, args.workers, args.engine, connection, manifest, args.parquet)
+    finally:
+        if connection:
+            connection.close()
+        if manifest and args.manifest:
+            manifest[0].close()
+    elapsed = time.perf_counter() - start
+
+    rows = sum(report.get("rows", 0) for report in reports)
+    failed = sum(report["status"] == "failed" for report in reports)
+    skipped = sum(report["status"] == "skipped" for report in reports)
+    print(f"total: files={len(reports)} skipped={skipped} failed={failed} rows={rows} "
+          f"seconds={elapsed:.3f} rows_per_sec={rows / elapsed:,.0f}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -1,16 +1,19 @@
-from utils import s3_utils, sql_utils, db_utils
+from utils import s3_utils, sql_utils, db_utils, load_utils, log_utils, manifest_utils, metrics_utils
 import etl
 import logging
 import os
+import pipeline
 LOGGER = logging.getLogger()
 LOGGER.setLevel(logging.INFO)
 
 SSM_ENV_VAR_NAME = 'SSM_PARAMETER_NAME'
+BATCH_SIZE = int(os.environ.get('ETL_BATCH_SIZE', etl.DEFAULT_BATCH_SIZE))
 
 
 def lambda_handler(event, context):
     LOGGER.info('lambda_handler: starting')
     file_path = 'NOT_SET'  # makes the exception handler compile
+    conn = None
 
 
     try:
@@ -19,29 +22,52 @@ def lambda_handler(event, context):
 
         LOGGER.info('lambda_handler: done')
 
-        bucket_name, file_path = s3_utils.get_file_info(event)
+        # S3 can batch several uploads into one event, so handle every record
+        file_infos = s3_utils.get_file_infos(event)
+        fingerprints = dict(zip(file_infos, s3_utils.get_file_fingerprints(event)))
+        file_path = ', '.join(file_name for _, file_name in file_infos)
 
-        csv_text = s3_utils.load_file(bucket_name, file_path)
+        # Connect to Redshift first so each batch is loaded as soon as it is normalized.
+        # The parameter and connection are cached, so warm invocations skip the setup.
+        redshift_details = db_utils.get_ssm_param(ssm_param_name)
+        conn, cur = db_utils.get_connection_and_cursor(redshift_details)
+        sql_utils.ensure_db_schema(conn, cur)
 
-        data = etl.extract(csv_text)
+        # Duplicate notifications and re-uploads of identical files stop here
+        file_infos, skipped = manifest_utils.filter_unprocessed(cur, file_infos, fingerprints)
+        if not file_infos:
+            LOGGER.info(f'lambda_handler: done, every file already processed, file={file_path}')
+            return {'files': skipped}
 
-        transformed_data = etl.transform(data)
-        # One would not normally log the data directly!!
-        # ...there could be loads and it could have PID in it!!
-        LOGGER.warn(f'lambda_handler: transformed_data={transformed_data}')
-        normalized_tables = etl.normalize(transformed_data)
+        # Rows from all files share one normalize, so each table is bulk loaded together.
+        # The whole event is one transaction: every batch, the rollups and the ledger
+        # entries commit together, so a failed event leaves nothing half loaded.
+        reports = []
+        load_utils.begin_load(cur)
+        for normalized_tables in pipeline.iter_normalized_batches(file_infos, reports, BATCH_SIZE):
+            log_utils.log_tables(LOGGER, 'lambda_handler', normalized_tables)
+            load_utils.load_batch(conn, cur, normalized_tables)
 
-        # Connect to Redshift and process data
-        redshift_details = db_utils.get_ssm_param(ssm_param_name)
-        conn, cur = db_utils.open_sql_database_connection_and_cursor(redshift_details)
-        sql_utils.create_db_tables(conn, cur)
-        for table_name, table_data in normalized_tables.items():
-            sql_utils.save_data_in_db(conn, cur, table_name, table_data)
-        cur.close()
-        conn.close()
+        pipeline.log_reports(reports)
+        if all(report['status'] == 'failed' for report in reports):
+            raise RuntimeError('every file in the event failed to process')
+        manifest_utils.mark_reports(conn, cur, reports, fingerprints, commit=False)
+        load_utils.commit_load(conn, cur)
+
+        # Fail the invocation so S3 retries it; the retry skips the files committed above
+        failed = [report['file'] for report in reports if report['status'] == 'failed']
+        if failed:
+            raise RuntimeError(f'files failed to process: {", ".join(failed)}')
 
         LOGGER.info(f'lambda_handler: done, file={file_path}')
+        return {'files': skipped + reports}
 
     except Exception as err:
         LOGGER.error(f'lambda_handler: failure: error={err}, file={file_path}')
+        if conn is not None:
+            # The connection is reused by the next invocation, so leave no transaction open
+            load_utils.abort_load(conn)
         raise err
+    finally:
+        # One EMF record of per-stage timings per invocation, only when ETL_METRICS is on
+        metrics_utils.emit(dimensions={'Service': 'cafe_etl_lambda'})
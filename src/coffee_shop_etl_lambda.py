@@ -1,34 +1,47 @@
 import logging
 import os
 import etl
-from utils import s3_utils
+import pipeline
+from utils import s3_utils, log_utils, manifest_utils, metrics_utils
 
 LOGGER = logging.getLogger()
 LOGGER.setLevel(logging.INFO)
 
+BATCH_SIZE = int(os.environ.get('ETL_BATCH_SIZE', etl.DEFAULT_BATCH_SIZE))
+
 
 def lambda_handler(event, context):
     LOGGER.info('lambda_handler: starting')
 
     try:
-        # LOGGER.info(f'lambda_handler: done')
-        # Ensure the event contains records
-        bucket_name, file_path = s3_utils.get_file_info(event)
-        
-        if "Records" not in event or len(event["Records"]) == 0:
-
-            raise KeyError("No Records found in the event payload")
-                # Extract bucket name and file key
-        LOGGER.info(f"Processing file: {file_path} from bucket: {bucket_name}")
-
-        # Load and process the CSV file
-        csv_content = s3_utils.load_file(bucket_name, file_path)
-        raw_data = etl.extract(csv_content)
-        transformed_data = etl.transform(raw_data)
-        normalized_tables = etl.normalize(transformed_data)
-
-        
+        # Ensure the event contains records; S3 can batch several into one event
+        file_infos = s3_utils.get_file_infos(event)
+        fingerprints = dict(zip(file_infos, s3_utils.get_file_fingerprints(event)))
+
+        # This handler has no warehouse, so the ledger is an optional SQLite file
+        manifest = None
+        skipped = []
+        manifest_path = os.environ.get(manifest_utils.SQLITE_PATH_ENV_VAR_NAME)
+        if manifest_path:
+            manifest = manifest_utils.open_sqlite_manifest(manifest_path)
+            file_infos, skipped = manifest_utils.filter_unprocessed(manifest[1], file_infos, fingerprints)
+        LOGGER.info(f"Processing files: {[file_path for _, file_path in file_infos]}")
+
+        # Load and process the CSV files
+        reports = []
+        if file_infos:
+            for normalized_tables in pipeline.iter_normalized_batches(file_infos, reports, BATCH_SIZE):
+                log_utils.log_tables(LOGGER, 'lambda_handler', normalized_tables)
+
+        pipeline.log_reports(reports)
+        if manifest:
+            manifest_utils.mark_reports(*manifest, reports, fingerprints)
+            manifest[0].close()
+        return {'files': skipped + reports}
 
     except Exception as err:
         LOGGER.error(f'lambda_handler: failure: error={err}')
         raise err
+    finally:
+        # One EMF record of per-stage timings per invocation, only when ETL_METRICS is on
+        metrics_utils.emit(dimensions={'Service': 'coffee_shop_etl_lambda'})
@@ -0,0 +1,142 @@
+# Compact, column-oriented form of the normalized tables.
+# Ids and quantities live in array('i'), amounts in array('d') and repeated strings
+# (names, variants, payment methods, timestamps) are dictionary-encoded, so a table costs a
+# few bytes per cell instead of one dict per row.
+
+from array import array
+
+INT = 'i'
+FLOAT = 'd'
+TEXT = 'text'
+
+TABLE_SCHEMAS = {
+    "branches": [
+        ("branch_id", INT),
+        ("name", TEXT),
+        ("location", TEXT),
+    ],
+    "transactions": [
+        ("payment_id", INT),
+        ("branch_id", INT),
+        ("timestamp", TEXT),
+        ("total_amount", FLOAT),
+        ("payment_method", TEXT),
+    ],
+    "products": [
+        ("product_id", INT),
+        ("name", TEXT),
+        ("variant", TEXT),
+        ("size", TEXT),
+        ("price", FLOAT),
+    ],
+    "product_transactions": [
+        ("product_transactions_id", INT),
+        ("payment_id", INT),
+        ("product_id", INT),
+        ("quantity", INT),
+    ],
+}
+
+
+class DictColumn:
+    """
+    Dictionary-encoded string column: each distinct value is stored once and every row
+    holds a small integer code into that list. None is a value like any other.
+    """
+
+    def __init__(self):
+        self.codes = array(INT)
+        self.values = []
+        self._index = {}
+
+    def append(self, value):
+        code = self._index.get(value)
+        if code is None:
+            code = self._index[value] = len(self.values)
+            self.values.append(value)
+        self.codes.append(code)
+
+    def __len__(self):
+        return len(self.codes)
+
+    def __getitem__(self, position):
+        return self.values[self.codes[position]]
+
+    def __iter__(self):
+        values = self.values
+        return (values[code] for code in self.codes)
+
+
+def dict_column(codes, values):
+    """
+    Builds a DictColumn from data that is already encoded, e.g. by pandas.factorize.
+    :param codes: array('i') of positions in values, one per row.
+    :param values: List of the distinct values.
+    """
+    column = DictColumn()
+    column.codes = codes
+    column.values = values
+    column._index = {value: code for code, value in enumerate(values)}
+    return column
+
+
+def new_column(kind):
+    return DictColumn() if kind == TEXT else array(kind)
+
+
+class ColumnarTable:
+    """
+    A normalized table stored as one compact column per field.
+    It behaves like the list of row dictionaries it replaces (append, len, iteration),
+    and rows() hands loaders and writers plain tuples without building dictionaries.
+    """
+
+    def __init__(self, schema):
+        self.column_names = [name for name, _ in schema]
+        self.columns = {name: new_column(kind) for name, kind in schema}
+
+    def append(self, row):
+        for name, column in self.columns.items():
+            column.append(row[name])
+
+    def __len__(self):
+        return len(self.columns[self.column_names[0]])
+
+    def rows(self, column_names=None):
+        """
+        :param column_names: Columns to include, in order; defaults to every column.
+        :return: Iterator of row tuples.
+        """
+        return zip(*(self.columns[name] for name in column_names or self.column_names))
+
+    def __iter__(self):
+        column_names = self.column_names
+        return (dict(zip(column_names, row)) for row in self.rows())
+
+
+def new_table(table_name):
+    return ColumnarTable(TABLE_SCHEMAS[table_name])
+
+
+def new_tables():
+    return {table_name: new_table(table_name) for table_name in TABLE_SCHEMAS}
+
+
+def table_columns(data):
+    """
+    :param data: A ColumnarTable or a non-empty list of row dictionaries.
+    :return: Column names in order.
+    """
+    if isinstance(data, ColumnarTable):
+        return list(data.column_names)
+    return list(data[0].keys())
+
+
+def table_rows(data, column_names):
+    """
+    :param data: A ColumnarTable or a list of row dictionaries.
+    :return: Iterable of row tuples holding column_names, in order.
+    """
+    if isinstance(data, ColumnarTable):
+        return data.rows(column_names)
+    return (tuple(row[column] for column in column_names) for row in data)
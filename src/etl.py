@@ -1,13 +1,24 @@
 import csv
-from datetime import datetime
 import logging
-import re
+import columnar
+from item_parser import parse_products
+from timestamps import format_timestamp
+from utils import log_utils, metrics_utils
 LOGGER = logging.getLogger()
 LOGGER.setLevel(logging.INFO)
 
 COLUMN_NAMES = ['timestamp', 'location', 'customer_name', 'items', 'total_cost', 'payment_method', 'credit_card']
 
-def extract(body_text):
+# Number of transactions per normalized batch handed to the loader when streaming
+DEFAULT_BATCH_SIZE = 1000
+
+@metrics_utils.timed('extract')
+def iter_extract(body_text):
+    """
+    Lazily reads rows from an iterable of CSV lines.
+    :param body_text: Iterable of lines, e.g. s3_utils.stream_file or an open file
+    :return: Generator of row dictionaries
+    """
     LOGGER.info('extract: starting')
     reader = csv.DictReader(
         body_text,
@@ -16,91 +27,110 @@ def extract(body_text):
     )
 
     # skip header row
-    next(reader)
+    next(reader, None)
 
-    data = [row for row in reader]
+    row_count = 0
+    for row in reader:
+        row_count += 1
+        yield row
+
+    LOGGER.info(f'extract: done: rows={row_count}')
+
+def extract(body_text):
+    return list(iter_extract(body_text))
 
-    LOGGER.info(f'extract: done: rows={len(data)}')
-    return data
- 
 # Transformation functions
-def parse_items(items_column):
-        parsed_items = []
-        try:
-            # Split items by comma
-            items = items_column.split(',')
-           
-            # Regex to match items with or without a variant
-            regex_with_variant = r"^(?P<size>\w+)\s+(?P<item_name>[a-zA-Z\s]+)\s+-\s+(?P<variant>[a-zA-Z\s]+)\s+-\s+(?P<price>[0-9.]+)$"
-            regex_without_variant = r"^(?P<size>\w+)\s+(?P<item_name>[a-zA-Z\s]+)\s+-\s+(?P<price>[0-9.]+)$"
-           
-            for item in items:
-                item = item.strip()                
-                # Try to match with variant first
-                match = re.match(regex_with_variant, item)
-                if match:
-                    parsed_items.append({
-                        "item_name": match.group("item_name").strip(),
-                        "variant": match.group("variant").strip(),
-                        "size": match.group("size").strip(),
-                        "price": float(match.group("price").strip())
-                    })
-                    continue
-               
-                # If no match, try without variant
-                match = re.match(regex_without_variant, item)
-                if match:
-                    parsed_items.append({
-                        "item_name": match.group("item_name").strip(),
-                        "variant": None,  # No variant available
-                        "size": match.group("size").strip(),
-                        "price": float(match.group("price").strip())
-                    })
-                    continue
-                else:
-                # Log unmatched items
-                    print(f"Item format not matched: {item}")
-            return parsed_items
-        except Exception as e:
-            print(f"Error parsing items: {e}")        
-        return parsed_items
+def transform_row(row):
+    row["items"] = parse_products(row.get("items", ""))
+    row["total_cost"] = float(row.get("total_cost", 0.0))
+    row["timestamp"] = format_timestamp(row["timestamp"])
+    row.pop("credit_card", None)  # Remove sensitive information
+    row.pop("customer_name", None)  # Remove customer name
+    return row
+
+@metrics_utils.timed('transform')
+def iter_transform(data):
+    """
+    Lazily transforms rows as they are pulled from extract.
+    :param data: Iterable of extracted rows
+    :return: Generator of transformed rows
+    """
+    LOGGER.info('transform: starting')
+    row_count = 0
+    for row in data:
+        row_count += 1
+        yield transform_row(row)
+    LOGGER.info(f'transform: done: rows={row_count}')
+
+@metrics_utils.timed('transform', rows=len)
 def transform(data):
     LOGGER.info('transform: starting')
     for row in data:
-        row["items"] = parse_items(row.get("items", ""))
-        row["total_cost"] = float(row.get("total_cost", 0.0))
-        row["timestamp"] = datetime.strptime(row["timestamp"], "%d/%m/%Y %H:%M").strftime("%Y-%m-%d %H:%M:%S")
-        row.pop("credit_card", None)  # Remove sensitive information
-        row.pop("customer_name", None)  # Remove customer name
+        transform_row(row)
     LOGGER.info(f'transform: done: rows={len(data)}')
     return data
 
 # Normalization functions
-def normalize(data):
+def _empty_tables(columnar_tables=False):
+    if columnar_tables:
+        return columnar.new_tables()
+    return {
+        "branches": [],
+        "transactions": [],
+        "products": [],
+        "product_transactions": []
+    }
+
+@metrics_utils.timed('normalize', rows=lambda tables: len(tables['transactions']))
+def iter_normalize(data, batch_size=DEFAULT_BATCH_SIZE, columnar_tables=False):
     """
-    Normalize transformed data into relational tables.
-    :param data: Transformed data
-    :return: Dictionary of normalized tables
+    Lazily normalize transformed data into batches of relational tables.
+    Ids keep counting across batches, and each branch and product is only emitted
+    in the batch where it is first seen, so every batch can be loaded as it arrives.
+    A batch only ends between rows of different branches or minutes, so sales that look
+    identical always land in the same batch (see sql_utils.REPEATABLE_KEYS). That needs the
+    rows of a branch and minute to be together, as they are in branch files sorted by time:
+    a branch and minute that comes back after its batch was emitted raises ValueError.
+    :param data: Iterable of transformed rows
+    :param batch_size: Transactions per batch, or None for a single batch
+    :param columnar_tables: Emit columnar.ColumnarTable tables instead of lists of dictionaries
+    :return: Generator of dictionaries of normalized tables
     """
     LOGGER.info('normalize: starting')
-    branches = []
     branch_map = {}  # To map branch names to unique branch IDs
-    transactions = []
-    products = {}
-    product_transactions = []
+    product_map = {}  # To map product keys to unique product IDs
+    product_transactions_id = 0
+    tables = _empty_tables(columnar_tables)
+    batch_count = 0
+    previous_minute = None
+    batch_minutes = set()  # Branches and minutes of the current batch
+    emitted_minutes = set()  # ... and of the batches already emitted
 
     for i, row in enumerate(data, start=1):
         # Extract branch information dynamically
         branch_name = row.get("location", "Unknown")
+        minute = (branch_name, row["timestamp"])
+        if batch_size and minute != previous_minute:
+            if len(tables["transactions"]) >= batch_size:
+                batch_count += 1
+                yield tables
+                tables = _empty_tables(columnar_tables)
+                emitted_minutes |= batch_minutes
+                batch_minutes = set()
+            if minute in emitted_minutes:
+                raise ValueError(f"normalize: {branch_name} {row['timestamp']} comes after its batch was emitted; "
+                                 f"sort the rows by branch and timestamp")
+            batch_minutes.add(minute)
+        previous_minute = minute
         if branch_name not in branch_map:
-            branch_id = len(branches) + 1
+            branch_id = len(branch_map) + 1
             branch_map[branch_name] = branch_id
-            branches.append({"branch_id": branch_id, "name": branch_name, "location": branch_name})
+            tables["branches"].append({"branch_id": branch_id, "name": branch_name, "location": branch_name})
 
         branch_id = branch_map[branch_name]
 
         # Normalize transactions
-        transactions.append({
+        tables["transactions"].append({
             "payment_id": i,
             "branch_id": branch_id,
             "timestamp": row["timestamp"],
@@ -109,31 +139,56 @@ def normalize(data):
         })
 
         # Normalize products and product transactions
+        # Items are interned Product records, so each one is already its own product key.
+        # Repeats of a product in one basket become a single row with their quantity
+        # (a plain dictionary counts these short baskets faster than collections.Counter).
+        quantities = {}
         for item in row["items"]:
-            product_key = (item["item_name"], item["variant"], item["size"], item["price"])
-            if product_key not in products:
-                products[product_key] = {
-                    "product_id": len(products) + 1,
-                    "name": item["item_name"],
-                    "variant": item["variant"],
-                    "size": item["size"],
-                    "price": item["price"]
-                }
-            product_transactions.append({
-                "product_transactions_id": len(product_transactions) + 1,
+            quantities[item] = quantities.get(item, 0) + 1
+        for item, quantity in quantities.items():
+            if item not in product_map:
+                product_map[item] = len(product_map) + 1
+                tables["products"].append({
+                    "product_id": product_map[item],
+                    "name": item.item_name,
+                    "variant": item.variant,
+                    "size": item.size,
+                    "price": item.price
+                })
+            product_transactions_id += 1
+            tables["product_transactions"].append({
+                "product_transactions_id": product_transactions_id,
                 "payment_id": i,
-                "product_id": products[product_key]["product_id"],
-                "quantity": 1  # Assuming quantity is 1 for simplicity
+                "product_id": product_map[item],
+                "quantity": quantity
             })
 
-    # Debug log to verify branch data
-    LOGGER.debug(f'Branches: {branches}')
+    if tables["transactions"] or not batch_count:
+        batch_count += 1
+        yield tables
 
-    LOGGER.info('normalize: done')
-    return {
-        "branches": branches,
-        "transactions": transactions,
-        "products": list(products.values()),
-        "product_transactions": product_transactions
-    }
+    LOGGER.info(f'normalize: done: batches={batch_count}')
 
+def normalize(data, columnar_tables=False):
+    """
+    Normalize transformed data into relational tables.
+    :param data: Transformed data
+    :param columnar_tables: Emit columnar.ColumnarTable tables instead of lists of dictionaries
+    :return: Dictionary of normalized tables
+    """
+    tables = list(iter_normalize(data, batch_size=None, columnar_tables=columnar_tables))[0]
+
+    # Row counts only, unless ETL_LOG_DATA asks for samples
+    log_utils.log_tables(LOGGER, 'normalize', tables)
+    return tables
+
+def run_pipeline(body_text, batch_size=DEFAULT_BATCH_SIZE, columnar_tables=False):
+    """
+    Streams lines through extract, transform and normalize.
+    Memory stays proportional to batch_size rather than to the size of the file.
+    :param body_text: Iterable of CSV lines
+    :param batch_size: Maximum transactions per batch
+    :param columnar_tables: Emit columnar.ColumnarTable tables instead of lists of dictionaries
+    :return: Generator of dictionaries of normalized tables
+    """
+    return iter_normalize(iter_transform(iter_extract(body_text)), batch_size, columnar_tables)
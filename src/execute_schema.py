@@ -1,11 +1,15 @@
 import psycopg2
 from dotenv import load_dotenv
 import os
+import re
 
 
 # Load environment variables
 load_dotenv()
 
+# Matches the "-- schema_version: N" marker at the top of create_schema.sql
+SCHEMA_VERSION_PATTERN = re.compile(r"^--\s*schema_version:\s*(\d+)", re.MULTILINE)
+
 # Load the SQL script from file
 def load_sql_script(file_path):
     """
@@ -26,15 +30,67 @@ def execute_sql_script(connection, script):
     Executes the given SQL script using the provided connection.
     :param connection: psycopg2 connection object.
     :param script: SQL script to execute.
+    :return: True if the script was executed and committed.
     """
     try:
         with connection.cursor() as cursor:
             cursor.execute(script)
             connection.commit()
             print("Schema created successfully.")
+            return True
     except Exception as e:
         print(f"Error executing SQL script: {e}")
         connection.rollback()
+        return False
+
+# Schema version helpers
+def read_schema_version(script):
+    """
+    Reads the schema version marker from a SQL script.
+    :param script: SQL script text.
+    :return: The version as an int, or None if the script has no marker.
+    """
+    match = SCHEMA_VERSION_PATTERN.search(script)
+    return int(match.group(1)) if match else None
+
+def get_applied_schema_version(connection):
+    """
+    Reads the version recorded in the database, creating the marker table if needed.
+    :param connection: psycopg2 connection object.
+    :return: The recorded version, or 0 if none has been recorded.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute("CREATE TABLE IF NOT EXISTS schema_version (version INT NOT NULL);")
+        cursor.execute("SELECT MAX(version) FROM schema_version;")
+        row = cursor.fetchone()
+    connection.commit()
+    return row[0] if row and row[0] is not None else 0
+
+def record_schema_version(connection, version):
+    with connection.cursor() as cursor:
+        cursor.execute("DELETE FROM schema_version;")
+        cursor.execute("INSERT INTO schema_version (version) VALUES (%s);", (version,))
+    connection.commit()
+
+def apply_schema(connection, script):
+    """
+    Runs the schema script only when the database is behind the script's version marker,
+    then records the new version so the Lambda and local runs agree on the schema.
+    :param connection: psycopg2 connection object.
+    :param script: SQL script to execute.
+    :return: True if the script was executed.
+    """
+    version = read_schema_version(script)
+    applied_version = get_applied_schema_version(connection)
+    if version is not None and applied_version >= version:
+        print(f"Schema already at version {applied_version}, nothing to do.")
+        return False
+
+    if not execute_sql_script(connection, script):
+        return False
+    if version is not None:
+        record_schema_version(connection, version)
+    return True
 
 if __name__ == "__main__":
     # Define the path to your SQL file
@@ -56,8 +112,8 @@ if __name__ == "__main__":
             database=os.getenv("POSTGRES_DB")
         )
 
-        # Execute the SQL script
-        execute_sql_script(connection, schema_script)
+        # Execute the SQL script if the database is behind it
+        apply_schema(connection, schema_script)
 
     except Exception as e:
         print(f"Error connecting to the database: {e}")
@@ -1,6 +1,6 @@
 import csv
 import json
-import re
+from item_parser import parse_items
 
 
 COLUMN_NAMES = ["timestamp", "location", "customer_name", "items", "total_cost", "payment_method", "credit_card"]
@@ -16,52 +16,6 @@ def save_data_to_json(data, file_path):
         print(f"Error saving data to JSON: {e}")
 
 
-# Function to parse items column
-def parse_items(items_column):
-        """
-        Parses the items column into a structured list of items with name, size, variant (if present), and price.
-        :param items_column: A string containing items, sizes, and prices.
-        :return: A list of dictionaries with parsed item details.
-        """
-        parsed_items = []
-        try:
-            # Split items by comma
-            items = items_column.split(',')
-           
-            # Regex to match items with or without a variant
-            regex_with_variant = r"^(?P<size>\w+)\s+(?P<item_name>[a-zA-Z\s]+)\s+-\s+(?P<variant>[a-zA-Z\s]+)\s+-\s+(?P<price>[0-9.]+)$"
-            regex_without_variant = r"^(?P<size>\w+)\s+(?P<item_name>[a-zA-Z\s]+)\s+-\s+(?P<price>[0-9.]+)$"
-           
-            for item in items:
-                item = item.strip()                
-                # Try to match with variant first
-                match = re.match(regex_with_variant, item)
-                if match:
-                    parsed_items.append({
-                        "item_name": match.group("item_name").strip(),
-                        "variant": match.group("variant").strip(),
-                        "size": match.group("size").strip(),
-                        "price": float(match.group("price").strip())
-                    })
-                    continue
-               
-                # If no match, try without variant
-                match = re.match(regex_without_variant, item)
-                if match:
-                    parsed_items.append({
-                        "item_name": match.group("item_name").strip(),
-                        "variant": None,  # No variant available
-                        "size": match.group("size").strip(),
-                        "price": float(match.group("price").strip())
-                    })
-                    continue
-                else:
-                # Log unmatched items
-                    print(f"Item format not matched: {item}")
-            return parsed_items
-        except Exception as e:
-            print(f"Error parsing items: {e}")        
-        return parsed_items
 
 
 
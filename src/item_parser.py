@@ -0,0 +1,71 @@
+from collections import namedtuple
+import functools
+import re
+
+# One pass recognises both "Large Latte - 2.45" and "Large Flavoured latte - Vanilla - 2.85"
+ITEM_PATTERN = re.compile(
+    r"(?P<size>\w+)\s+(?P<item_name>[a-zA-Z\s]+?)\s+-\s+"
+    r"(?:(?P<variant>[a-zA-Z\s]+?)\s+-\s+)?"
+    r"(?P<price>[0-9.]+)"
+)
+
+# The menu is small, so a few hundred distinct item strings covers every branch
+ITEM_CACHE_SIZE = 512
+PRODUCT_CACHE_SIZE = 256
+
+# Immutable product record shared by every occurrence of the same item.
+# Field order matches the (name, variant, size, price) natural key used by normalize.
+Product = namedtuple("Product", ["item_name", "variant", "size", "price"])
+
+
+@functools.lru_cache(maxsize=PRODUCT_CACHE_SIZE)
+def intern_product(item_name, variant, size, price):
+    """
+    Returns the single shared Product for a (name, variant, size, price) combination.
+    :return: Product record.
+    """
+    return Product(item_name, variant, size, price)
+
+
+@functools.lru_cache(maxsize=ITEM_CACHE_SIZE)
+def parse_item(item):
+    """
+    Parses a single stripped basket item, memoizing repeated item strings.
+    :param item: An item string such as "Large Latte - 2.45".
+    :return: Interned Product, or None if the item is not recognised.
+    """
+    match = ITEM_PATTERN.fullmatch(item)
+    if match is None:
+        return None
+    size, item_name, variant, price = match.group("size", "item_name", "variant", "price")
+    return intern_product(item_name, variant, size, float(price))
+
+
+def parse_products(items_column):
+    """
+    Parses the items column into the shared Product records for each item.
+    :param items_column: A string containing items, sizes, and prices.
+    :return: A list of Product records, one per recognised item.
+    """
+    products = []
+    try:
+        for item in items_column.split(','):
+            item = item.strip()
+            product = parse_item(item)
+            if product is None:
+                # Log unmatched items
+                print(f"Item format not matched: {item}")
+                continue
+            products.append(product)
+    except Exception as e:
+        print(f"Error parsing items: {e}")
+    return products
+
+
+def parse_items(items_column):
+    """
+    Parses the items column into a structured list of items with name, size, variant (if present), and price.
+    :param items_column: A string containing items, sizes, and prices.
+    :return: A list of dictionaries with parsed item details.
+    """
+    return [product._asdict() for product in parse_products(items_column)]
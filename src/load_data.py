@@ -2,6 +2,9 @@ import psycopg2
 import json
 from dotenv import load_dotenv
 import os
+import columnar
+from utils import sql_utils
+from utils.sql_utils import ensure_month_partitions, insert_rows
 
 # Load environment variables
 load_dotenv()
@@ -40,25 +43,35 @@ def load_json(file_path):
         return None
 
 # Insert data into tables
-def insert_data(connection, table_name, data):
+def insert_data(connection, table_name, data, page_size=None):
     """
-    Inserts data into the specified table.
+    Inserts data into the specified table in pages of multi-row INSERT statements.
     :param connection: psycopg2 connection object.
     :param table_name: Name of the table to insert data into.
-    :param data: List of dictionaries representing the data.
+    :param data: List of dictionaries representing the data, or a columnar.ColumnarTable.
+    :param page_size: Rows per statement, defaults to sql_utils.DEFAULT_INSERT_PAGE_SIZE.
+    :return: Number of statements sent to the database.
     """
+    if not data:
+        print(f"No data to insert into {table_name}")
+        return 0
+
     try:
         with connection.cursor() as cursor:
-            # Dynamically create INSERT statement based on data keys
-            for row in data:
-                columns = ", ".join(row.keys())
-                values = ", ".join([f"%({key})s" for key in row.keys()])
-                insert_query = f"INSERT INTO {table_name} ({columns}) VALUES ({values})"
-                cursor.execute(insert_query, row)
+            if table_name == "transactions":
+                # transactions is partitioned by month in the local Postgres schema
+                ensure_month_partitions(cursor, data)
+            # Build the INSERT statement once from the first row's keys
+            columns = columnar.table_columns(data)
+            rows = columnar.table_rows(data, columns)
+            round_trips = insert_rows(cursor, table_name, columns, rows, page_size)
             connection.commit()
-            print(f"Data successfully inserted into {table_name}")
+            print(f"Data successfully inserted into {table_name} ({len(data)} rows, {round_trips} statements)")
+            return round_trips
     except Exception as e:
         connection.rollback()
+        # Partitions created in the rolled back transaction are gone again
+        sql_utils._partitions_ready.clear()
         print(f"Error inserting data into {table_name}: {e}")
 
 # Main execution block
@@ -1,6 +1,10 @@
 import json
 import csv
+import textwrap
 from datetime import datetime
+import columnar
+from timestamps import parse_timestamp
+from utils import parquet_utils
 
 # Normalization Functions
 def normalize_branches(data):
@@ -20,7 +24,7 @@ def normalize_transactions(data):
        transactions.append({
            "payment_id": i,
            "branch_id": 1,  # Assuming all transactions are from Edinburgh
-           "timestamp": datetime.strptime(row["timestamp"], "%d/%m/%Y %H:%M"),
+           "timestamp": parse_timestamp(row["timestamp"]),
            "total_amount": row["total_cost"],
            "payment_method": row["payment_method"]
        })
@@ -52,13 +56,17 @@ def normalize_product_transactions(data, products):
    product_transactions = []
    product_transactions_id = 1
    for i, row in enumerate(data, start=1):  # i is the payment_id
+       # The same product bought twice in one basket is one row with quantity 2
+       quantities = {}
        for item in row["items"]:
            product_key = (item["item_name"], item["variant"], item["size"], item["price"])
+           quantities[product_key] = quantities.get(product_key, 0) + 1
+       for product_key, quantity in quantities.items():
            product_transactions.append({
                "product_transactions_id": product_transactions_id,
                "payment_id": i,
                "product_id": product_map[product_key],
-               "quantity": 1  # Assuming quantity = 1 for now
+               "quantity": quantity
            })
            product_transactions_id += 1
    return product_transactions
@@ -68,7 +76,7 @@ def normalize_product_transactions(data, products):
 def save_data_to_json(data, file_path):
    """
    Saves the given data to a JSON file.
-   :param data: The data to save (list of dictionaries).
+   :param data: The data to save (list of dictionaries or a columnar.ColumnarTable).
    :param file_path: The path to save the JSON file.
    """
    def custom_serializer(obj):
@@ -79,28 +87,58 @@ def save_data_to_json(data, file_path):
 
    try:
        with open(file_path, "w") as file:
-           json.dump(data, file, indent=4, default=custom_serializer)
+           if isinstance(data, columnar.ColumnarTable):
+               write_json_records(file, data, custom_serializer)
+           else:
+               json.dump(data, file, indent=4, default=custom_serializer)
        print(f"Data successfully saved to {file_path} (JSON)")
    except Exception as e:
        print(f"Error saving JSON file: {e}")
 
 
+def write_json_records(file, data, serializer):
+   """
+   Writes the rows of a table one at a time, in the same layout as json.dump(rows, indent=4),
+   so the whole table never has to exist as dictionaries.
+   """
+   file.write("[")
+   for row_number, row in enumerate(data):
+       file.write(",\n" if row_number else "\n")
+       file.write(textwrap.indent(json.dumps(row, indent=4, default=serializer), "    "))
+   file.write("\n]" if len(data) else "]")
+
+
 def save_data_to_csv(data, file_path):
    """
    Saves the given data to a CSV file.
-   :param data: The data to save (list of dictionaries).
+   :param data: The data to save (list of dictionaries or a columnar.ColumnarTable).
    :param file_path: The path to save the CSV file.
    """
    try:
        with open(file_path, "w", newline="") as file:
-           writer = csv.DictWriter(file, fieldnames=data[0].keys())
-           writer.writeheader()
-           writer.writerows(data)
+           columns = columnar.table_columns(data)
+           writer = csv.writer(file)
+           writer.writerow(columns)
+           writer.writerows(columnar.table_rows(data, columns))
        print(f"Data successfully saved to {file_path} (CSV)")
    except Exception as e:
        print(f"Error saving CSV file: {e}")
 
 
+def save_data_to_parquet(tables, out_dir):
+   """
+   Saves the normalized tables as Parquet under out_dir, one folder per table, with the
+   transactions and product_transactions partitioned by branch and date. Needs pyarrow.
+   :param tables: Dictionary of table name -> data (lists of dictionaries or columnar.ColumnarTable).
+   :param out_dir: The folder to save the Parquet files in.
+   """
+   try:
+       file_paths = parquet_utils.write_tables(tables, out_dir)
+       print(f"Data successfully saved to {out_dir} (Parquet, {len(file_paths)} files)")
+   except Exception as e:
+       print(f"Error saving Parquet files: {e}")
+
+
 # Function to Load JSON Data
 def load_json_data(file_path):
    """
@@ -157,5 +195,14 @@ if __name__ == "__main__":
        save_data_to_csv(transactions_table, f"{base_path}{file_names['transactions']}.csv")
        save_data_to_csv(products_table, f"{base_path}{file_names['products']}.csv")
        save_data_to_csv(product_transactions_table, f"{base_path}{file_names['product_transactions']}.csv")
+
+
+       # Save data as Parquet
+       save_data_to_parquet({
+           "branches": branches_table,
+           "transactions": transactions_table,
+           "products": products_table,
+           "product_transactions": product_transactions_table,
+       }, f"{base_path}parquet")
    else:
        print("Failed to load JSON data.")
\ No newline at end of file
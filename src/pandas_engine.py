@@ -0,0 +1,192 @@
+# Columnar alternative to the row-by-row extract/transform/normalize in etl.py.
+# Produces the same tables as etl.normalize(columnar_tables=True), but with vectorised pandas
+# operations over the whole file. Timestamps and basket items repeat a lot, so they are
+# factorized and only their distinct values are parsed.
+# It only pays off on large runs: importing pandas costs ~90 MB and makes small files slower
+# than with the python engine (benchmarks/bench_pipeline.py --engine python pandas).
+
+from array import array
+import io
+import logging
+
+import numpy as np
+import pandas as pd
+
+import columnar
+from etl import COLUMN_NAMES
+from item_parser import ITEM_PATTERN
+from timestamps import TIMESTAMP_FORMAT
+from utils import metrics_utils
+
+LOGGER = logging.getLogger()
+LOGGER.setLevel(logging.INFO)
+
+# Same single-pass item pattern as item_parser, anchored because str.extract searches
+ITEM_REGEX = f"^{ITEM_PATTERN.pattern}$"
+PRODUCT_KEY_COLUMNS = ["item_name", "variant", "size", "price"]
+
+
+@metrics_utils.timed('extract', rows=len)
+def extract_frame(body_text):
+    """
+    Reads a branch file into a DataFrame of strings, skipping the first row like etl.extract.
+    :param body_text: Iterable of CSV lines, or an open file.
+    :return: DataFrame with COLUMN_NAMES columns.
+    """
+    LOGGER.info('extract_frame: starting')
+    source = body_text if hasattr(body_text, 'read') else io.StringIO(''.join(body_text))
+    frame = pd.read_csv(
+        source,
+        header=None,
+        names=COLUMN_NAMES,
+        skiprows=1,
+        dtype=str,
+        keep_default_na=False,
+    )
+    LOGGER.info(f'extract_frame: done: rows={len(frame)}')
+    return frame
+
+
+@metrics_utils.timed('transform', rows=lambda frames: len(frames[0]))
+def transform_frame(frame):
+    """
+    Parses timestamps, totals and basket items for a whole file at once and drops the sensitive columns.
+    :param frame: DataFrame from extract_frame.
+    :return: Tuple of (transactions DataFrame, items DataFrame). Items are one row per basket
+        item, in file order, with the payment_id of their transaction and a product_key
+        shared by every item of the same product.
+    """
+    LOGGER.info('transform_frame: starting')
+    # A file has one timestamp per minute, so parse each distinct one once
+    timestamp_codes, timestamp_uniques = pd.factorize(frame["timestamp"].to_numpy())
+    timestamps = pd.to_datetime(pd.Series(timestamp_uniques, dtype=object), format=TIMESTAMP_FORMAT)
+    transactions = pd.DataFrame({
+        "timestamp": timestamps.dt.strftime("%Y-%m-%d %H:%M:%S").to_numpy(dtype=object)[timestamp_codes],
+        "location": frame["location"].to_numpy(),
+        "total_cost": frame["total_cost"].astype(float).to_numpy(),
+        "payment_method": frame["payment_method"].to_numpy(),
+    })
+
+    exploded = frame["items"].reset_index(drop=True).str.split(",").explode()
+    # The menu is small, so run the item pattern over the distinct item strings only
+    item_codes, item_uniques = pd.factorize(exploded.to_numpy())
+    unique_items = pd.Series(item_uniques, dtype=object).str.strip()
+    parsed = unique_items.str.extract(ITEM_REGEX)
+    matched = parsed["price"].notna().to_numpy()
+    for item in unique_items.to_numpy()[item_codes[~matched[item_codes]]]:
+        # Log unmatched items
+        print(f"Item format not matched: {item}")
+
+    parsed = parsed[matched]
+    parsed_codes = np.full(len(matched), -1)
+    parsed_codes[matched] = np.arange(len(parsed))
+    product_keys = parsed.groupby(PRODUCT_KEY_COLUMNS, sort=False, dropna=False).ngroup().to_numpy()
+
+    occurrences = matched[item_codes]
+    item_parsed_codes = parsed_codes[item_codes[occurrences]]
+    items = pd.DataFrame({
+        "payment_id": exploded.index.to_numpy()[occurrences] + 1,
+        "product_key": product_keys[item_parsed_codes],
+        "item_name": parsed["item_name"].to_numpy(dtype=object)[item_parsed_codes],
+        "variant": parsed["variant"].astype(object).where(parsed["variant"].notna(), None).to_numpy()[item_parsed_codes],
+        "size": parsed["size"].to_numpy(dtype=object)[item_parsed_codes],
+        "price": parsed["price"].astype(float).to_numpy()[item_parsed_codes],
+    })
+    LOGGER.info(f'transform_frame: done: rows={len(transactions)} items={len(items)}')
+    return transactions, items
+
+
+def _columnar_table(table_name, columns):
+    """
+    Copies whole arrays into a columnar.ColumnarTable without building any row.
+    :param columns: Dictionary of column name -> array-like, for every column of the table.
+    """
+    table = columnar.new_table(table_name)
+    for name, kind in columnar.TABLE_SCHEMAS[table_name]:
+        values = columns[name]
+        if kind == columnar.INT:
+            column = array(kind, np.asarray(values, dtype=np.intc).tobytes())
+        elif kind == columnar.FLOAT:
+            column = array(kind, np.asarray(values, dtype=np.float64).tobytes())
+        else:
+            codes, uniques = pd.factorize(np.asarray(values, dtype=object), use_na_sentinel=False)
+            column = columnar.dict_column(array(columnar.INT, codes.astype(np.intc).tobytes()),
+                                          [None if pd.isna(value) else value for value in uniques])
+        table.columns[name] = column
+    return table
+
+
+@metrics_utils.timed('normalize', rows=lambda tables: len(tables['transactions']))
+def normalize_frames(transactions, items):
+    """
+    Builds the four relational tables with factorize/bincount instead of dictionary lookups.
+    Ids are assigned in order of first appearance, matching etl.normalize.
+    :return: Dictionary of normalized tables as columnar.ColumnarTable.
+    """
+    LOGGER.info('normalize_frames: starting')
+    branch_codes, branch_names = pd.factorize(transactions["location"].to_numpy())
+
+    product_codes, product_keys = pd.factorize(items["product_key"].to_numpy())
+    first_positions = np.unique(product_codes, return_index=True)[1]
+    # One row per product per transaction, in order of first appearance like etl.normalize
+    stride = len(product_keys) + 1
+    pair_codes, pairs = pd.factorize(items["payment_id"].to_numpy(dtype=np.int64) * stride + product_codes)
+    quantities = np.bincount(pair_codes, minlength=len(pairs))
+
+    tables = {
+        "branches": _columnar_table("branches", {
+            "branch_id": np.arange(1, len(branch_names) + 1),
+            "name": branch_names,
+            "location": branch_names,
+        }),
+        "transactions": _columnar_table("transactions", {
+            "payment_id": np.arange(1, len(transactions) + 1),
+            "branch_id": branch_codes + 1,
+            "timestamp": transactions["timestamp"].to_numpy(),
+            "total_amount": transactions["total_cost"].to_numpy(),
+            "payment_method": transactions["payment_method"].to_numpy(),
+        }),
+        "products": _columnar_table("products", {
+            "product_id": np.arange(1, len(product_keys) + 1),
+            "name": items["item_name"].to_numpy()[first_positions],
+            "variant": items["variant"].to_numpy()[first_positions],
+            "size": items["size"].to_numpy()[first_positions],
+            "price": items["price"].to_numpy()[first_positions],
+        }),
+        "product_transactions": _columnar_table("product_transactions", {
+            "product_transactions_id": np.arange(1, len(pairs) + 1),
+            "payment_id": pairs // stride,
+            "product_id": pairs % stride + 1,
+            "quantity": quantities,
+        }),
+    }
+    LOGGER.info('normalize_frames: done')
+    return tables
+
+
+def normalize_extracted(frames):
+    """
+    Transforms and normalizes the frames of one or more branch files as a single load.
+    :param frames: List of DataFrames from extract_frame.
+    :return: Dictionary of normalized tables, as etl.normalize(columnar_tables=True) returns.
+    """
+    frame = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=COLUMN_NAMES)
+    return normalize_frames(*transform_frame(frame))
+
+
+def normalize_files(bodies):
+    """
+    Runs the columnar engine over one or more branch files as a single load.
+    :param bodies: Iterable of line iterables or open files, one per branch file.
+    :return: Dictionary of normalized tables, as etl.normalize(columnar_tables=True) returns.
+    """
+    return normalize_extracted([extract_frame(body_text) for body_text in bodies])
+
+
+def normalize_file(body_text):
+    """
+    Runs the columnar engine over a single branch file.
+    :param body_text: Iterable of CSV lines, or an open file.
+    :return: Dictionary of normalized tables, as etl.normalize(columnar_tables=True) returns.
+    """
+    return normalize_files([body_text])
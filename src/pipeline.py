@@ -0,0 +1,166 @@
+from concurrent.futures import ThreadPoolExecutor
+import logging
+import os
+import queue
+import threading
+
+import etl
+from utils import s3_utils
+
+LOGGER = logging.getLogger()
+LOGGER.setLevel(logging.INFO)
+
+# Files downloaded and parsed at once when an event carries several records
+MAX_WORKERS = int(os.environ.get('ETL_MAX_WORKERS', 4))
+
+# Rows a file's worker may read ahead of the load, so a multi-file event holds at most
+# MAX_WORKERS * FILE_BUFFER_ROWS transformed rows in memory
+FILE_BUFFER_ROWS = int(os.environ.get('ETL_FILE_BUFFER_ROWS', 1000))
+
+# Put by transform_file after a file's last row
+_END_OF_FILE = object()
+
+# 'python' streams rows through etl; 'pandas' runs pandas_engine over whole files.
+# pandas is not packaged for Lambda (requirements-lambda.txt), so 'pandas' is local-only.
+ENGINE_PYTHON = 'python'
+ENGINE_PANDAS = 'pandas'
+ENGINE = os.environ.get('ETL_ENGINE', ENGINE_PYTHON)
+
+# Set by the Lambda runtime
+LAMBDA_FUNCTION_ENV_VAR_NAME = 'AWS_LAMBDA_FUNCTION_NAME'
+
+# Emit columnar.ColumnarTable batches from the python engine instead of lists of dictionaries
+COLUMNAR_TABLES = os.environ.get('ETL_COLUMNAR_TABLES', '').lower() in ('1', 'true', 'yes')
+
+
+def _put(buffer, item, stop):
+    # Waits for room in buffer, giving up once the reader has stopped
+    while not stop.is_set():
+        try:
+            buffer.put(item, timeout=0.1)
+            return True
+        except queue.Full:
+            pass
+    return False
+
+
+def transform_file(bucket_name, file_path, buffer, stop):
+    """
+    Streams, extracts and transforms one branch file into buffer, ending with _END_OF_FILE,
+    or with the exception that stopped it.
+    :param buffer: Bounded queue.Queue read by iter_transformed_rows.
+    :param stop: threading.Event set when nobody reads buffer any more.
+    """
+    LOGGER.info(f'transform_file: starting file={file_path}')
+    try:
+        csv_lines = s3_utils.stream_file(bucket_name, file_path)
+        for row in etl.iter_transform(etl.iter_extract(csv_lines)):
+            if not _put(buffer, row, stop):
+                return
+    except Exception as err:
+        _put(buffer, err, stop)
+        return
+    _put(buffer, _END_OF_FILE, stop)
+
+
+def iter_transformed_rows(file_infos, reports, max_workers=MAX_WORKERS, buffer_rows=FILE_BUFFER_ROWS):
+    """
+    Yields the transformed rows of every file in an event, in event order.
+    A single file is streamed straight through. Several files are streamed by a bounded
+    thread pool so their network waits overlap, each reading at most buffer_rows rows
+    ahead. A file that fails is reported as failed and the others are still loaded; the
+    rows it yielded before failing stay in the load, and the retry adds the rest.
+    :param file_infos: List of (bucket_name, file_path) from s3_utils.get_file_infos.
+    :param reports: List that receives one status dictionary per file.
+    :param max_workers: Maximum files processed at once.
+    :param buffer_rows: Maximum rows read ahead per file.
+    :return: Generator of transformed rows.
+    """
+    if len(file_infos) == 1:
+        bucket_name, file_path = file_infos[0]
+        report = {'bucket': bucket_name, 'file': file_path, 'status': 'ok', 'rows': 0}
+        reports.append(report)
+        csv_lines = s3_utils.stream_file(bucket_name, file_path)
+        for row in etl.iter_transform(etl.iter_extract(csv_lines)):
+            report['rows'] += 1
+            yield row
+        return
+
+    stop = threading.Event()
+    buffers = [queue.Queue(maxsize=buffer_rows) for _ in file_infos]
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(file_infos))) as executor:
+        try:
+            for (bucket_name, file_path), buffer in zip(file_infos, buffers):
+                executor.submit(transform_file, bucket_name, file_path, buffer, stop)
+            for (bucket_name, file_path), buffer in zip(file_infos, buffers):
+                report = {'bucket': bucket_name, 'file': file_path, 'status': 'ok', 'rows': 0}
+                reports.append(report)
+                for row in iter(buffer.get, _END_OF_FILE):
+                    if isinstance(row, Exception):
+                        LOGGER.error(f'iter_transformed_rows: failure: error={row}, file={file_path}')
+                        report.update(status='failed', error=str(row))
+                        break
+                    report['rows'] += 1
+                    yield row
+        finally:
+            # Lets the workers of an abandoned event finish instead of waiting for room
+            stop.set()
+            executor.shutdown(cancel_futures=True)
+
+
+def iter_file_results(file_infos, reports, work, max_workers=MAX_WORKERS):
+    """
+    Runs work(bucket_name, file_path) for every file in a bounded thread pool.
+    :param work: Function returning a sized result (e.g. a DataFrame) for one file.
+    :return: Generator of the results of the files that succeeded, in event order.
+    """
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(file_infos))) as executor:
+        futures = [executor.submit(work, bucket_name, file_path) for bucket_name, file_path in file_infos]
+        for (bucket_name, file_path), future in zip(file_infos, futures):
+            try:
+                result = future.result()
+            except Exception as err:
+                LOGGER.error(f'iter_file_results: failure: error={err}, file={file_path}')
+                reports.append({'bucket': bucket_name, 'file': file_path, 'status': 'failed', 'error': str(err)})
+                continue
+            reports.append({'bucket': bucket_name, 'file': file_path, 'status': 'ok', 'rows': len(result)})
+            yield result
+
+
+def iter_normalized_batches(file_infos, reports, batch_size, engine=ENGINE, max_workers=MAX_WORKERS,
+                            columnar_tables=COLUMNAR_TABLES):
+    """
+    Normalizes every file in an event with the selected engine.
+    The python engine streams batches of batch_size transactions; the pandas engine
+    works on whole files and yields everything as one batch, and only runs locally.
+    :return: Generator of dictionaries of normalized tables.
+    """
+    if engine == ENGINE_PANDAS:
+        if os.environ.get(LAMBDA_FUNCTION_ENV_VAR_NAME):
+            raise ValueError(f'iter_normalized_batches: ETL_ENGINE={engine} is local-only, pandas is not packaged for Lambda')
+        # Imported here so the default engine never pays for loading pandas
+        import pandas_engine
+
+        def extract_file_frame(bucket_name, file_path):
+            return pandas_engine.extract_frame(s3_utils.stream_file(bucket_name, file_path))
+
+        frames = list(iter_file_results(file_infos, reports, extract_file_frame, max_workers))
+        yield pandas_engine.normalize_extracted(frames)
+        return
+
+    rows = iter_transformed_rows(file_infos, reports, max_workers)
+    yield from etl.iter_normalize(rows, batch_size, columnar_tables)
+
+
+def log_reports(reports):
+    for report in reports:
+        if report['status'] == 'ok':
+            LOGGER.info(f"lambda_handler: file={report['file']} status=ok rows={report['rows']}")
+        else:
+            LOGGER.error(f"lambda_handler: file={report['file']} status=failed error={report['error']}")
+    LOGGER.info(
+        'lambda_handler: files=%d failed=%d rows=%d',
+        len(reports),
+        sum(report['status'] == 'failed' for report in reports),
+        sum(report.get('rows', 0) for report in reports),
+    )
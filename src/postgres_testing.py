@@ -0,0 +1,24 @@
+# Helpers shared by the test modules that run against the local Postgres from
+# docker-compose.yml; those tests skip themselves when it is not running.
+
+import os
+
+SCHEMA_FILE = os.path.join(os.path.dirname(__file__), "..", "database", "create_schema.sql")
+
+
+def connect_to_test_database():
+    """
+    :return: A connection to the local Postgres from docker-compose.yml, or None if it is not running.
+    """
+    try:
+        import psycopg2
+        return psycopg2.connect(
+            user=os.getenv("POSTGRES_USER"),
+            password=os.getenv("POSTGRES_PASSWORD"),
+            host="localhost",
+            port="5432",
+            database=os.getenv("POSTGRES_DB"),
+            connect_timeout=3,
+        )
+    except Exception:
+        return None
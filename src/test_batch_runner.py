@@ -0,0 +1,101 @@
+import contextlib
+import io
+import os
+import shutil
+import tempfile
+import unittest
+from unittest.mock import patch, MagicMock
+
+import batch_runner
+from utils import manifest_utils
+
+
+CSV_TEXT = (
+    'header row\n'
+    '21/04/2024 09:00,Leeds,Zoe,"Large Latte - 2.45",2.45,CARD,1234\n'
+    '21/04/2024 09:01,Leeds,Ann,"Regular Latte - 2.15",2.15,CASH,\n'
+)
+
+
+class TestBatchRunner(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        for name in ["leeds_21-04-2024_09-00-00.csv", "york_21-04-2024_09-00-00.csv", "branches.csv"]:
+            with open(os.path.join(self.directory, name), "w", newline="") as file:
+                file.write(CSV_TEXT)
+
+    def test_expand_paths_only_picks_branch_files(self):
+        file_paths = batch_runner.expand_paths([self.directory])
+        self.assertEqual([os.path.basename(path) for path in file_paths],
+                         ["leeds_21-04-2024_09-00-00.csv", "york_21-04-2024_09-00-00.csv"])
+        self.assertEqual(batch_runner.expand_paths([os.path.join(self.directory, "york_*.csv")]),
+                         file_paths[1:])
+
+    def test_run_files_without_connection_reports_each_file(self):
+        file_paths = batch_runner.expand_paths([self.directory])
+        with contextlib.redirect_stdout(io.StringIO()):
+            reports = batch_runner.run_files(file_paths, workers=2)
+
+        self.assertEqual([report["status"] for report in reports], ["ok", "ok"])
+        self.assertEqual([report["rows"] for report in reports], [2, 2])
+
+    @patch("batch_runner.load_utils")
+    def test_run_files_loads_every_file_through_one_connection(self, mock_load_utils):
+        file_paths = batch_runner.expand_paths([self.directory])
+        mock_connection = MagicMock()
+        with contextlib.redirect_stdout(io.StringIO()):
+            batch_runner.run_files(file_paths, workers=2, connection=mock_connection)
+
+        mock_connection.cursor.assert_called_once()
+        self.assertEqual(mock_load_utils.load_batch.call_count, 2)
+        self.assertEqual(mock_load_utils.commit_load.call_count, 2)
+
+    @patch("batch_runner.load_utils")
+    def test_warehouse_ledger_is_written_before_the_load_commits(self, mock_load_utils):
+        file_paths = batch_runner.expand_paths([os.path.join(self.directory, "leeds_*.csv")])
+        mock_connection = MagicMock()
+        mock_cursor = mock_connection.cursor.return_value
+        mock_cursor.fetchone.return_value = None
+        events = []
+        mock_cursor.execute.side_effect = lambda query, *args: events.append(query.split()[0])
+        mock_load_utils.commit_load.side_effect = lambda *args: events.append("commit_load")
+        with contextlib.redirect_stdout(io.StringIO()):
+            reports = batch_runner.run_files(file_paths, workers=1, connection=mock_connection,
+                                             manifest=(mock_connection, mock_cursor))
+
+        self.assertEqual(reports[0]["status"], "ok")
+        self.assertEqual(events[-2:], ["INSERT", "commit_load"])
+        mock_connection.commit.assert_not_called()
+
+    @patch("batch_runner.load_utils")
+    def test_failed_load_is_rolled_back(self, mock_load_utils):
+        file_paths = batch_runner.expand_paths([self.directory])
+        mock_connection = MagicMock()
+        mock_load_utils.load_batch.side_effect = [Exception("COPY failed"), None]
+        with contextlib.redirect_stdout(io.StringIO()):
+            reports = batch_runner.run_files(file_paths, workers=1, connection=mock_connection)
+
+        self.assertEqual([report["status"] for report in reports], ["failed", "ok"])
+        mock_load_utils.abort_load.assert_called_once_with(mock_connection)
+
+    def test_manifest_skips_files_already_processed(self):
+        file_paths = batch_runner.expand_paths([self.directory])
+        manifest = manifest_utils.open_sqlite_manifest(os.path.join(self.directory, "ledger.sqlite"))
+        self.addCleanup(manifest[0].close)
+        with contextlib.redirect_stdout(io.StringIO()):
+            first = batch_runner.run_files(file_paths, workers=1, manifest=manifest)
+            second = batch_runner.run_files(file_paths, workers=1, manifest=manifest)
+
+        self.assertEqual([report["status"] for report in first], ["ok", "ok"])
+        self.assertEqual([report["status"] for report in second], ["skipped", "skipped"])
+
+    def test_missing_file_is_reported_as_failed(self):
+        with contextlib.redirect_stdout(io.StringIO()):
+            reports = batch_runner.run_files([os.path.join(self.directory, "missing_01-01-2024_09-00-00.csv")], workers=1)
+        self.assertEqual(reports[0]["status"], "failed")
+
+
+if __name__ == "__main__":
+    unittest.main()
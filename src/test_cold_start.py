@@ -0,0 +1,19 @@
+import os
+import subprocess
+import sys
+import unittest
+
+
+class TestColdStart(unittest.TestCase):
+
+    def test_handler_import_defers_heavy_modules(self):
+        # A fresh interpreter, so modules imported by other tests do not count
+        check = ("import sys, cafe_etl_lambda; "
+                 "print(','.join(m for m in ('boto3', 'psycopg2', 'pandas', 'sqlite3') if m in sys.modules))")
+        result = subprocess.run([sys.executable, "-c", check], cwd=os.path.dirname(os.path.abspath(__file__)),
+                                capture_output=True, text=True, check=True)
+        self.assertEqual(result.stdout.strip(), "")
+
+
+if __name__ == "__main__":
+    unittest.main()
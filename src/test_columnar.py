@@ -0,0 +1,86 @@
+import contextlib
+import io
+import os
+import unittest
+from unittest.mock import patch, MagicMock
+
+import columnar
+import etl
+from utils import dimension_utils, sql_utils
+
+
+CSV_TEXT = (
+    'header row\n'
+    '21/04/2024 09:00,Leeds,Zoe,"Large Latte - 2.45, Regular Flavoured iced latte - Hazelnut - 2.75",5.2,CARD,1234\n'
+    '21/04/2024 09:01,Chesterfield,Ann,"Large Latte - 2.45",2.45,CASH,\n'
+    '21/04/2024 09:01,Leeds,Bob,"Regular Flavoured iced latte - Hazelnut - 2.75",2.75,CARD,5678\n'
+)
+
+
+def normalize_sample(columnar_tables):
+    with contextlib.redirect_stdout(io.StringIO()):
+        return etl.normalize(etl.transform(etl.extract(io.StringIO(CSV_TEXT))), columnar_tables=columnar_tables)
+
+
+class TestDictColumn(unittest.TestCase):
+
+    def test_stores_each_distinct_value_once(self):
+        column = columnar.DictColumn()
+        for value in ["CARD", "CASH", "CARD", None, "CARD"]:
+            column.append(value)
+
+        self.assertEqual(list(column), ["CARD", "CASH", "CARD", None, "CARD"])
+        self.assertEqual(column.values, ["CARD", "CASH", None])
+        self.assertEqual(list(column.codes), [0, 1, 0, 2, 0])
+        self.assertEqual(column[3], None)
+
+
+class TestColumnarNormalize(unittest.TestCase):
+
+    def test_matches_dictionary_tables(self):
+        expected = normalize_sample(columnar_tables=False)
+        result = normalize_sample(columnar_tables=True)
+
+        for table_name, rows in expected.items():
+            self.assertIsInstance(result[table_name], columnar.ColumnarTable)
+            self.assertEqual(len(result[table_name]), len(rows))
+            self.assertEqual(list(result[table_name]), rows, table_name)
+
+    def test_known_ids_reads_columnar_dimension_tables(self):
+        tables = normalize_sample(columnar_tables=True)
+        keys = {("Leeds",): 7, ("Chesterfield",): 8}
+        with patch.dict(dimension_utils._keys, {"branches": keys}), patch.object(dimension_utils, "_snapshot_loaded", True):
+            ids = dimension_utils.known_ids(MagicMock(), "branches", tables["branches"])
+
+        self.assertEqual(ids, {1: 7, 2: 8})
+
+
+class TestColumnarLoad(unittest.TestCase):
+
+    @patch.dict(os.environ, {}, clear=True)
+    def test_copy_reads_rows_straight_from_columns(self):
+        mock_connection = MagicMock()
+        mock_connection.server_version = 160002
+        mock_cursor = MagicMock()
+        tables = normalize_sample(columnar_tables=True)
+
+        sql_utils.save_data_in_db(mock_connection, mock_cursor, "products", tables["products"])
+
+        query, buffer = mock_cursor.copy_expert.call_args.args
+        self.assertEqual(query, "COPY products (name, variant, size, price) FROM STDIN WITH (FORMAT csv)")
+        self.assertEqual(buffer.getvalue(), "Latte,,Large,2.45\nFlavoured iced latte,Hazelnut,Regular,2.75\n")
+
+    @patch.dict(os.environ, {"DB_LOAD_STRATEGY": "insert", "INSERT_PAGE_SIZE": "1"}, clear=True)
+    def test_insert_pages_columnar_rows(self):
+        mock_connection = MagicMock()
+        mock_cursor = MagicMock()
+        tables = normalize_sample(columnar_tables=True)
+
+        round_trips = sql_utils.save_data_in_db(mock_connection, mock_cursor, "products", tables["products"])
+
+        self.assertEqual(round_trips, 2)
+        self.assertEqual(mock_cursor.execute.call_args_list[1].args[1], ["Flavoured iced latte", "Hazelnut", "Regular", 2.75])
+
+
+if __name__ == "__main__":
+    unittest.main()
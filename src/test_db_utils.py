@@ -0,0 +1,122 @@
+import json
+import unittest
+from unittest.mock import patch
+
+import psycopg2
+
+from utils import db_utils
+
+REDSHIFT_DETAILS = {
+    "host": "localhost",
+    "port": 5439,
+    "database-name": "cafe",
+    "user": "etl",
+    "password": "secret",
+}
+
+
+class FakeSSMClient:
+    def __init__(self):
+        self.calls = 0
+
+    def get_parameter(self, Name):
+        self.calls += 1
+        return {"Parameter": {"Value": json.dumps(REDSHIFT_DETAILS)}}
+
+
+class FakeCursor:
+    def __init__(self, connection):
+        self.connection = connection
+
+    def execute(self, query):
+        self.connection.queries += 1
+        if self.connection.error:
+            raise self.connection.error
+
+    def fetchone(self):
+        return (1,)
+
+
+class FakeConnection:
+    def __init__(self):
+        self.closed = 0
+        self.error = None
+        self.queries = 0
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        self.closed = 1
+
+
+class TestDbUtilsCaching(unittest.TestCase):
+
+    def setUp(self):
+        db_utils._ssm_cache.clear()
+        db_utils.close_connection()
+        self.connections = []
+
+    def tearDown(self):
+        db_utils.close_connection()
+
+    def fake_connect(self, **kwargs):
+        connection = FakeConnection()
+        self.connections.append(connection)
+        return connection
+
+    def test_get_ssm_param_is_cached_until_ttl_expires(self):
+        fake_ssm = FakeSSMClient()
+        with patch.object(db_utils, "get_ssm_client", return_value=fake_ssm), \
+                patch.object(db_utils.time, "monotonic", return_value=1000.0) as mock_monotonic:
+            self.assertEqual(db_utils.get_ssm_param("param"), REDSHIFT_DETAILS)
+            db_utils.get_ssm_param("param")
+            self.assertEqual(fake_ssm.calls, 1)
+
+            mock_monotonic.return_value = 1000.0 + db_utils.SSM_CACHE_TTL_SECONDS + 1
+            db_utils.get_ssm_param("param")
+            self.assertEqual(fake_ssm.calls, 2)
+
+    def test_get_connection_and_cursor_reuses_live_connection(self):
+        with patch.object(psycopg2, "connect", side_effect=self.fake_connect):
+            first, _ = db_utils.get_connection_and_cursor(REDSHIFT_DETAILS)
+            second, _ = db_utils.get_connection_and_cursor(REDSHIFT_DETAILS)
+
+        self.assertIs(first, second)
+        self.assertEqual(len(self.connections), 1)
+        self.assertEqual(first.queries, 1)  # one SELECT 1 liveness check
+
+    def test_get_connection_and_cursor_reconnects_when_broken(self):
+        with patch.object(psycopg2, "connect", side_effect=self.fake_connect):
+            first, _ = db_utils.get_connection_and_cursor(REDSHIFT_DETAILS)
+            first.error = psycopg2.OperationalError("server closed the connection unexpectedly")
+            second, _ = db_utils.get_connection_and_cursor(REDSHIFT_DETAILS)
+
+        self.assertIsNot(first, second)
+        self.assertEqual(len(self.connections), 2)
+        self.assertTrue(first.closed)
+
+    def test_get_connection_and_cursor_reconnects_on_any_driver_error(self):
+        with patch.object(psycopg2, "connect", side_effect=self.fake_connect):
+            first, _ = db_utils.get_connection_and_cursor(REDSHIFT_DETAILS)
+            first.error = psycopg2.DatabaseError("SSL SYSCALL error: EOF detected")
+            second, _ = db_utils.get_connection_and_cursor(REDSHIFT_DETAILS)
+
+        self.assertIsNot(first, second)
+        self.assertTrue(first.closed)
+
+    def test_get_connection_and_cursor_reconnects_when_closed(self):
+        with patch.object(psycopg2, "connect", side_effect=self.fake_connect):
+            first, _ = db_utils.get_connection_and_cursor(REDSHIFT_DETAILS)
+            first.close()
+            db_utils.get_connection_and_cursor(REDSHIFT_DETAILS)
+
+        self.assertEqual(len(self.connections), 2)
+        self.assertEqual(first.queries, 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
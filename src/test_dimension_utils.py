@@ -0,0 +1,83 @@
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from utils import dimension_utils
+
+
+class FakeWarehouse:
+    """Cursor stand-in backed by in-memory dimension tables."""
+
+    def __init__(self, branches=(), products=()):
+        self.tables = {"branches": list(branches), "products": list(products)}
+        self.selects = 0
+        self._result = []
+
+    def execute(self, query):
+        self.selects += 1
+        table_name = "branches" if "FROM branches" in query else "products"
+        self._result = self.tables[table_name]
+
+    def fetchall(self):
+        return list(self._result)
+
+
+PRODUCTS = [{"product_id": 1, "name": "Latte", "variant": None, "size": "Large", "price": 2.45},
+            {"product_id": 2, "name": "Chai latte", "variant": None, "size": "Large", "price": 2.6}]
+
+
+@patch.dict(os.environ, {}, clear=True)
+class TestKnownIds(unittest.TestCase):
+
+    def setUp(self):
+        dimension_utils._keys = {"branches": {}, "products": {}}
+        dimension_utils._snapshot_loaded = False
+
+    def test_existing_members_map_to_warehouse_ids(self):
+        warehouse = FakeWarehouse(products=[(3, "Latte", None, "Large", 2.45), (9, "Chai latte", None, "Large", 2.6)])
+
+        self.assertEqual(dimension_utils.known_ids(warehouse, "products", PRODUCTS), {1: 3, 2: 9})
+
+        # A later load with the same members is resolved from memory without queries
+        self.assertEqual(dimension_utils.known_ids(warehouse, "products", PRODUCTS[1:]), {2: 9})
+        self.assertEqual(warehouse.selects, 1)
+
+    def test_new_member_needs_staging(self):
+        warehouse = FakeWarehouse(products=[(3, "Latte", None, "Large", 2.45)])
+
+        self.assertIsNone(dimension_utils.known_ids(warehouse, "products", PRODUCTS))
+
+        # Read again once the load has added it
+        warehouse.tables["products"].append((4, "Chai latte", None, "Large", 2.6))
+        self.assertEqual(dimension_utils.known_ids(warehouse, "products", PRODUCTS), {1: 3, 2: 4})
+        self.assertEqual(warehouse.selects, 2)
+
+    def test_forgotten_keys_are_read_again(self):
+        warehouse = FakeWarehouse(branches=[(7, "Leeds")])
+        branches = [{"branch_id": 1, "name": "Leeds", "location": "Leeds"}]
+        dimension_utils.known_ids(warehouse, "branches", branches)
+
+        dimension_utils.forget_keys()
+
+        self.assertEqual(dimension_utils.known_ids(warehouse, "branches", branches), {1: 7})
+        self.assertEqual(warehouse.selects, 2)
+
+    def test_snapshot_seeds_cache_after_cold_start(self):
+        warehouse = FakeWarehouse(products=[(3, "Latte", None, "Large", 2.45), (9, "Chai latte", None, "Large", 2.6)])
+        with tempfile.TemporaryDirectory() as directory:
+            snapshot_path = os.path.join(directory, "dimension_keys.json")
+            with patch.dict(os.environ, {"DIMENSION_CACHE_PATH": snapshot_path}):
+                dimension_utils.refresh_keys(warehouse, "products")
+                dimension_utils.save_snapshot()
+
+                self.setUp()
+                selects = warehouse.selects
+                ids = dimension_utils.known_ids(warehouse, "products", PRODUCTS)
+
+        self.assertEqual(warehouse.selects, selects)
+        self.assertEqual(ids, {1: 3, 2: 9})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,90 @@
+import unittest
+
+import etl
+
+
+CSV_LINES = [
+    "header\n",
+    "21/04/2024 09:00,Edinburgh,Jesse Franco,\"Regular Latte - 2.15, Large Latte - 2.45\",4.6,CASH,\n",
+    "21/04/2024 09:01,Edinburgh,Rose Jackson,Large Latte - 2.45,2.45,CARD,8032985528327355\n",
+    "21/04/2024 09:03,Leeds,Albert Kenney,Regular Speciality Tea - Green - 1.30,1.3,CARD,4067790083911858\n",
+]
+
+
+class TestStreamingPipeline(unittest.TestCase):
+
+    def test_run_pipeline_batches_match_full_normalize(self):
+        expected = etl.normalize(etl.transform(etl.extract(CSV_LINES)))
+
+        batches = list(etl.run_pipeline(CSV_LINES, batch_size=2))
+
+        self.assertEqual(len(batches), 2)
+        for table_name, rows in expected.items():
+            self.assertEqual([row for batch in batches for row in batch[table_name]], rows)
+
+    def test_iter_normalize_emits_dimensions_once(self):
+        batches = list(etl.run_pipeline(CSV_LINES, batch_size=1))
+
+        self.assertEqual([len(batch["transactions"]) for batch in batches], [1, 1, 1])
+        self.assertEqual([len(batch["products"]) for batch in batches], [2, 0, 1])
+        self.assertEqual([len(batch["branches"]) for batch in batches], [1, 0, 1])
+        self.assertEqual(batches[1]["product_transactions"][0]["product_id"], 2)
+
+    def test_iter_normalize_keeps_a_branch_minute_in_one_batch(self):
+        lines = [
+            "header\n",
+            "21/04/2024 09:00,Leeds,Zoe,Large Latte - 2.45,2.45,CASH,\n",
+            "21/04/2024 09:00,Leeds,Bob,Large Latte - 2.45,2.45,CASH,\n",
+            "21/04/2024 09:00,York,Ann,Large Latte - 2.45,2.45,CASH,\n",
+        ]
+
+        batches = list(etl.run_pipeline(lines, batch_size=1))
+
+        self.assertEqual([len(batch["transactions"]) for batch in batches], [2, 1])
+
+    def test_iter_normalize_rejects_a_branch_minute_split_across_batches(self):
+        lines = [
+            "header\n",
+            "21/04/2024 09:00,Leeds,Zoe,Large Latte - 2.45,2.45,CASH,\n",
+            "21/04/2024 09:01,Leeds,Bob,Large Latte - 2.45,2.45,CASH,\n",
+            "21/04/2024 09:00,Leeds,Ann,Large Latte - 2.45,2.45,CASH,\n",
+        ]
+
+        # Unsorted rows are fine within one batch
+        self.assertEqual(len(list(etl.run_pipeline(lines, batch_size=3))), 1)
+        with self.assertRaises(ValueError):
+            list(etl.run_pipeline(lines, batch_size=1))
+
+    def test_normalize_collapses_repeated_items_into_quantities(self):
+        lines = [
+            "header\n",
+            "21/04/2024 09:00,Leeds,Zoe,\"Regular Latte - 2.15, Large Latte - 2.45, Regular Latte - 2.15, "
+            "Regular Latte - 2.15\",8.9,CARD,1234\n",
+        ]
+
+        tables = etl.normalize(etl.transform(etl.extract(lines)))
+
+        self.assertEqual(tables["product_transactions"], [
+            {"product_transactions_id": 1, "payment_id": 1, "product_id": 1, "quantity": 3},
+            {"product_transactions_id": 2, "payment_id": 1, "product_id": 2, "quantity": 1},
+        ])
+
+    def test_iter_extract_is_lazy(self):
+        lines = iter(CSV_LINES)
+        rows = etl.iter_extract(lines)
+        first = next(rows)
+        self.assertEqual(first["location"], "Edinburgh")
+        # Only the header and first row have been consumed
+        self.assertEqual(len(list(lines)), 2)
+
+    def test_normalize_empty_input(self):
+        self.assertEqual(etl.normalize([]), {
+            "branches": [],
+            "transactions": [],
+            "products": [],
+            "product_transactions": []
+        })
+
+
+if __name__ == "__main__":
+    unittest.main()
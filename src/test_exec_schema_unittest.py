@@ -1,7 +1,11 @@
+import os
 import unittest
 from unittest.mock import mock_open, patch, MagicMock
 import psycopg2
-from execute_schema import load_sql_script, execute_sql_script
+from execute_schema import load_sql_script, execute_sql_script, read_schema_version, apply_schema
+from utils import sql_utils
+
+SCHEMA_PATH = os.path.join(os.path.dirname(__file__), "..", "database", "create_schema.sql")
 
 class TestExecute_Schema(unittest.TestCase):
 
@@ -52,6 +56,62 @@ class TestExecute_Schema(unittest.TestCase):
         # Assert that rollback was called once due to the error
         mock_connection.rollback.assert_called_once()
 
-        
+    def test_schema_file_version_matches_lambda_schema_version(self):
+        with open(SCHEMA_PATH) as file:
+            self.assertEqual(read_schema_version(file.read()), sql_utils.SCHEMA_VERSION)
+
+    def test_read_schema_version_missing_marker(self):
+        self.assertIsNone(read_schema_version("CREATE TABLE test (id INT);"))
+
+    def test_apply_schema_skips_when_up_to_date(self):
+        mock_connection = MagicMock()
+        mock_cursor = mock_connection.cursor.return_value.__enter__.return_value
+        mock_cursor.fetchone.return_value = (1,)
+        script = "-- schema_version: 1\nCREATE TABLE test (id INT);"
+        self.assertFalse(apply_schema(mock_connection, script))
+        mock_cursor.execute.assert_any_call("SELECT MAX(version) FROM schema_version;")
+        self.assertNotIn(script, [call.args[0] for call in mock_cursor.execute.call_args_list])
+
+    def test_apply_schema_runs_script_and_records_version(self):
+        mock_connection = MagicMock()
+        mock_cursor = mock_connection.cursor.return_value.__enter__.return_value
+        mock_cursor.fetchone.return_value = (None,)
+        script = "-- schema_version: 2\nCREATE TABLE test (id INT);"
+        self.assertTrue(apply_schema(mock_connection, script))
+        mock_cursor.execute.assert_any_call(script)
+        mock_cursor.execute.assert_any_call("INSERT INTO schema_version (version) VALUES (%s);", (2,))
+
+
+class TestEnsureDbSchema(unittest.TestCase):
+
+    def setUp(self):
+        sql_utils._schema_version_ready = None
+
+    def tearDown(self):
+        sql_utils._schema_version_ready = None
+
+    def test_ensure_db_schema_migrates_once_per_container(self):
+        mock_connection = MagicMock()
+        mock_cursor = MagicMock()
+        mock_cursor.fetchone.return_value = (None,)
+        migration = MagicMock()
+        with patch.dict(sql_utils.SCHEMA_MIGRATIONS, {sql_utils.SCHEMA_VERSION: migration}):
+            self.assertTrue(sql_utils.ensure_db_schema(mock_connection, mock_cursor))
+            executed = mock_cursor.execute.call_count
+            self.assertFalse(sql_utils.ensure_db_schema(mock_connection, mock_cursor))
+
+        migration.assert_called_once_with(mock_connection, mock_cursor)
+        self.assertEqual(mock_cursor.execute.call_count, executed)
+
+    def test_ensure_db_schema_skips_ddl_when_version_matches(self):
+        mock_connection = MagicMock()
+        mock_cursor = MagicMock()
+        mock_cursor.fetchone.return_value = (sql_utils.SCHEMA_VERSION,)
+        migration = MagicMock()
+        with patch.dict(sql_utils.SCHEMA_MIGRATIONS, {sql_utils.SCHEMA_VERSION: migration}):
+            self.assertFalse(sql_utils.ensure_db_schema(mock_connection, mock_cursor))
+        migration.assert_not_called()
+
+
 if __name__ == "__main__":
         unittest.main()
\ No newline at end of file
@@ -0,0 +1,36 @@
+import unittest
+
+from item_parser import Product, parse_item, parse_items, parse_products
+
+
+class TestItemParser(unittest.TestCase):
+
+    def test_parse_items_with_and_without_variant(self):
+        parsed = parse_items("Large Latte - 2.45, Regular Flavoured iced latte - Hazelnut - 2.75")
+        self.assertEqual(parsed, [
+            {"item_name": "Latte", "variant": None, "size": "Large", "price": 2.45},
+            {"item_name": "Flavoured iced latte", "variant": "Hazelnut", "size": "Regular", "price": 2.75},
+        ])
+
+    def test_parse_items_skips_unmatched_items(self):
+        parsed = parse_items("Large Latte - 2.45, not an item")
+        self.assertEqual(len(parsed), 1)
+
+    def test_parse_item_memoizes_repeated_strings(self):
+        first = parse_item("Large Speciality Tea - Green - 1.60")
+        second = parse_item("Large Speciality Tea - Green - 1.60")
+        self.assertIs(first, second)
+        self.assertEqual(first, ("Speciality Tea", "Green", "Large", 1.6))
+
+    def test_parse_products_shares_one_record_per_product(self):
+        products = parse_products("Large Latte - 2.45, Large Latte - 2.450, Large  Latte - 2.45")
+        self.assertEqual(products[0], Product("Latte", None, "Large", 2.45))
+        self.assertIs(products[0], products[1])
+        self.assertIs(products[0], products[2])
+
+    def test_parse_item_invalid(self):
+        self.assertIsNone(parse_item("Regular Coffee - - 2.5"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -9,6 +9,7 @@ import sys
 sys.path.insert(0, "src")
  
 from load_data import connect_to_database, load_json, insert_data
+from utils import sql_utils
  
 class TestLoadData(unittest.TestCase):
  
@@ -78,11 +79,41 @@ class TestLoadData(unittest.TestCase):
         insert_data(mock_connection, table_name, data)
         mock_cursor.execute.assert_called_once_with(
 
-            "INSERT INTO test_table (col1, col2) VALUES (%(col1)s, %(col2)s)", data[0]
+            "INSERT INTO test_table (col1, col2) VALUES (%s, %s)", ["value1", "value2"]
 
         )
 
         mock_connection.commit.assert_called_once()
+
+    def test_insert_data_in_pages(self):
+
+        # Five rows with a page size of two should take three statements
+        mock_connection = MagicMock()
+        mock_cursor = MagicMock()
+        mock_connection.cursor.return_value.__enter__.return_value = mock_cursor
+
+        data = [{"col1": i, "col2": i * 10} for i in range(5)]
+        round_trips = insert_data(mock_connection, "test_table", data, page_size=2)
+
+        self.assertEqual(round_trips, 3)
+        self.assertEqual(mock_cursor.execute.call_args_list[0].args, (
+            "INSERT INTO test_table (col1, col2) VALUES (%s, %s), (%s, %s)", [0, 0, 1, 10]
+        ))
+        self.assertEqual(mock_cursor.execute.call_args_list[2].args, (
+            "INSERT INTO test_table (col1, col2) VALUES (%s, %s)", [4, 40]
+        ))
+        mock_connection.commit.assert_called_once()
+ 
+    def test_insert_data_empty(self):
+
+        # Nothing to insert should not touch the database
+        mock_connection = MagicMock()
+
+        for data in ([], None):
+            self.assertEqual(insert_data(mock_connection, "test_table", data), 0)
+
+        mock_connection.cursor.assert_not_called()
+        mock_connection.commit.assert_not_called()
  
     @patch("load_data.psycopg2.connect")
 
@@ -103,11 +134,27 @@ class TestLoadData(unittest.TestCase):
 
         mock_cursor.execute.assert_called_once_with(
 
-            "INSERT INTO test_table (col1, col2) VALUES (%(col1)s, %(col2)s)", data[0]
+            "INSERT INTO test_table (col1, col2) VALUES (%s, %s)", ["value1", "value2"]
 
         )
 
         mock_connection.rollback.assert_called_once()
+
+    def test_insert_data_failure_forgets_rolled_back_partitions(self):
+
+        # The month partition is created and then rolled back with the failed insert
+        mock_connection = MagicMock()
+        mock_cursor = MagicMock()
+        mock_connection.cursor.return_value.__enter__.return_value = mock_cursor
+        mock_cursor.execute.side_effect = [None, Exception("Insert failed")]
+
+        data = [{"branch_id": 1, "timestamp": "2024-04-21 09:00:00", "total_amount": 4.35, "payment_method": "CASH"}]
+
+        with patch.object(sql_utils, "_partitions_ready", set()):
+            insert_data(mock_connection, "transactions", data)
+            self.assertEqual(sql_utils._partitions_ready, set())
+
+        mock_connection.rollback.assert_called_once()
  
 if __name__ == "__main__":
 
@@ -0,0 +1,188 @@
+import contextlib
+import io
+import os
+import unittest
+from unittest.mock import patch, MagicMock
+import uuid
+
+import etl
+from postgres_testing import SCHEMA_FILE, connect_to_test_database
+from utils import dimension_utils, load_utils, rollup_utils, sql_utils
+
+CSV_LINES = [
+    "header\n",
+    "21/04/2024 09:00,Leeds,Zoe,\"Large Latte - 2.45, Regular Mocha - 2.30\",4.75,CARD,1234\n",
+    "21/04/2024 09:01,Leeds,Bob,Large Latte - 2.45,2.45,CASH,\n",
+    "21/04/2024 09:01,Leeds,Ann,Large Latte - 2.45,2.45,CASH,\n",
+    "22/05/2024 09:00,York,Ann,\"Regular Mocha - 2.30, Regular Mocha - 2.30\",4.6,CARD,5678\n",
+]
+
+# Each basket line with the natural key of its transaction and product
+BASKETS = """
+    SELECT b.name, t.timestamp, t.total_amount, p.name, p.size, pt.quantity
+    FROM product_transactions pt
+    JOIN transactions t ON t.payment_id = pt.payment_id
+    JOIN branches b ON b.branch_id = t.branch_id
+    JOIN products p ON p.product_id = pt.product_id
+"""
+
+
+@patch.dict(os.environ, {"DB_DIALECT": "redshift", "DB_LOAD_STRATEGY": "insert"}, clear=True)
+@patch.object(dimension_utils, "known_ids", return_value=None)
+class TestLoadBatch(unittest.TestCase):
+
+    def test_batch_is_staged_then_merged_in_one_round_trip_without_committing(self, mock_known_ids):
+        mock_connection = MagicMock()
+        mock_cursor = MagicMock()
+        tables = etl.normalize(etl.transform(etl.extract(CSV_LINES)))
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            load_utils.load_batch(mock_connection, mock_cursor, tables)
+
+        statements = [call.args[0] for call in mock_cursor.execute.call_args_list]
+        self.assertEqual(len(statements), 6)
+        self.assertEqual(statements[0].count("CREATE TEMP TABLE"), 4)
+        self.assertTrue(statements[1].startswith("INSERT INTO branches_stage"))
+        merge = statements[5].splitlines()
+        self.assertEqual([statement.split(" (")[0].split(" SET")[0] for statement in merge], [
+            "INSERT INTO branches", "INSERT INTO branch_ids", "DROP TABLE branches_stage;",
+            "INSERT INTO products", "INSERT INTO product_ids", "DROP TABLE products_stage;",
+            "DELETE FROM payment_ids;", "UPDATE transactions_stage", "INSERT INTO transactions", "INSERT INTO payment_ids",
+            "INSERT INTO rollup_days", "DROP TABLE transactions_stage;",
+            "UPDATE product_transactions_stage", "UPDATE product_transactions_stage",
+            "INSERT INTO product_transactions", "DROP TABLE product_transactions_stage;",
+        ])
+        mock_connection.commit.assert_not_called()
+
+    def test_cached_dimensions_are_not_staged(self, mock_known_ids):
+        mock_known_ids.side_effect = [{1: 7, 2: 8}, {1: 30, 2: 31}]
+        mock_cursor = MagicMock()
+        tables = etl.normalize(etl.transform(etl.extract(CSV_LINES)))
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            load_utils.load_batch(MagicMock(), mock_cursor, tables)
+
+        statements = [call.args[0] for call in mock_cursor.execute.call_args_list]
+        self.assertTrue(statements[0].startswith(
+            "INSERT INTO branch_ids (local_id, warehouse_id) VALUES (1, 7), (2, 8); "
+            "INSERT INTO product_ids (local_id, warehouse_id) VALUES (1, 30), (2, 31); "
+            "CREATE TEMP TABLE transactions_stage"))
+        self.assertNotIn("branches_stage", "".join(statements))
+        self.assertNotIn("products_stage", "".join(statements))
+        # The facts are still pointed at the recorded ids
+        self.assertIn("UPDATE transactions_stage SET branch_id = branch_ids.warehouse_id", statements[-1])
+
+    @patch.object(dimension_utils, "forget_keys")
+    def test_failure_rolls_back_the_whole_load(self, mock_forget_keys, mock_known_ids):
+        mock_connection = MagicMock()
+        mock_cursor = MagicMock()
+        mock_cursor.execute.side_effect = [None, None, Exception("INSERT failed")]
+        tables = etl.normalize(etl.transform(etl.extract(CSV_LINES)))
+
+        with self.assertRaises(Exception), contextlib.redirect_stdout(io.StringIO()):
+            load_utils.load_batch(mock_connection, mock_cursor, tables)
+        mock_connection.rollback.assert_called_once()
+        mock_connection.commit.assert_not_called()
+        # Members read inside the rolled back transaction may be gone
+        mock_forget_keys.assert_called_once()
+
+
+class TestLoadAgainstPostgres(unittest.TestCase):
+    """
+    Loads branch rows into a scratch schema of the local Postgres as one unit of work.
+    """
+
+    def setUp(self):
+        self.connection = connect_to_test_database()
+        if self.connection is None:
+            self.skipTest("local Postgres is not running")
+        self.addCleanup(self.connection.close)
+        self.cursor = self.connection.cursor()
+
+        schema_name = f"test_load_{uuid.uuid4().hex[:8]}"
+        self.cursor.execute(f"CREATE SCHEMA {schema_name}; SET search_path TO {schema_name};")
+        with open(SCHEMA_FILE) as file:
+            self.cursor.execute(file.read())
+        self.connection.commit()
+        self.addCleanup(self.drop_schema, schema_name)
+
+        # Start from an empty dimension cache, as a cold container would
+        for patcher in (patch.dict(dimension_utils._keys, {"branches": {}, "products": {}}),
+                        patch.object(dimension_utils, "_snapshot_loaded", True),
+                        patch.object(sql_utils, "_partitions_ready", set())):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def drop_schema(self, schema_name):
+        self.connection.rollback()
+        self.cursor.execute(f"DROP SCHEMA {schema_name} CASCADE;")
+        self.connection.commit()
+
+    def fetch(self, query):
+        self.cursor.execute(query)
+        return sorted(self.cursor.fetchall())
+
+    def load(self, lines, batch_size):
+        # As lambda_handler does it
+        try:
+            with contextlib.redirect_stdout(io.StringIO()):
+                load_utils.begin_load(self.cursor)
+                for tables in etl.run_pipeline(lines, batch_size=batch_size):
+                    load_utils.load_batch(self.connection, self.cursor, tables)
+                load_utils.commit_load(self.connection, self.cursor)
+        except Exception:
+            load_utils.abort_load(self.connection)
+            raise
+
+    def test_load_links_facts_by_natural_key_and_reloads_change_nothing(self):
+        self.load(CSV_LINES, batch_size=2)
+        baskets = self.fetch(BASKETS)
+        transactions = self.fetch("SELECT * FROM transactions")
+
+        # Batched differently, and with every branch and product cached by the first load
+        self.load(CSV_LINES, batch_size=3)
+
+        self.assertEqual(len(transactions), 4)
+        self.assertEqual(self.fetch("SELECT * FROM transactions"), transactions)
+        self.assertEqual(self.fetch(BASKETS), baskets)
+        self.assertEqual(baskets[-1][3:], ("Mocha", "Regular", 2))
+        for table_name, query in rollup_utils.REBUILD_QUERIES.items():
+            with self.subTest(table_name=table_name):
+                self.assertEqual(self.fetch(f"SELECT * FROM {table_name}"), self.fetch(query))
+
+    def test_identical_sales_keep_their_baskets_whatever_the_identity_order(self):
+        lines = CSV_LINES[:2] + [
+            "21/04/2024 09:01,Leeds,Bob,Large Latte - 2.45,2.45,CASH,\n",
+            "21/04/2024 09:01,Leeds,Ann,Large Tea - 2.45,2.45,CASH,\n",
+        ]
+        self.load(lines, batch_size=2)
+        baskets = self.fetch(BASKETS)
+
+        # Give the two identical sales each other's IDENTITY order, keeping their baskets
+        self.cursor.execute("SELECT payment_id FROM transactions WHERE total_amount = 2.45 ORDER BY occurrence")
+        first, second = [row[0] for row in self.cursor.fetchall()]
+        for old_id, new_id in ((first, 0), (second, first), (0, second)):
+            self.cursor.execute("UPDATE transactions SET payment_id = %s WHERE payment_id = %s; "
+                                "UPDATE product_transactions SET payment_id = %s WHERE payment_id = %s;",
+                                (new_id, old_id, new_id, old_id))
+        self.connection.commit()
+        self.assertEqual(self.fetch(BASKETS), baskets)
+
+        self.load(lines, batch_size=3)
+
+        self.assertEqual(self.fetch(BASKETS), baskets)
+        self.assertEqual(self.fetch("SELECT COUNT(*) FROM product_transactions"), [(4,)])
+
+    def test_failed_load_leaves_nothing_behind(self):
+        broken = CSV_LINES + ["23/05/2024 09:00,York,Ann,Regular Mocha - 2.30,not a number,CARD,5678\n"]
+
+        with self.assertRaises(Exception):
+            self.load(broken, batch_size=2)
+
+        for table_name in ("branches", "products", "transactions", "product_transactions", "daily_branch_sales"):
+            with self.subTest(table_name=table_name):
+                self.assertEqual(self.fetch(f"SELECT COUNT(*) FROM {table_name}"), [(0,)])
+
+
+if __name__ == "__main__":
+    unittest.main()
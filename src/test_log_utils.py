@@ -0,0 +1,50 @@
+import random
+import unittest
+from unittest.mock import MagicMock
+
+from utils import log_utils
+
+
+TABLES = {
+    "branches": [{"branch_id": 1, "name": "Leeds"}],
+    "transactions": [{"payment_id": i} for i in range(1, 11)],
+}
+
+
+class TestLogUtils(unittest.TestCase):
+
+    def test_lazy_only_builds_when_formatted(self):
+        build = MagicMock(return_value="built")
+        message = log_utils.Lazy(build)
+        build.assert_not_called()
+        self.assertEqual(str(message), "built")
+
+    def test_sample_rows_takes_head_and_random_rows_from_the_rest(self):
+        head, sampled, total = log_utils.sample_rows(iter(range(100)), head=3, random_count=2, rng=random.Random(1))
+        self.assertEqual(head, [0, 1, 2])
+        self.assertEqual(len(sampled), 2)
+        self.assertTrue(all(3 <= row < 100 for row in sampled))
+        self.assertEqual(total, 100)
+
+    def test_sample_rows_short_table(self):
+        self.assertEqual(log_utils.sample_rows([1, 2], head=3, random_count=2), ([1, 2], [], 2))
+
+    def test_summary_level_never_formats_rows(self):
+        logger = MagicMock()
+        log_utils.log_tables(logger, "normalize", TABLES, level=log_utils.LOG_SUMMARY)
+
+        logger.info.assert_called_once()
+        self.assertEqual(str(logger.info.call_args.args[2]), "branches=1 transactions=10")
+
+    def test_sample_level_logs_a_sample_per_table(self):
+        logger = MagicMock()
+        log_utils.log_tables(logger, "normalize", TABLES, level=log_utils.LOG_SAMPLE)
+
+        self.assertEqual(logger.info.call_count, 3)
+        sample = str(logger.info.call_args_list[2].args[3])
+        self.assertTrue(sample.startswith("first=[{'payment_id': 1}, {'payment_id': 2}, {'payment_id': 3}]"))
+        self.assertTrue(sample.endswith("total=10"))
+
+
+if __name__ == "__main__":
+    unittest.main()
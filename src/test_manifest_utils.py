@@ -0,0 +1,51 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from utils import manifest_utils
+
+
+class TestManifestUtils(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.connection, self.cursor = manifest_utils.open_sqlite_manifest(os.path.join(self.directory, "ledger.sqlite"))
+        self.addCleanup(self.connection.close)
+
+    def test_mark_processed_then_lookup(self):
+        self.assertFalse(manifest_utils.is_processed(self.cursor, "s3://raw/leeds.csv", '"abc":100'))
+
+        manifest_utils.mark_processed(self.connection, self.cursor, "s3://raw/leeds.csv", '"abc":100', 49)
+
+        self.assertTrue(manifest_utils.is_processed(self.cursor, "s3://raw/leeds.csv", '"abc":100'))
+        # A re-upload with different contents has a new ETag and is processed again
+        self.assertFalse(manifest_utils.is_processed(self.cursor, "s3://raw/leeds.csv", '"def":120'))
+
+    def test_filter_unprocessed_and_mark_reports(self):
+        file_infos = [("raw", "leeds.csv"), ("raw", "york.csv")]
+        fingerprints = {("raw", "leeds.csv"): '"abc":100', ("raw", "york.csv"): '"def":120'}
+        reports = [
+            {"bucket": "raw", "file": "leeds.csv", "status": "ok", "rows": 49},
+            {"bucket": "raw", "file": "york.csv", "status": "failed", "error": "boom"},
+        ]
+
+        manifest_utils.mark_reports(self.connection, self.cursor, reports, fingerprints)
+        pending, skipped = manifest_utils.filter_unprocessed(self.cursor, file_infos, fingerprints)
+
+        self.assertEqual(pending, [("raw", "york.csv")])
+        self.assertEqual(skipped, [{"bucket": "raw", "file": "leeds.csv", "status": "skipped"}])
+
+    def test_local_fingerprint_follows_contents(self):
+        file_path = os.path.join(self.directory, "leeds_09-05-2023_09-00-00.csv")
+        with open(file_path, "w") as file:
+            file.write("a,b\n")
+        first = manifest_utils.local_fingerprint(file_path)
+        with open(file_path, "a") as file:
+            file.write("c,d\n")
+        self.assertNotEqual(manifest_utils.local_fingerprint(file_path), first)
+
+
+if __name__ == "__main__":
+    unittest.main()
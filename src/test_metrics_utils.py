@@ -0,0 +1,83 @@
+import contextlib
+import io
+import json
+import unittest
+
+import etl
+from utils import metrics_utils
+
+
+CSV_LINES = [
+    'header row\n',
+    '21/04/2024 09:00,Leeds,Zoe,"Large Latte - 2.45",2.45,CARD,1234\n',
+    '21/04/2024 09:01,Leeds,Ann,"Regular Latte - 2.15, Large Latte - 2.45",4.6,CASH,\n',
+]
+
+
+class TestMetricsUtils(unittest.TestCase):
+
+    def setUp(self):
+        metrics_utils.reset()
+        self.addCleanup(metrics_utils.set_enabled, metrics_utils.enabled())
+        self.addCleanup(metrics_utils.reset)
+
+    def test_disabled_hooks_record_nothing(self):
+        metrics_utils.set_enabled(False)
+        rows = iter([1, 2])
+        self.assertIs(metrics_utils.timed_iter("extract", rows), rows)
+
+        list(etl.run_pipeline(CSV_LINES))
+        with contextlib.redirect_stdout(io.StringIO()) as output:
+            metrics_utils.emit()
+
+        self.assertEqual(metrics_utils.get_stats(), {})
+        self.assertEqual(output.getvalue(), "")
+
+    def test_pipeline_stages_are_timed_exclusively(self):
+        metrics_utils.set_enabled(True)
+
+        batches = list(etl.run_pipeline(CSV_LINES))
+        stats = metrics_utils.get_stats()
+
+        self.assertEqual(len(batches), 1)
+        self.assertEqual(stats["extract"]["rows"], 2)
+        self.assertEqual(stats["transform"]["rows"], 2)
+        self.assertEqual(stats["normalize"]["rows"], 2)
+        for stage in ["extract", "transform", "normalize"]:
+            self.assertEqual(stats[stage]["calls"], 1)
+            self.assertGreater(stats[stage]["seconds"], 0)
+            self.assertGreater(stats[stage]["peak_rss_bytes"], 0)
+
+    def test_timed_function_counts_calls_and_rows(self):
+        metrics_utils.set_enabled(True)
+
+        @metrics_utils.timed("load", rows=len)
+        def load(rows):
+            return rows
+
+        load([1, 2, 3])
+        load([4])
+
+        self.assertEqual(metrics_utils.get_stats()["load"]["calls"], 2)
+        self.assertEqual(metrics_utils.get_stats()["load"]["rows"], 4)
+
+    def test_emit_prints_one_emf_record_and_resets(self):
+        metrics_utils.set_enabled(True)
+        metrics_utils.add("s3", bytes=1024, seconds=0.5, calls=1)
+
+        with contextlib.redirect_stdout(io.StringIO()) as output:
+            metrics_utils.emit(dimensions={"Service": "cafe_etl_lambda"})
+
+        record = json.loads(output.getvalue())
+        self.assertEqual(record["Service"], "cafe_etl_lambda")
+        self.assertEqual(record["s3_bytes"], 1024)
+        self.assertEqual(record["s3_seconds"], 0.5)
+        directive = record["_aws"]["CloudWatchMetrics"][0]
+        self.assertEqual(directive["Namespace"], "CafeETL")
+        self.assertEqual(directive["Dimensions"], [["Service"]])
+        self.assertIn({"Name": "s3_bytes", "Unit": "Bytes"}, directive["Metrics"])
+        self.assertEqual(metrics_utils.get_stats(), {})
+
+
+if __name__ == "__main__":
+    unittest.main()
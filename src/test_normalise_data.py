@@ -96,6 +96,18 @@ class TestNormalisation(unittest.TestCase):
     #     self.assertEqual(normalize_product_transactions(data, products), expected_outcome)
     #     # Testing that the function appends the right information properly
 
+    def test_normalize_product_transactions_counts_repeated_items(self):
+        latte = {"item_name": "Latte", "variant": None, "size": "Large", "price": 2.45}
+        tea = {"item_name": "Speciality Tea", "variant": "Green", "size": "Regular", "price": 1.3}
+        data = [{"items": [latte, tea, latte]}, {"items": [tea]}]
+        products = normalize_products(data)
+
+        self.assertEqual(normalize_product_transactions(data, products), [
+            {"product_transactions_id": 1, "payment_id": 1, "product_id": 1, "quantity": 2},
+            {"product_transactions_id": 2, "payment_id": 1, "product_id": 2, "quantity": 1},
+            {"product_transactions_id": 3, "payment_id": 2, "product_id": 2, "quantity": 1},
+        ])
+
     def test_save_data_to_json(self): # Here we are making use of both save_data_to_json & load_json_data
         data = [{"key": "value"}]
         file_path = "test.json"
@@ -0,0 +1,86 @@
+import contextlib
+import glob
+import io
+import os
+import unittest
+
+import columnar
+import etl
+import pandas_engine
+from utils import metrics_utils
+
+
+DATA_GLOB = os.path.join(os.path.dirname(__file__), "..", "data", "*_??-??-????_*.csv")
+
+CSV_TEXT = (
+    'header row\n'
+    '21/04/2024 09:00,Leeds,Zoe,"Large Latte - 2.45, Regular Flavoured iced latte - Hazelnut - 2.75",5.2,CARD,1234\n'
+    '21/04/2024 09:01,Chesterfield,Ann,"Large Latte - 2.45, Mystery item",2.45,CASH,\n'
+    '21/04/2024 09:02,Leeds,Bob,"Regular Flavoured iced latte - Hazelnut - 2.75",2.75,CARD,5678\n'
+)
+
+
+def normalize_with_both_engines(open_file):
+    with contextlib.redirect_stdout(io.StringIO()) as python_output:
+        with open_file() as file:
+            expected = etl.normalize(etl.transform(etl.extract(file)))
+    with contextlib.redirect_stdout(io.StringIO()) as pandas_output:
+        with open_file() as file:
+            tables = pandas_engine.normalize_file(file)
+    for table in tables.values():
+        assert isinstance(table, columnar.ColumnarTable)
+    result = {table_name: list(table) for table_name, table in tables.items()}
+    return expected, result, python_output.getvalue(), pandas_output.getvalue()
+
+
+class TestPandasEngineEquivalence(unittest.TestCase):
+
+    def test_matches_python_engine_on_sample_rows(self):
+        expected, result, python_output, pandas_output = normalize_with_both_engines(
+            lambda: io.StringIO(CSV_TEXT, newline=''))
+        self.assertEqual(result, expected)
+        self.assertEqual(pandas_output, python_output)
+        self.assertEqual(len(result["products"]), 2)
+
+    def test_matches_python_engine_on_data_files(self):
+        file_paths = sorted(glob.glob(DATA_GLOB))
+        if not file_paths:
+            self.skipTest("no data files")
+        for file_path in file_paths:
+            expected, result, _, _ = normalize_with_both_engines(
+                lambda: open(file_path, newline='', encoding='utf-8'))
+            self.assertEqual(result, expected, file_path)
+
+    def test_header_only_file(self):
+        expected, result, _, _ = normalize_with_both_engines(lambda: io.StringIO('header row\n', newline=''))
+        self.assertEqual(result, expected)
+
+    def test_normalize_files_continues_ids_across_files(self):
+        with contextlib.redirect_stdout(io.StringIO()):
+            result = pandas_engine.normalize_files([io.StringIO(CSV_TEXT), io.StringIO(CSV_TEXT)])
+        self.assertEqual([row["payment_id"] for row in result["transactions"]], list(range(1, 7)))
+        self.assertEqual(len(result["branches"]), 2)
+
+
+class TestPandasEngineMetrics(unittest.TestCase):
+
+    def setUp(self):
+        metrics_utils.reset()
+        self.addCleanup(metrics_utils.set_enabled, metrics_utils.enabled())
+        self.addCleanup(metrics_utils.reset)
+
+    def test_stages_are_timed_like_the_python_engine(self):
+        metrics_utils.set_enabled(True)
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            pandas_engine.normalize_file(io.StringIO(CSV_TEXT, newline=''))
+        stats = metrics_utils.get_stats()
+
+        for stage in ["extract", "transform", "normalize"]:
+            self.assertEqual(stats[stage]["calls"], 1)
+            self.assertEqual(stats[stage]["rows"], 3)
+            self.assertGreater(stats[stage]["seconds"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,116 @@
+from datetime import datetime
+from decimal import Decimal
+import importlib.util
+import os
+import shutil
+import tempfile
+import unittest
+
+import etl
+from item_parser import Product
+from utils import parquet_utils
+
+
+def transformed_row(location, timestamp, items):
+    return {
+        "timestamp": timestamp,
+        "location": location,
+        "items": [Product(*item) for item in items],
+        "total_cost": sum(item[3] for item in items),
+        "payment_method": "CARD",
+    }
+
+
+ROWS = [
+    transformed_row("Leeds", "2024-04-21 09:00:00", [("Latte", None, "Large", 2.45), ("Mocha", None, "Regular", 2.3)]),
+    transformed_row("St Albans/North", "2024-04-21 09:05:00", [("Latte", None, "Large", 2.45)]),
+    transformed_row("Leeds", "2024-04-22 08:30:00", [("Speciality Tea", "Green", "Regular", 1.3)]),
+]
+
+
+@unittest.skipUnless(importlib.util.find_spec("pyarrow"), "pyarrow is not installed")
+class TestParquetUtils(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+
+    def relative_paths(self, file_paths):
+        return sorted(os.path.dirname(os.path.relpath(path, self.directory)) for path in file_paths)
+
+    def test_write_tables_partitions_fact_tables_by_load_branch_and_date(self):
+        file_paths = parquet_utils.write_tables(etl.normalize(ROWS), self.directory, load_id="a")
+
+        self.assertEqual(self.relative_paths(file_paths), [
+            "branches/load=a",
+            "product_transactions/load=a/branch=Leeds/date=2024-04-21",
+            "product_transactions/load=a/branch=Leeds/date=2024-04-22",
+            "product_transactions/load=a/branch=St%20Albans%2FNorth/date=2024-04-21",
+            "products/load=a",
+            "transactions/load=a/branch=Leeds/date=2024-04-21",
+            "transactions/load=a/branch=Leeds/date=2024-04-22",
+            "transactions/load=a/branch=St%20Albans%2FNorth/date=2024-04-21",
+        ])
+
+    def test_separate_loads_keep_their_own_ids(self):
+        # Both files number their first branch and product 1
+        parquet_utils.write_tables(etl.normalize(ROWS[:1]), self.directory)
+        parquet_utils.write_tables(etl.normalize(ROWS[2:]), self.directory)
+
+        branches = parquet_utils.read_table(self.directory, "branches").to_pylist()
+        products = parquet_utils.read_table(self.directory, "products").to_pylist()
+        transactions = parquet_utils.read_table(self.directory, "transactions").to_pylist()
+
+        branch_names = {(branch["load"], branch["branch_id"]): branch["name"] for branch in branches}
+        self.assertEqual(len({product["load"] for product in products}), 2)
+        self.assertEqual(len([product for product in products if product["product_id"] == 1]), 2)
+        for transaction in transactions:
+            self.assertEqual(branch_names[(transaction["load"], transaction["branch_id"])], transaction["branch"])
+
+    def test_round_trip_keeps_warehouse_types(self):
+        for columnar_tables in (False, True):
+            with self.subTest(columnar_tables=columnar_tables):
+                out_dir = os.path.join(self.directory, str(columnar_tables))
+                parquet_utils.write_tables(etl.normalize(ROWS, columnar_tables=columnar_tables), out_dir,
+                                           load_id="b")
+
+                transactions = parquet_utils.read_table(out_dir, "transactions").sort_by("payment_id").to_pylist()
+                products = parquet_utils.read_table(out_dir, "products").sort_by("product_id").to_pylist()
+
+                self.assertEqual(transactions[0], {
+                    "payment_id": 1,
+                    "branch_id": 1,
+                    "timestamp": datetime(2024, 4, 21, 9, 0),
+                    "total_amount": Decimal("4.75"),
+                    "payment_method": "CARD",
+                    "load": "b",
+                    "branch": "Leeds",
+                    "date": "2024-04-21",
+                })
+                self.assertEqual([product["variant"] for product in products], [None, None, "Green"])
+                self.assertEqual(parquet_utils.read_table(out_dir, "product_transactions").num_rows, 4)
+
+    def test_files_hold_only_the_table_columns_with_dictionary_strings(self):
+        import pyarrow.parquet as pq
+
+        file_paths = parquet_utils.write_tables(etl.normalize(ROWS, columnar_tables=True), self.directory)
+        transactions_file = next(path for path in file_paths if os.sep + "transactions" + os.sep in path)
+
+        schema = pq.read_schema(transactions_file)
+        self.assertEqual(schema.names, ["payment_id", "branch_id", "timestamp", "total_amount", "payment_method"])
+        self.assertEqual(str(schema.field("payment_method").type), "dictionary<values=string, indices=int32, ordered=0>")
+
+    def test_later_batches_reuse_branch_names(self):
+        branch_names = {}
+        load_id = parquet_utils.new_load_id()
+        file_paths = []
+        for batch in etl.iter_normalize(ROWS, batch_size=2):
+            file_paths += parquet_utils.write_tables(batch, self.directory, branch_names, load_id)
+
+        # The last batch has no branches table row for Leeds but still lands in its partition
+        self.assertIn(f"transactions/load={load_id}/branch=Leeds/date=2024-04-22", self.relative_paths(file_paths))
+        self.assertEqual(parquet_utils.read_table(self.directory, "transactions").num_rows, 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
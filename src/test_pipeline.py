@@ -0,0 +1,91 @@
+import unittest
+from unittest.mock import patch
+
+import pipeline
+
+FILES = {
+    "edinburgh.csv": [
+        "header\n",
+        "21/04/2024 09:00,Edinburgh,Jesse Franco,Large Latte - 2.45,2.45,CASH,\n",
+    ],
+    "leeds.csv": [
+        "header\n",
+        "09/05/2023 09:01,Leeds,Ronald Moss,Regular Latte - 2.15,2.15,CASH,\n",
+        "09/05/2023 09:03,Leeds,Joseph Mccabe,Large Latte - 2.45,2.45,CARD,6840608068100313\n",
+    ],
+}
+
+
+def fake_stream_file(bucket_name, file_path):
+    if file_path == "truncated.csv":
+        return truncated_file()
+    if file_path not in FILES:
+        raise FileNotFoundError(file_path)
+    return iter(FILES[file_path])
+
+
+def truncated_file():
+    yield from FILES["leeds.csv"][:2]
+    raise ConnectionError("connection reset")
+
+
+@patch("pipeline.s3_utils.stream_file", side_effect=fake_stream_file)
+class TestIterTransformedRows(unittest.TestCase):
+
+    def test_single_file_is_streamed(self, mock_stream_file):
+        reports = []
+        rows = list(pipeline.iter_transformed_rows([("bucket", "leeds.csv")], reports))
+
+        self.assertEqual([row["location"] for row in rows], ["Leeds", "Leeds"])
+        self.assertEqual(reports, [{"bucket": "bucket", "file": "leeds.csv", "status": "ok", "rows": 2}])
+
+    def test_all_files_are_processed_in_event_order(self, mock_stream_file):
+        reports = []
+        file_infos = [("bucket", "edinburgh.csv"), ("bucket", "leeds.csv")]
+        rows = list(pipeline.iter_transformed_rows(file_infos, reports, max_workers=2))
+
+        self.assertEqual([row["location"] for row in rows], ["Edinburgh", "Leeds", "Leeds"])
+        self.assertEqual([report["rows"] for report in reports], [1, 2])
+        self.assertEqual(mock_stream_file.call_count, 2)
+
+    def test_failed_file_is_reported_and_skipped(self, mock_stream_file):
+        reports = []
+        file_infos = [("bucket", "missing.csv"), ("bucket", "leeds.csv")]
+        rows = list(pipeline.iter_transformed_rows(file_infos, reports))
+
+        self.assertEqual(len(rows), 2)
+        self.assertEqual(reports[0]["status"], "failed")
+        self.assertEqual(reports[0]["file"], "missing.csv")
+        self.assertEqual(reports[1]["status"], "ok")
+
+    def test_file_failing_mid_stream_keeps_the_rows_read_before(self, mock_stream_file):
+        reports = []
+        file_infos = [("bucket", "truncated.csv"), ("bucket", "edinburgh.csv")]
+        rows = list(pipeline.iter_transformed_rows(file_infos, reports, buffer_rows=1))
+
+        self.assertEqual([row["location"] for row in rows], ["Leeds", "Edinburgh"])
+        self.assertEqual(reports[0]["status"], "failed")
+        self.assertEqual(reports[0]["rows"], 1)
+        self.assertEqual(reports[1], {"bucket": "bucket", "file": "edinburgh.csv", "status": "ok", "rows": 1})
+
+    def test_abandoned_event_releases_blocked_workers(self, mock_stream_file):
+        file_infos = [("bucket", "leeds.csv"), ("bucket", "edinburgh.csv")]
+        rows = pipeline.iter_transformed_rows(file_infos, [], buffer_rows=1)
+
+        self.assertEqual(next(rows)["location"], "Leeds")
+        # Returns only once every worker has finished
+        rows.close()
+
+
+class TestIterNormalizedBatches(unittest.TestCase):
+
+    @patch.dict("os.environ", {"AWS_LAMBDA_FUNCTION_NAME": "cafe-etl"})
+    def test_pandas_engine_is_rejected_in_lambda(self):
+        batches = pipeline.iter_normalized_batches([("bucket", "leeds.csv")], [], 100, engine=pipeline.ENGINE_PANDAS)
+
+        with self.assertRaises(ValueError):
+            next(batches)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,72 @@
+import contextlib
+import io
+import os
+import unittest
+from unittest.mock import patch
+import uuid
+
+import etl
+from postgres_testing import SCHEMA_FILE, connect_to_test_database
+from utils import dimension_utils, load_utils, rollup_utils, sql_utils
+
+DATA_FILE = os.path.join(os.path.dirname(__file__), "..", "data", "edinburgh_21-04-2024_09-00-00.csv")
+
+
+class TestRollupsAgainstPostgres(unittest.TestCase):
+    """
+    Loads a branch file into a scratch schema of the local Postgres and checks the rollups
+    refreshed for the loaded days against a full aggregate of the fact tables.
+    """
+
+    def setUp(self):
+        self.connection = connect_to_test_database()
+        if self.connection is None:
+            self.skipTest("local Postgres is not running")
+        self.addCleanup(self.connection.close)
+        self.cursor = self.connection.cursor()
+
+        schema_name = f"test_rollups_{uuid.uuid4().hex[:8]}"
+        self.cursor.execute(f"CREATE SCHEMA {schema_name}; SET search_path TO {schema_name};")
+        with open(SCHEMA_FILE) as file:
+            self.cursor.execute(file.read())
+        self.connection.commit()
+        self.addCleanup(self.drop_schema, schema_name)
+
+        # Start from an empty dimension cache, as a cold container would
+        for patcher in (patch.dict(dimension_utils._keys, {"branches": {}, "products": {}}),
+                        patch.object(dimension_utils, "_snapshot_loaded", True),
+                        patch.object(sql_utils, "_partitions_ready", set()),
+                        patch.dict(os.environ, {sql_utils.LOAD_STRATEGY_ENV_VAR_NAME: sql_utils.LOAD_COPY})):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def drop_schema(self, schema_name):
+        self.connection.rollback()
+        self.cursor.execute(f"DROP SCHEMA {schema_name} CASCADE;")
+        self.connection.commit()
+
+    def fetch(self, query):
+        self.cursor.execute(query)
+        return sorted(self.cursor.fetchall())
+
+    def test_refreshed_days_match_full_table_aggregate(self):
+        # Loaded twice in small batches, the second time with the dimension cache warm
+        for batch_size in (50, 30):
+            with contextlib.redirect_stdout(io.StringIO()), open(DATA_FILE, newline="") as csvfile:
+                load_utils.begin_load(self.cursor)
+                for tables in etl.run_pipeline(csvfile, batch_size=batch_size):
+                    load_utils.load_batch(self.connection, self.cursor, tables)
+                load_utils.commit_load(self.connection, self.cursor)
+
+        for table_name, query in rollup_utils.REBUILD_QUERIES.items():
+            with self.subTest(table_name=table_name):
+                maintained = self.fetch(f"SELECT * FROM {table_name}")
+                self.assertEqual(maintained, self.fetch(query))
+                self.assertGreater(len(maintained), 0)
+
+        rollup_utils.rebuild_rollups(self.connection, self.cursor)
+        self.assertEqual(self.fetch("SELECT * FROM daily_branch_sales"), self.fetch(rollup_utils.REBUILD_QUERIES["daily_branch_sales"]))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,91 @@
+import csv
+import io
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch, MagicMock
+
+from utils import s3_utils
+
+
+CSV_TEXT = (
+    '21/04/2024 09:00,Edinburgh,Zoë Brontë,"Large Latte - 2.45",2.45,CASH,\r\n'
+    '21/04/2024 09:01,Edinburgh,"Multi\nLine","Regular Latte - 2.15, Large Latte - 2.45",4.6,CARD,1234\n'
+    '21/04/2024 09:02,Edinburgh,Café Crème,Large Latte - 2.45,2.45,CARD,5678'
+)
+
+
+class TestIterLines(unittest.TestCase):
+
+    def test_iter_lines_matches_whole_file_for_any_chunk_size(self):
+        expected = list(csv.reader(io.StringIO(CSV_TEXT, newline='')))
+        for chunk_size in range(1, 12):
+            body = io.BytesIO(CSV_TEXT.encode('utf-8'))
+            result = list(csv.reader(s3_utils.iter_lines(body, chunk_size)))
+            self.assertEqual(result, expected, f'chunk_size={chunk_size}')
+
+    def test_iter_lines_keeps_multibyte_characters_split_across_chunks(self):
+        # 'é' is two bytes in UTF-8, so a chunk size of 1 always splits it
+        body = io.BytesIO('café\nthé\n'.encode('utf-8'))
+        self.assertEqual(list(s3_utils.iter_lines(body, 1)), ['café\n', 'thé\n'])
+
+    def test_iter_lines_empty_body(self):
+        self.assertEqual(list(s3_utils.iter_lines(io.BytesIO(b''))), [])
+
+
+class TestGetFileInfos(unittest.TestCase):
+
+    def test_get_file_infos_reads_every_record(self):
+        event = {"Records": [
+            {"s3": {"bucket": {"name": "raw"}, "object": {"key": "leeds_09-05-2023_09-00-00.csv"}}},
+            {"s3": {"bucket": {"name": "raw"}, "object": {"key": "new+branch%2Cday.csv"}}},
+        ]}
+        self.assertEqual(s3_utils.get_file_infos(event), [
+            ("raw", "leeds_09-05-2023_09-00-00.csv"),
+            ("raw", "new branch,day.csv"),
+        ])
+
+    def test_get_file_fingerprints_use_etag_and_size(self):
+        event = {"Records": [
+            {"s3": {"bucket": {"name": "raw"}, "object": {"key": "a.csv", "eTag": "abc", "size": 100}}},
+            {"s3": {"bucket": {"name": "raw"}, "object": {"key": "b.csv"}}},
+        ]}
+        self.assertEqual(s3_utils.get_file_fingerprints(event), ["abc:100", ":"])
+
+    def test_get_file_infos_without_records(self):
+        with self.assertRaises(KeyError):
+            s3_utils.get_file_infos({"Records": []})
+
+
+class TestStreamFile(unittest.TestCase):
+
+    @patch('utils.s3_utils.get_s3_client')
+    def test_stream_file_reads_object_and_closes_body(self, mock_get_s3_client):
+        mock_s3_client = mock_get_s3_client.return_value
+        body = MagicMock(wraps=io.BytesIO(b'a,b\nc,d\n'))
+        mock_s3_client.get_object.return_value = {'Body': body}
+
+        lines = list(s3_utils.stream_file('bucket', 'key.csv', chunk_size=3))
+
+        mock_s3_client.get_object.assert_called_once_with(Bucket='bucket', Key='key.csv')
+        self.assertEqual(lines, ['a,b\n', 'c,d\n'])
+        body.close.assert_called_once()
+
+
+class TestGetS3Client(unittest.TestCase):
+
+    @patch('utils.s3_utils._s3_client', None)
+    def test_concurrent_first_calls_create_one_client(self):
+        mock_boto3 = MagicMock()
+        # Slow enough for every worker to reach the check before the first client exists
+        mock_boto3.client.side_effect = lambda service: time.sleep(0.05) or MagicMock()
+
+        with patch.dict('sys.modules', {'boto3': mock_boto3}), ThreadPoolExecutor(max_workers=4) as executor:
+            clients = list(executor.map(lambda _: s3_utils.get_s3_client(), range(4)))
+
+        mock_boto3.client.assert_called_once_with('s3')
+        self.assertEqual(len({id(client) for client in clients}), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,71 @@
+import unittest
+
+from utils import schema_utils
+
+
+class TestCreateTableStatements(unittest.TestCase):
+
+    def test_redshift_distributes_facts_on_payment_id_and_copies_dimensions(self):
+        statements = schema_utils.create_table_statements(schema_utils.REDSHIFT)
+
+        self.assertEqual(len(statements), 4)
+        branches, transactions, products, product_transactions = statements
+        self.assertTrue(branches.endswith(") DISTSTYLE ALL;"))
+        self.assertTrue(products.endswith(") DISTSTYLE ALL;"))
+        self.assertTrue(transactions.endswith(") DISTKEY (payment_id) COMPOUND SORTKEY (branch_id, timestamp);"))
+        self.assertIn("payment_id INT IDENTITY(1, 1),", transactions)
+        self.assertIn("FOREIGN KEY (payment_id) REFERENCES transactions(payment_id)", product_transactions)
+
+    def test_postgres_partitions_transactions_by_month_and_indexes_joins(self):
+        statements = schema_utils.create_table_statements(schema_utils.POSTGRES)
+
+        transactions = statements[1]
+        self.assertTrue(transactions.endswith(") PARTITION BY RANGE (timestamp);"))
+        self.assertIn("PRIMARY KEY (payment_id, timestamp)", transactions)
+        self.assertNotIn("REFERENCES transactions", statements[3])
+        self.assertNotIn("SORTKEY", " ".join(statements))
+        self.assertEqual(statements[4:], schema_utils.POSTGRES_INDEXES)
+
+
+class TestRedshiftAlterStatements(unittest.TestCase):
+
+    def test_only_tables_out_of_layout_are_altered(self):
+        table_info = {
+            "branches": ("ALL", None),
+            "transactions": ("KEY(payment_id)", "branch_id"),
+            "products": ("AUTO(EVEN)", None),
+            "product_transactions": ("EVEN", None),
+        }
+
+        self.assertEqual(schema_utils.redshift_alter_statements(table_info), [
+            "ALTER TABLE products ALTER DISTSTYLE ALL;",
+            "ALTER TABLE product_transactions ALTER DISTKEY payment_id;",
+            "ALTER TABLE product_transactions ALTER COMPOUND SORTKEY (payment_id, product_id);",
+        ])
+
+    def test_tables_missing_from_svv_table_info_are_left_alone(self):
+        # svv_table_info has no row for an empty table, e.g. in a freshly created schema
+        self.assertEqual(schema_utils.redshift_alter_statements({}), [])
+        self.assertEqual(schema_utils.redshift_alter_statements({"products": ("AUTO(EVEN)", None)}), [
+            "ALTER TABLE products ALTER DISTSTYLE ALL;",
+        ])
+
+
+class TestMonthPartitions(unittest.TestCase):
+
+    def test_month_start_accepts_text_and_datetimes(self):
+        from datetime import datetime
+
+        self.assertEqual(schema_utils.month_start("2024-04-21 09:00:00"), "2024-04-01")
+        self.assertEqual(schema_utils.month_start(datetime(2023, 12, 31, 23, 59)), "2023-12-01")
+
+    def test_december_partition_ends_in_january(self):
+        self.assertEqual(
+            schema_utils.month_partition_statement("2023-12-01"),
+            "CREATE TABLE IF NOT EXISTS transactions_2023_12 PARTITION OF transactions "
+            "FOR VALUES FROM ('2023-12-01') TO ('2024-01-01');",
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,167 @@
+import os
+import unittest
+from unittest.mock import patch, MagicMock
+
+from utils import sql_utils
+
+BRANCHES = [{"branch_id": 1, "name": "Chesterfield"}, {"branch_id": 2, "name": "Leeds"}]
+PRODUCTS = [{"product_id": 1, "name": "Latte", "variant": None, "size": "Large", "price": 2.45}]
+
+
+class TestSaveDataInDb(unittest.TestCase):
+
+    def make_connection(self, server_version):
+        mock_connection = MagicMock()
+        mock_connection.server_version = server_version
+        return mock_connection
+
+    @patch.dict(os.environ, {}, clear=True)
+    def test_postgres_uses_copy_from_stdin(self):
+        mock_connection = self.make_connection(160002)
+        mock_cursor = MagicMock()
+
+        sql_utils.save_data_in_db(mock_connection, mock_cursor, "products", PRODUCTS)
+
+        query, buffer = mock_cursor.copy_expert.call_args.args
+        self.assertEqual(query, "COPY products (name, variant, size, price) FROM STDIN WITH (FORMAT csv)")
+        self.assertEqual(buffer.getvalue(), "Latte,,Large,2.45\n")
+        mock_cursor.execute.assert_not_called()
+        mock_connection.commit.assert_called_once()
+
+    @patch.dict(os.environ, {}, clear=True)
+    def test_redshift_without_staging_bucket_uses_insert(self):
+        mock_connection = self.make_connection(80002)
+        mock_cursor = MagicMock()
+
+        round_trips = sql_utils.save_data_in_db(mock_connection, mock_cursor, "branches", BRANCHES)
+
+        self.assertEqual(round_trips, 1)
+        mock_cursor.execute.assert_called_once_with(
+            "INSERT INTO branches (name) VALUES (%s), (%s)", ["Chesterfield", "Leeds"],
+        )
+
+    @patch.dict(os.environ, {"COPY_STAGING_BUCKET": "staging-bucket", "COPY_IAM_ROLE": "arn:aws:iam::1:role/copy"}, clear=True)
+    @patch("utils.sql_utils.s3_utils")
+    def test_redshift_with_staging_bucket_copies_from_s3(self, mock_s3_utils):
+        mock_connection = self.make_connection(80002)
+        mock_cursor = MagicMock()
+
+        sql_utils.save_data_in_db(mock_connection, mock_cursor, "branches", BRANCHES)
+
+        bucket_name, s3_key, text = mock_s3_utils.upload_text.call_args.args
+        self.assertEqual(bucket_name, "staging-bucket")
+        self.assertTrue(s3_key.startswith("staging/branches/"))
+        self.assertEqual(text, "Chesterfield\nLeeds\n")
+        copy_query = mock_cursor.execute.call_args.args[0]
+        self.assertIn(f"FROM 's3://staging-bucket/{s3_key}'", copy_query)
+        self.assertIn("IAM_ROLE 'arn:aws:iam::1:role/copy'", copy_query)
+        mock_s3_utils.delete_file.assert_called_once_with("staging-bucket", s3_key)
+
+    @patch.dict(os.environ, {"INSERT_PAGE_SIZE": "2"}, clear=True)
+    def test_insert_reports_round_trips_per_page(self):
+        mock_connection = self.make_connection(80002)
+        mock_cursor = MagicMock()
+        rows = [dict(BRANCHES[0], branch_id=i) for i in range(5)]
+
+        round_trips = sql_utils.save_data_in_db(mock_connection, mock_cursor, "branches", rows)
+
+        self.assertEqual(round_trips, 3)
+        self.assertEqual(mock_cursor.execute.call_count, 3)
+
+    @patch.dict(os.environ, {"DB_LOAD_STRATEGY": "insert"}, clear=True)
+    def test_strategy_override(self):
+        mock_connection = self.make_connection(160002)
+        mock_cursor = MagicMock()
+
+        sql_utils.save_data_in_db(mock_connection, mock_cursor, "products", PRODUCTS)
+
+        mock_cursor.execute.assert_called_once()
+        mock_cursor.copy_expert.assert_not_called()
+
+    @patch.dict(os.environ, {}, clear=True)
+    def test_failure_rolls_back(self):
+        mock_connection = self.make_connection(160002)
+        mock_cursor = MagicMock()
+        mock_cursor.copy_expert.side_effect = Exception("COPY failed")
+
+        with self.assertRaises(Exception):
+            sql_utils.save_data_in_db(mock_connection, mock_cursor, "products", PRODUCTS)
+        mock_connection.rollback.assert_called_once()
+        mock_connection.commit.assert_not_called()
+
+    def test_fact_tables_are_refused(self):
+        mock_connection = self.make_connection(160002)
+        mock_cursor = MagicMock()
+
+        for table_name in ("transactions", "product_transactions"):
+            with self.subTest(table_name=table_name), self.assertRaises(ValueError):
+                sql_utils.save_data_in_db(mock_connection, mock_cursor, table_name, [{"payment_id": 1}])
+        mock_cursor.execute.assert_not_called()
+        mock_cursor.copy_expert.assert_not_called()
+
+    def test_is_deprecated_in_favour_of_load_utils(self):
+        mock_connection = self.make_connection(160002)
+
+        with self.assertWarnsRegex(DeprecationWarning, "load_utils"):
+            sql_utils.save_data_in_db(mock_connection, MagicMock(), "branches", [])
+
+
+class TestEnsureMonthPartitions(unittest.TestCase):
+
+    @patch.object(sql_utils, "_partitions_ready", set())
+    def test_creates_each_month_once(self):
+        mock_cursor = MagicMock()
+        rows = [{"timestamp": "2024-05-01 08:00:00"}, {"timestamp": "2024-04-21 09:00:00"}]
+
+        sql_utils.ensure_month_partitions(mock_cursor, rows)
+        sql_utils.ensure_month_partitions(mock_cursor, rows)
+
+        partitions = [call.args[0].split(" PARTITION")[0] for call in mock_cursor.execute.call_args_list]
+        self.assertEqual(partitions, [
+            "CREATE TABLE IF NOT EXISTS transactions_2024_04",
+            "CREATE TABLE IF NOT EXISTS transactions_2024_05",
+        ])
+
+
+class TestMergeStatements(unittest.TestCase):
+
+    def test_nullable_key_columns_match_nulls(self):
+        self.assertEqual(
+            sql_utils._key_match("stored", "stage", ["name", "variant"]),
+            "stored.name = stage.name AND "
+            "(stored.variant = stage.variant OR (stored.variant IS NULL AND stage.variant IS NULL))",
+        )
+
+    def test_known_ids_are_recorded_as_literal_pairs(self):
+        self.assertEqual(sql_utils.known_ids_statement("products", {1: 30, 2: 31}),
+                         "INSERT INTO product_ids (local_id, warehouse_id) VALUES (1, 30), (2, 31);")
+
+
+class TestApplyPhysicalLayout(unittest.TestCase):
+
+    def test_redshift_layout_is_altered_outside_a_transaction(self):
+        mock_connection = MagicMock()
+        mock_connection.server_version = 80002
+        mock_cursor = MagicMock()
+        mock_cursor.fetchall.return_value = [
+            ("branches", "ALL", None),
+            ("transactions", "EVEN", None),
+            ("products", "ALL", None),
+            ("product_transactions", "KEY(payment_id)", "payment_id"),
+        ]
+        autocommit = []
+        mock_cursor.execute.side_effect = lambda *args: autocommit.append(mock_connection.autocommit)
+
+        sql_utils.apply_physical_layout(mock_connection, mock_cursor)
+
+        statements = [call.args[0] for call in mock_cursor.execute.call_args_list[1:]]
+        self.assertEqual(statements, [
+            "ALTER TABLE transactions ALTER DISTKEY payment_id;",
+            "ALTER TABLE transactions ALTER COMPOUND SORTKEY (branch_id, timestamp);",
+        ])
+        self.assertEqual(autocommit[1:], [True, True])
+        self.assertFalse(mock_connection.autocommit)
+
+
+if __name__ == "__main__":
+    unittest.main()
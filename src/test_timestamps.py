@@ -0,0 +1,27 @@
+import unittest
+from datetime import datetime
+
+from timestamps import format_timestamp, parse_timestamp
+
+
+class TestTimestamps(unittest.TestCase):
+
+    def test_parse_timestamp_matches_strptime(self):
+        for value in ["21/04/2024 09:00", "29/02/2024 23:59", "01/01/2021 00:00", "1/5/2024 9:05", " 1/05/2024 09:05"]:
+            self.assertEqual(parse_timestamp(value), datetime.strptime(value, "%d/%m/%Y %H:%M"))
+
+    def test_format_timestamp(self):
+        self.assertEqual(format_timestamp("21/04/2024 09:00"), "2024-04-21 09:00:00")
+        self.assertEqual(format_timestamp("1/5/2024 9:05"), "2024-05-01 09:05:00")
+
+    def test_invalid_timestamps_raise_value_error(self):
+        for value in ["29/02/2023 09:00", "32/01/2024 09:00", "21/13/2024 09:00",
+                      "21/04/2024 24:00", "21/04/2024 09:60", "21-04-2024 09:00", "+1/04/2024 09:00", ""]:
+            with self.assertRaises(ValueError, msg=value):
+                parse_timestamp(value)
+            with self.assertRaises(ValueError, msg=value):
+                format_timestamp(value)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,69 @@
+from datetime import datetime
+import functools
+
+# Layout of the timestamp column in every branch file, e.g. "21/04/2024 09:00"
+TIMESTAMP_FORMAT = "%d/%m/%Y %H:%M"
+
+# Each file covers a single day, so only a handful of dates are ever live at once
+DATE_CACHE_SIZE = 64
+
+
+@functools.lru_cache(maxsize=DATE_CACHE_SIZE)
+def _parse_date(date_text):
+    """
+    Parses and validates the "dd/mm/YYYY" part of a timestamp, once per distinct date.
+    :param date_text: The first ten characters of a timestamp.
+    :return: Tuple of (year, month, day, "YYYY-MM-DD"), or None if the layout differs.
+    """
+    if date_text[2] != "/" or date_text[5] != "/" or not _is_digits(date_text[:2] + date_text[3:5] + date_text[6:]):
+        return None
+    day, month, year = int(date_text[:2]), int(date_text[3:5]), int(date_text[6:])
+    # Let datetime validate the day against the month and leap years
+    datetime(year, month, day)
+    return year, month, day, f"{date_text[6:]}-{date_text[3:5]}-{date_text[:2]}"
+
+
+def _is_digits(text):
+    return text.isascii() and text.isdigit()
+
+
+def _split_timestamp(value):
+    """
+    Splits a fixed-position "dd/mm/YYYY HH:MM" timestamp into its validated parts.
+    :return: Tuple of (year, month, day, date_iso, hour, minute), or None if the layout differs.
+    """
+    if len(value) != 16 or value[10] != " " or value[13] != ":" or not _is_digits(value[11:13] + value[14:]):
+        return None
+    date_parts = _parse_date(value[:10])
+    if date_parts is None:
+        return None
+    hour, minute = int(value[11:13]), int(value[14:])
+    if hour > 23 or minute > 59:
+        raise ValueError(f"time data {value!r} has an out of range time")
+    return date_parts + (hour, minute)
+
+
+def parse_timestamp(value):
+    """
+    Converts a branch timestamp to a datetime, equivalent to strptime(value, TIMESTAMP_FORMAT).
+    :param value: Timestamp such as "21/04/2024 09:00".
+    :return: datetime.
+    """
+    parts = _split_timestamp(value)
+    if parts is None:
+        # Anything off the fixed layout (e.g. single-digit days) goes through strptime
+        return datetime.strptime(value, TIMESTAMP_FORMAT)
+    year, month, day, _, hour, minute = parts
+    return datetime(year, month, day, hour, minute)
+
+
+def format_timestamp(value):
+    """
+    Converts a branch timestamp to the "YYYY-MM-DD HH:MM:SS" form loaded into the warehouse.
+    :param value: Timestamp such as "21/04/2024 09:00".
+    :return: Timestamp string such as "2024-04-21 09:00:00".
+    """
+    parts = _split_timestamp(value)
+    if parts is None:
+        return parse_timestamp(value).strftime("%Y-%m-%d %H:%M:%S")
+    return f"{parts[3]} {value[11:]}:00"
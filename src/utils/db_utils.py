@@ -1,33 +1,69 @@
 # This file exists to separate the direct use of psycopg2 from functions that only
 # care about the Connection and Cursor - this makes those easier to unit test.
+# boto3 and psycopg2 are imported on first use, so importing the handler stays cheap.
 
-import psycopg2 as psy
-import boto3
 import logging
 import json
+import os
+import threading
+import time
+
+from utils import metrics_utils
 
 LOGGER = logging.getLogger()
 LOGGER.setLevel(logging.INFO)
 
-ssm_client = boto3.client("ssm")
+
+# How long a decoded SSM parameter is reused by a warm Lambda container
+SSM_CACHE_TTL_SECONDS = int(os.environ.get("SSM_CACHE_TTL_SECONDS", 300))
+
+# Module level state survives between invocations of a warm Lambda container
+_ssm_cache = {}  # param_name -> (expires_at, redshift_details)
+_connection = None
+_cursor = None
+_connection_key = None
+_ssm_client = None
+# boto3.client is not thread-safe on the default session
+_ssm_client_lock = threading.Lock()
+
+
+def get_ssm_client():
+    # Created once per container and reused by warm invocations
+    global _ssm_client
+    if _ssm_client is None:
+        with _ssm_client_lock:
+            if _ssm_client is None:
+                import boto3
+                _ssm_client = boto3.client("ssm")
+    return _ssm_client
 
 
 # Get the SSM Param from AWS and turn it into JSON
 # Don't log the password!
+@metrics_utils.timed('ssm')
 def get_ssm_param(param_name):
+    cached = _ssm_cache.get(param_name)
+    if cached and cached[0] > time.monotonic():
+        LOGGER.info(f"get_ssm_param: using cached param_name={param_name}")
+        return cached[1]
+
     LOGGER.info(f"get_ssm_param: getting param_name={param_name}")
-    parameter_details = ssm_client.get_parameter(Name=param_name)
+    parameter_details = get_ssm_client().get_parameter(Name=param_name)
     redshift_details = json.loads(parameter_details["Parameter"]["Value"])
 
     host = redshift_details["host"]
     user = redshift_details["user"]
     db = redshift_details["database-name"]
     LOGGER.info(f"get_ssm_param: loaded for db={db}, user={user}, host={host}")
+    _ssm_cache[param_name] = (time.monotonic() + SSM_CACHE_TTL_SECONDS, redshift_details)
     return redshift_details
 
 
 # Use the redshift details json to connect
+@metrics_utils.timed('connect')
 def open_sql_database_connection_and_cursor(redshift_details):
+    import psycopg2 as psy
+
     try:
         LOGGER.info(
             "open_sql_database_connection_and_cursor: new connection starting..."
@@ -47,3 +83,63 @@ def open_sql_database_connection_and_cursor(redshift_details):
             f"open_sql_database_connection_and_cursor: failed to open connection: {ex}"
         )
         raise ex
+
+
+def is_connection_alive(connection, cursor):
+    """
+    Cheap liveness check for a cached connection: one SELECT 1 round trip.
+    Anything left open by a failed invocation is rolled back first.
+    :return: True if the connection can be used.
+    """
+    if connection.closed:
+        return False
+    import psycopg2 as psy
+
+    try:
+        connection.rollback()
+        cursor.execute("SELECT 1")
+        cursor.fetchone()
+        return True
+    except psy.Error as ex:
+        LOGGER.info(f"is_connection_alive: connection is broken: {ex}")
+        return False
+
+
+def get_connection_and_cursor(redshift_details):
+    """
+    Returns the connection and cursor kept by this container, opening a new one
+    only when there is none yet, the details changed, or the old one is broken.
+    :param redshift_details: The redshift details json from get_ssm_param.
+    :return: Tuple of (connection, cursor).
+    """
+    global _connection, _cursor, _connection_key
+    connection_key = (
+        redshift_details["host"],
+        redshift_details["port"],
+        redshift_details["database-name"],
+        redshift_details["user"],
+    )
+    if _connection is not None and _connection_key == connection_key:
+        if is_connection_alive(_connection, _cursor):
+            LOGGER.info("get_connection_and_cursor: reusing warm connection")
+            return _connection, _cursor
+
+    close_connection()
+    _connection, _cursor = open_sql_database_connection_and_cursor(redshift_details)
+    _connection_key = connection_key
+    return _connection, _cursor
+
+
+def close_connection():
+    """
+    Closes and forgets the connection kept by this container, if any.
+    """
+    global _connection, _cursor, _connection_key
+    if _connection is not None:
+        import psycopg2 as psy
+
+        try:
+            _connection.close()
+        except psy.Error as ex:
+            LOGGER.info(f"close_connection: ignoring error on close: {ex}")
+    _connection, _cursor, _connection_key = None, None, None
@@ -0,0 +1,129 @@
+# Caches the surrogate keys of the branch and product dimensions per container, so a load
+# whose branches and products are all known already (nearly every load) does not stage
+# them: utils/load_utils records their warehouse ids straight from the cache.
+
+import json
+import logging
+import os
+
+
+LOGGER = logging.getLogger()
+LOGGER.setLevel(logging.INFO)
+
+# Optional JSON file (e.g. /tmp/dimension_keys.json) that keeps the keys between cold starts
+SNAPSHOT_ENV_VAR_NAME = 'DIMENSION_CACHE_PATH'
+
+
+def branch_key(row):
+    return (row['name'],)
+
+
+def product_key(row):
+    # Prices come back from NUMERIC(10, 2) columns as Decimal, so compare at 2dp
+    return (row['name'], row['variant'], row['size'], round(float(row['price']), 2))
+
+
+DIMENSIONS = {
+    'branches': {
+        'id_column': 'branch_id',
+        'key_columns': ['name'],
+        'key': branch_key,
+    },
+    'products': {
+        'id_column': 'product_id',
+        'key_columns': ['name', 'variant', 'size', 'price'],
+        'key': product_key,
+    },
+}
+
+# Natural key -> warehouse surrogate key, kept for the life of the container
+_keys = {
+    'branches': {},
+    'products': {},
+}
+_snapshot_loaded = False
+# Whether _keys has changed since it was last written to the snapshot
+_snapshot_stale = False
+
+
+def load_snapshot():
+    global _snapshot_loaded
+    _snapshot_loaded = True
+    snapshot_path = os.environ.get(SNAPSHOT_ENV_VAR_NAME)
+    if not snapshot_path or not os.path.exists(snapshot_path):
+        return
+    try:
+        with open(snapshot_path, 'r') as file:
+            snapshot = json.load(file)
+        for table_name, entries in snapshot.items():
+            for *natural_key, surrogate_key in entries:
+                _keys[table_name].setdefault(_to_key(table_name, natural_key), surrogate_key)
+        LOGGER.info(f'load_snapshot: loaded dimension keys from {snapshot_path}')
+    except Exception as ex:
+        LOGGER.error(f'load_snapshot: ignoring unreadable snapshot {snapshot_path}: {ex}')
+
+
+def save_snapshot():
+    # Only call it once the keys are committed, see load_utils.commit_load
+    global _snapshot_stale
+    snapshot_path = os.environ.get(SNAPSHOT_ENV_VAR_NAME)
+    if not snapshot_path or not _snapshot_stale:
+        return
+    snapshot = {
+        table_name: [[*natural_key, surrogate_key] for natural_key, surrogate_key in keys.items()]
+        for table_name, keys in _keys.items()
+    }
+    with open(snapshot_path, 'w') as file:
+        json.dump(snapshot, file)
+    _snapshot_stale = False
+
+
+def _to_key(table_name, natural_key):
+    row = dict(zip(DIMENSIONS[table_name]['key_columns'], natural_key))
+    return DIMENSIONS[table_name]['key'](row)
+
+
+def refresh_keys(cursor, table_name):
+    """
+    Loads every natural key and surrogate key of a dimension in one bulk query.
+    The dimensions are a few dozen rows, so reading them whole is cheaper than filtering.
+    When duplicates exist the lowest surrogate key wins.
+    """
+    global _snapshot_stale
+    dimension = DIMENSIONS[table_name]
+    columns = [dimension['id_column']] + dimension['key_columns']
+    cursor.execute(f'SELECT {", ".join(columns)} FROM {table_name} ORDER BY {dimension["id_column"]};')
+    keys = {}
+    for surrogate_key, *natural_key in cursor.fetchall():
+        keys.setdefault(_to_key(table_name, natural_key), surrogate_key)
+    _keys[table_name] = keys
+    _snapshot_stale = True
+    LOGGER.info(f'refresh_keys: table={table_name} members={len(keys)}')
+
+
+def known_ids(cursor, table_name, rows):
+    """
+    Maps the batch-local ids of a dimension table to warehouse surrogate keys from the
+    cache, reading the whole dimension once when the cache misses a member.
+    :param rows: Normalized dimension rows, e.g. normalized_tables['products'].
+    :return: Dictionary of batch-local id -> warehouse id, or None while the warehouse does
+        not have every member yet.
+    """
+    if not _snapshot_loaded:
+        load_snapshot()
+
+    dimension = DIMENSIONS[table_name]
+    if any(dimension['key'](row) not in _keys[table_name] for row in rows):
+        refresh_keys(cursor, table_name)
+    keys = _keys[table_name]
+    if any(dimension['key'](row) not in keys for row in rows):
+        return None
+    return {row[dimension['id_column']]: keys[dimension['key'](row)] for row in rows}
+
+
+def forget_keys():
+    """
+    Empties the cache, e.g. after a rollback that removed members it had read in the same transaction.
+    """
+    for table_name in _keys:
+        _keys[table_name] = {}
@@ -0,0 +1,137 @@
+# Loads normalized batches as one unit of work. Every batch is staged and merged into
+# branches, products, transactions and product_transactions inside a single transaction,
+# the daily rollups of the days the load touched are recomputed at the end, and the load
+# commits once, so a file is either loaded completely or not at all.
+#
+# Foreign keys are resolved in the warehouse: each merge records the warehouse id of every
+# staged row, found by natural key (sql_utils.MERGE_KEYS), in a temp mapping table, and the
+# staged rows referencing that table are pointed at those ids before their own merge.
+# Identical sales are told apart by their occurrence in the batch (sql_utils.REPEATABLE_KEYS), so
+# the batches must come from etl.iter_normalize, which keeps every sale of a minute in one batch.
+# Branches and products the container cache (dimension_utils) already maps are not staged;
+# their ids go into the mapping tables straight from the cache.
+# After a batch's COPYs, all of its statements go to the warehouse in one round trip.
+#
+#   load_utils.begin_load(cursor)
+#   for normalized_tables in batches:
+#       load_utils.load_batch(connection, cursor, normalized_tables)
+#   load_utils.commit_load(connection, cursor)
+
+import logging
+
+import columnar
+from utils import dimension_utils, metrics_utils, rollup_utils, schema_utils, sql_utils
+
+LOGGER = logging.getLogger()
+LOGGER.setLevel(logging.INFO)
+
+# Dimensions first, so the facts can be pointed at their warehouse ids
+LOAD_ORDER = ['branches', 'products', 'transactions', 'product_transactions']
+
+
+def begin_load(cursor):
+    """
+    Creates the empty id mapping tables and the list of touched days for a new load.
+    """
+    statements = [sql_utils.id_map_statement(table_name) for table_name in sql_utils.ID_MAP_TABLES]
+    cursor.execute(' '.join(statements + [rollup_utils.ROLLUP_DAYS_DDL]))
+
+
+def batch_statements(columns):
+    """
+    :param columns: Dictionary of staged table name -> column names, in LOAD_ORDER.
+    :return: Statements that merge the staged tables and record the days they touch.
+    """
+    statements = []
+    for table_name, table_columns in columns.items():
+        if table_name == 'transactions':
+            # Basket lines are always in the batch of their transaction
+            statements.append(f'DELETE FROM {sql_utils.ID_MAP_TABLES[table_name]};')
+        for column in sql_utils.REFERENCES.get(table_name, {}):
+            statements.append(sql_utils.remap_statement(table_name, column))
+        statements.append(sql_utils.merge_statement(table_name, table_columns))
+        if table_name in sql_utils.ID_MAP_TABLES:
+            statements.append(sql_utils.record_ids_statement(table_name, table_columns))
+        if table_name == 'transactions':
+            statements.append(
+                f'INSERT INTO {rollup_utils.ROLLUP_DAYS_TABLE} (sales_date, branch_id) '
+                f'SELECT DISTINCT CAST(timestamp AS DATE), branch_id FROM transactions_stage;'
+            )
+        statements.append(f'DROP TABLE {table_name}_stage;')
+    return statements
+
+
+@metrics_utils.timed('load')
+def load_batch(connection, cursor, normalized_tables):
+    """
+    Stages one normalized batch and merges it into the warehouse tables, without committing.
+    A branch or product is only in the first batch of a load that uses it, so every batch
+    of a load goes through the same connection after one begin_load.
+    :param normalized_tables: Dictionary of normalized tables with batch-local ids, from etl.iter_normalize.
+    """
+    tables = {table_name: normalized_tables[table_name] for table_name in LOAD_ORDER if normalized_tables[table_name]}
+    if not tables:
+        return
+
+    try:
+        strategy = sql_utils.get_load_strategy(connection)
+        if 'transactions' in tables and sql_utils.get_dialect(connection) == schema_utils.POSTGRES:
+            sql_utils.ensure_month_partitions(cursor, tables['transactions'])
+
+        # Branches and products the cache maps completely are not staged, only their ids recorded
+        known = {}
+        for table_name in dimension_utils.DIMENSIONS:
+            if table_name not in tables:
+                continue
+            ids = dimension_utils.known_ids(cursor, table_name, tables[table_name])
+            if ids is not None:
+                known[table_name] = ids
+                del tables[table_name]
+
+        columns = {table_name: columnar.table_columns(data) for table_name, data in tables.items()}
+        cursor.execute(' '.join(
+            [sql_utils.known_ids_statement(table_name, ids) for table_name, ids in known.items()]
+            + [sql_utils.stage_statement(table_name, columns[table_name]) for table_name in tables]
+        ))
+        for table_name, data in tables.items():
+            sql_utils.LOADERS[strategy](cursor, f'{table_name}_stage', columns[table_name],
+                                        columnar.table_rows(data, columns[table_name]))
+        cursor.execute('\n'.join(batch_statements(columns)))
+
+        metrics_utils.add('load', rows=sum(len(data) for data in tables.values()))
+        LOGGER.info(
+            f'load_batch: merged using {strategy}: '
+            + ' '.join(f'{table_name}={len(data)}' for table_name, data in tables.items())
+            + ''.join(f' {table_name}={len(ids)} (cached)' for table_name, ids in known.items())
+        )
+    except Exception as ex:
+        LOGGER.error(f'load_batch: failed to load batch: {ex}')
+        abort_load(connection)
+        raise ex
+
+
+def commit_load(connection, cursor):
+    """
+    Recomputes the rollups of the days the load touched and commits the whole load.
+    """
+    try:
+        drops = [f'DROP TABLE {table_name};'
+                 for table_name in list(sql_utils.ID_MAP_TABLES.values()) + [rollup_utils.ROLLUP_DAYS_TABLE]]
+        cursor.execute('\n'.join(rollup_utils.refresh_statements() + drops))
+        connection.commit()
+        dimension_utils.save_snapshot()
+        LOGGER.info('commit_load: committed')
+    except Exception as ex:
+        LOGGER.error(f'commit_load: failed to commit load: {ex}')
+        abort_load(connection)
+        raise ex
+
+
+def abort_load(connection):
+    """
+    Rolls back everything the load wrote.
+    """
+    connection.rollback()
+    # Partitions and dimension members created in the rolled back transaction are gone again
+    sql_utils._partitions_ready.clear()
+    dimension_utils.forget_keys()
@@ -0,0 +1,92 @@
+# Logging helpers for table-sized data. Nothing here formats a row unless the log record is
+# actually emitted, and by default only row counts are logged, never the rows themselves.
+#
+# ETL_LOG_DATA picks how much of each table reaches the logs:
+#   summary (default) - row counts per table
+#   sample            - row counts plus the first ETL_LOG_SAMPLE_HEAD rows and
+#                       ETL_LOG_SAMPLE_RANDOM rows picked at random from the rest
+#   full              - every row; for local debugging only, as it logs customer data
+
+import itertools
+import logging
+import os
+import random
+
+LOGGER = logging.getLogger()
+LOGGER.setLevel(logging.INFO)
+
+LOG_DATA_ENV_VAR_NAME = 'ETL_LOG_DATA'
+SAMPLE_HEAD_ENV_VAR_NAME = 'ETL_LOG_SAMPLE_HEAD'
+SAMPLE_RANDOM_ENV_VAR_NAME = 'ETL_LOG_SAMPLE_RANDOM'
+
+LOG_SUMMARY = 'summary'
+LOG_SAMPLE = 'sample'
+LOG_FULL = 'full'
+
+DEFAULT_SAMPLE_HEAD = 3
+DEFAULT_SAMPLE_RANDOM = 2
+
+
+class Lazy:
+    """
+    Defers building a log message until a handler formats the record, e.g.
+    LOGGER.debug('rows: %s', Lazy(lambda: expensive(rows))) costs nothing when debug is off.
+    """
+    __slots__ = ('build',)
+
+    def __init__(self, build):
+        self.build = build
+
+    def __str__(self):
+        return str(self.build())
+
+
+def get_log_data_level():
+    return os.environ.get(LOG_DATA_ENV_VAR_NAME) or LOG_SUMMARY
+
+
+def sample_rows(rows, head=None, random_count=None, rng=random):
+    """
+    Picks the first head rows plus random_count rows chosen uniformly from the rest,
+    in one pass and without copying the table (reservoir sampling).
+    :return: Tuple of (head rows, random rows, total row count).
+    """
+    head = int(os.environ.get(SAMPLE_HEAD_ENV_VAR_NAME, DEFAULT_SAMPLE_HEAD)) if head is None else head
+    random_count = (int(os.environ.get(SAMPLE_RANDOM_ENV_VAR_NAME, DEFAULT_SAMPLE_RANDOM))
+                    if random_count is None else random_count)
+    rows = iter(rows)
+    head_rows = list(itertools.islice(rows, head))
+    reservoir = []
+    seen = 0
+    for seen, row in enumerate(rows, start=1):
+        if len(reservoir) < random_count:
+            reservoir.append(row)
+        else:
+            position = rng.randrange(seen)
+            if position < random_count:
+                reservoir[position] = row
+    return head_rows, reservoir, len(head_rows) + seen
+
+
+def summarize_tables(tables):
+    return ' '.join(f'{table_name}={len(rows)}' for table_name, rows in tables.items())
+
+
+def log_tables(logger, stage, tables, level=None):
+    """
+    Logs a dictionary of tables at the ETL_LOG_DATA verbosity, formatting lazily.
+    :param stage: Prefix for the messages, e.g. 'normalize'.
+    """
+    level = level or get_log_data_level()
+    logger.info('%s: rows: %s', stage, Lazy(lambda: summarize_tables(tables)))
+    if level == LOG_SAMPLE:
+        for table_name, rows in tables.items():
+            logger.info('%s: sample of %s: %s', stage, table_name, Lazy(lambda rows=rows: format_sample(rows)))
+    elif level == LOG_FULL:
+        for table_name, rows in tables.items():
+            logger.info('%s: %s: %s', stage, table_name, Lazy(lambda rows=rows: list(rows)))
+
+
+def format_sample(rows):
+    head_rows, random_rows, total = sample_rows(rows)
+    return f'first={head_rows} random={random_rows} total={total}'
@@ -0,0 +1,127 @@
+# Ledger of the files already loaded, so duplicate S3 notifications and restarted backfills
+# cost one primary-key lookup per file instead of a full download and ETL pass.
+# The ledger lives in the warehouse (processed_files) or in a local SQLite file.
+
+from datetime import datetime, timezone
+import hashlib
+import logging
+import os
+
+
+LOGGER = logging.getLogger()
+LOGGER.setLevel(logging.INFO)
+
+# Optional SQLite ledger for runs without a warehouse, e.g. /tmp/etl_manifest.sqlite
+SQLITE_PATH_ENV_VAR_NAME = 'MANIFEST_SQLITE_PATH'
+
+HASH_CHUNK_SIZE = 1024 * 1024
+
+MANIFEST_TABLE_DDL = '''
+    CREATE TABLE IF NOT EXISTS processed_files (
+        source_key VARCHAR(1024) NOT NULL,
+        fingerprint VARCHAR(128) NOT NULL,
+        row_count INT NOT NULL,
+        processed_at TIMESTAMP NOT NULL,
+        PRIMARY KEY (source_key, fingerprint)
+    );
+'''
+
+
+def create_manifest_table(connection, cursor):
+    LOGGER.info('create_manifest_table: creating processed_files table')
+    cursor.execute(MANIFEST_TABLE_DDL)
+    connection.commit()
+
+
+def open_sqlite_manifest(path):
+    """
+    Opens (creating if needed) a local SQLite ledger.
+    :return: Tuple of (connection, cursor).
+    """
+    # Only the local ledger needs sqlite3, so the Lambda never imports it
+    import sqlite3
+
+    connection = sqlite3.connect(path)
+    cursor = connection.cursor()
+    create_manifest_table(connection, cursor)
+    return connection, cursor
+
+
+def _placeholder(cursor):
+    return '?' if type(cursor).__module__ == 'sqlite3' else '%s'
+
+
+def s3_source_key(bucket_name, file_path):
+    return f's3://{bucket_name}/{file_path}'
+
+
+def local_source_key(file_path):
+    return os.path.abspath(file_path)
+
+
+def local_fingerprint(file_path):
+    """
+    :return: sha256 of the file contents, so an edited file is loaded again.
+    """
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as file:
+        for chunk in iter(lambda: file.read(HASH_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def is_processed(cursor, source_key, fingerprint):
+    placeholder = _placeholder(cursor)
+    cursor.execute(
+        f'SELECT 1 FROM processed_files WHERE source_key = {placeholder} AND fingerprint = {placeholder};',
+        (source_key, fingerprint),
+    )
+    return cursor.fetchone() is not None
+
+
+def mark_processed(connection, cursor, source_key, fingerprint, row_count, commit=True):
+    """
+    :param commit: False to leave the entry in the caller's open transaction, e.g. a load_utils load.
+    """
+    placeholder = _placeholder(cursor)
+    processed_at = datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
+    cursor.execute(
+        f'INSERT INTO processed_files (source_key, fingerprint, row_count, processed_at) '
+        f'VALUES ({placeholder}, {placeholder}, {placeholder}, {placeholder});',
+        (source_key, fingerprint, row_count, processed_at),
+    )
+    if commit:
+        connection.commit()
+    LOGGER.info(f'mark_processed: source_key={source_key} rows={row_count}')
+
+
+def filter_unprocessed(cursor, file_infos, fingerprints):
+    """
+    Drops the S3 files the ledger has already seen with the same ETag and size.
+    :param file_infos: List of (bucket_name, file_path) from s3_utils.get_file_infos.
+    :param fingerprints: Dictionary of (bucket_name, file_path) -> fingerprint.
+    :return: Tuple of (file_infos still to process, reports for the skipped files).
+    """
+    pending = []
+    skipped = []
+    for bucket_name, file_path in file_infos:
+        if is_processed(cursor, s3_source_key(bucket_name, file_path), fingerprints[(bucket_name, file_path)]):
+            LOGGER.info(f'filter_unprocessed: skipping already processed file={file_path}')
+            skipped.append({'bucket': bucket_name, 'file': file_path, 'status': 'skipped'})
+        else:
+            pending.append((bucket_name, file_path))
+    return pending, skipped
+
+
+def mark_reports(connection, cursor, reports, fingerprints, commit=True):
+    """
+    Records every S3 file that was loaded successfully.
+    :param reports: Per-file reports from pipeline.iter_normalized_batches.
+    :param fingerprints: Dictionary of (bucket_name, file_path) -> fingerprint.
+    :param commit: False to leave the entries in the caller's open transaction.
+    """
+    for report in reports:
+        if report['status'] == 'ok':
+            file_info = (report['bucket'], report['file'])
+            mark_processed(connection, cursor, s3_source_key(*file_info), fingerprints[file_info], report['rows'],
+                           commit)
@@ -0,0 +1,210 @@
+# Per-stage timing for the ETL: wall time, rows, bytes and peak RSS per stage, emitted once per
+# invocation as a CloudWatch Embedded Metric Format (EMF) record.
+# Turned on with ETL_METRICS=1. When off, every hook is a single flag check and generators are
+# returned unwrapped, so the hot path pays nothing.
+
+import functools
+import inspect
+import json
+import logging
+import os
+import threading
+import time
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
+LOGGER = logging.getLogger()
+LOGGER.setLevel(logging.INFO)
+
+METRICS_ENV_VAR_NAME = 'ETL_METRICS'
+DEFAULT_NAMESPACE = 'CafeETL'
+
+_enabled = os.environ.get(METRICS_ENV_VAR_NAME, '').lower() in ('1', 'true', 'yes')
+_stats = {}  # stage -> {'seconds', 'rows', 'bytes', 'calls', 'peak_rss_bytes'}
+_lock = threading.Lock()
+# Stages can nest (transform pulls rows out of extract), so each thread keeps a stack of
+# open stages and only the innermost one is charged for the time: stage times are exclusive.
+_local = threading.local()
+
+
+def enabled():
+    return _enabled
+
+
+def set_enabled(value):
+    global _enabled
+    _enabled = value
+
+
+def reset():
+    with _lock:
+        _stats.clear()
+
+
+def get_stats():
+    with _lock:
+        return {name: dict(stats) for name, stats in _stats.items()}
+
+
+def _peak_rss_bytes():
+    if resource is None:
+        return 0
+    # ru_maxrss is in kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def add(name, rows=0, bytes=0, seconds=0.0, calls=0, peak_rss_bytes=0):
+    if not _enabled:
+        return
+    with _lock:
+        stats = _stats.get(name)
+        if stats is None:
+            stats = _stats[name] = {'seconds': 0.0, 'rows': 0, 'bytes': 0, 'calls': 0, 'peak_rss_bytes': 0}
+        stats['seconds'] += seconds
+        stats['rows'] += rows
+        stats['bytes'] += bytes
+        stats['calls'] += calls
+        stats['peak_rss_bytes'] = max(stats['peak_rss_bytes'], peak_rss_bytes)
+
+
+class _Frame:
+    """Running totals of one open stage; flushed into _stats once, when the stage ends."""
+    __slots__ = ('name', 'started', 'seconds', 'rows')
+
+    def __init__(self, name):
+        self.name = name
+        self.started = 0.0
+        self.seconds = 0.0
+        self.rows = 0
+
+    def flush(self):
+        add(self.name, rows=self.rows, seconds=self.seconds, calls=1, peak_rss_bytes=_peak_rss_bytes())
+
+
+def _stack():
+    stack = getattr(_local, 'stack', None)
+    if stack is None:
+        stack = _local.stack = []
+    return stack
+
+
+def _push(frame):
+    now = time.perf_counter()
+    stack = _stack()
+    if stack:
+        # Pause the enclosing stage
+        parent = stack[-1]
+        parent.seconds += now - parent.started
+    frame.started = now
+    stack.append(frame)
+
+
+def _pop():
+    now = time.perf_counter()
+    stack = _stack()
+    frame = stack.pop()
+    frame.seconds += now - frame.started
+    if stack:
+        # Resume the enclosing stage
+        stack[-1].started = now
+
+
+def timed_iter(name, iterable, rows=None):
+    """
+    Charges the time spent producing each item of an iterable to a stage.
+    :param rows: Function giving the rows an item stands for; defaults to one per item.
+    :return: The iterable itself when metrics are off, otherwise a wrapping generator.
+    """
+    if not _enabled:
+        return iterable
+    return _timed_iter(_Frame(name), iter(iterable), rows)
+
+
+def _timed_iter(frame, iterator, rows):
+    try:
+        while True:
+            _push(frame)
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+            finally:
+                _pop()
+            frame.rows += rows(item) if rows else 1
+            yield item
+    finally:
+        frame.flush()
+        close = getattr(iterator, 'close', None)
+        if close:
+            close()
+
+
+def timed(name, rows=None):
+    """
+    Decorator that charges a function's wall time to a stage.
+    Generator functions are timed item by item with timed_iter.
+    :param rows: Function of the result (or of each yielded item) giving the rows processed.
+    """
+    def decorator(func):
+        if inspect.isgeneratorfunction(func):
+            @functools.wraps(func)
+            def generator_wrapper(*args, **kwargs):
+                return timed_iter(name, func(*args, **kwargs), rows)
+            return generator_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return func(*args, **kwargs)
+            frame = _Frame(name)
+            _push(frame)
+            try:
+                result = func(*args, **kwargs)
+                frame.rows = rows(result) if rows else 0
+                return result
+            finally:
+                _pop()
+                frame.flush()
+        return wrapper
+    return decorator
+
+
+def build_emf_record(namespace=DEFAULT_NAMESPACE, dimensions=None):
+    """
+    Builds one EMF record with <stage>_seconds/_rows/_bytes/_peak_rss_bytes metrics per stage.
+    :param dimensions: Dictionary of dimension name -> value, e.g. {'Service': 'cafe_etl_lambda'}.
+    :return: Dictionary ready for json.dumps.
+    """
+    dimensions = dimensions or {}
+    units = {'seconds': 'Seconds', 'rows': 'Count', 'bytes': 'Bytes', 'peak_rss_bytes': 'Bytes'}
+    record = dict(dimensions)
+    metrics = []
+    for stage_name, stats in sorted(get_stats().items()):
+        for field, unit in units.items():
+            metric_name = f'{stage_name}_{field}'
+            record[metric_name] = round(stats[field], 6) if field == 'seconds' else stats[field]
+            metrics.append({'Name': metric_name, 'Unit': unit})
+    record['_aws'] = {
+        'Timestamp': int(time.time() * 1000),
+        'CloudWatchMetrics': [{
+            'Namespace': namespace,
+            'Dimensions': [list(dimensions)],
+            'Metrics': metrics,
+        }],
+    }
+    return record
+
+
+def emit(namespace=DEFAULT_NAMESPACE, dimensions=None):
+    """
+    Prints the invocation's EMF record to stdout, where CloudWatch Logs picks it up,
+    then clears the stats for the next invocation. Does nothing when metrics are off.
+    """
+    if not _enabled:
+        return
+    # print rather than LOGGER: EMF needs the JSON to be the whole log line
+    print(json.dumps(build_emf_record(namespace, dimensions)))
+    reset()
@@ -0,0 +1,193 @@
+# Parquet output for the normalized tables, for Redshift COPY ... FORMAT AS PARQUET and for
+# local analysis without re-parsing CSV.
+#
+# The ids in the tables are the batch-local ones the normalizers number from 1 in every load,
+# so every load (a file, or all the batches of one iter_normalize stream, which share a
+# load_id) goes under <out_dir>/<table_name>/load=<load_id>/ and ids only join within it. The fact
+# tables (transactions and product_transactions) are further partitioned Hive-style by
+# branch name and transaction date:
+#     transactions/load=<load_id>/branch=Leeds/date=2024-04-21/part-<uuid>.parquet
+# The partition values stay in the path only; the files hold exactly the columns
+# utils/load_utils stages, batch-local ids included. A load's files can be COPYed into those
+# staging tables and merged from there; they are not warehouse ids, so COPYing them straight
+# into the warehouse tables would clash with the IDENTITY columns and attach facts to the
+# wrong branches and products.
+# Strings are dictionary-encoded, amounts are DECIMAL(10, 2) like the warehouse columns and
+# timestamps are real TIMESTAMP values.
+#
+# pyarrow is only needed here and is not part of the Lambda package, so it is imported lazily.
+
+import logging
+import os
+from urllib.parse import quote
+import uuid
+
+import columnar
+
+LOGGER = logging.getLogger()
+LOGGER.setLevel(logging.INFO)
+
+# Snappy is what Redshift COPY and Spectrum handle best; zstd gives smaller files for local use
+DEFAULT_COMPRESSION = 'snappy'
+
+# Rows per Parquet row group; one group per file for batch-sized tables
+ROW_GROUP_SIZE = 128 * 1024
+
+PARTITIONED_TABLES = ('transactions', 'product_transactions')
+
+# Columns whose warehouse type differs from what columnar.TABLE_SCHEMAS stores in memory
+TIMESTAMP_COLUMNS = {'timestamp'}
+AMOUNT_PRECISION = 10
+AMOUNT_SCALE = 2
+
+
+def _arrow_type(pa, column_name, kind):
+    if column_name in TIMESTAMP_COLUMNS:
+        return pa.timestamp('us')
+    if kind == columnar.INT:
+        return pa.int32()
+    if kind == columnar.FLOAT:
+        return pa.decimal128(AMOUNT_PRECISION, AMOUNT_SCALE)
+    return pa.string()
+
+
+def _arrow_column(pa, column_name, kind, values):
+    """
+    :param values: A columnar column or a list of the column's values.
+    :return: pyarrow array of the column's warehouse type.
+    """
+    if column_name in TIMESTAMP_COLUMNS:
+        # etl keeps timestamps as 'YYYY-MM-DD HH:MM:SS' text, normalise_data as datetimes
+        import pyarrow.compute as pc
+        values = list(values)
+        if values and isinstance(values[0], str):
+            return pc.strptime(pa.array(values, pa.string()), format='%Y-%m-%d %H:%M:%S', unit='us')
+        return pa.array(values, pa.timestamp('us'))
+    if kind == columnar.TEXT:
+        if isinstance(values, columnar.DictColumn) and None not in values.values:
+            # Already dictionary-encoded in memory, so hand the codes over as they are
+            return pa.DictionaryArray.from_arrays(pa.array(values.codes, pa.int32()),
+                                                  pa.array(values.values, pa.string()))
+        return pa.array(list(values), pa.string()).dictionary_encode()
+    if kind == columnar.FLOAT:
+        return pa.array(list(values), pa.float64()).cast(_arrow_type(pa, column_name, kind))
+    return pa.array(list(values), _arrow_type(pa, column_name, kind))
+
+
+def to_arrow_table(table_name, data):
+    """
+    Converts a normalized table to a pyarrow Table with the warehouse column types.
+    :param data: List of row dictionaries or a columnar.ColumnarTable.
+    :return: pyarrow.Table with the columns of columnar.TABLE_SCHEMAS[table_name].
+    """
+    import pyarrow as pa
+
+    schema = columnar.TABLE_SCHEMAS[table_name]
+    if isinstance(data, columnar.ColumnarTable):
+        columns = [data.columns[name] for name, _ in schema]
+    else:
+        columns = [[row[name] for row in data] for name, _ in schema]
+    return pa.table({
+        name: _arrow_column(pa, name, kind, values) for (name, kind), values in zip(schema, columns)
+    })
+
+
+def _partition_path(branch_name, date):
+    return f'branch={quote(str(branch_name), safe="")}/date={date}'
+
+
+def partition_keys(tables, branch_names):
+    """
+    Works out the (branch name, date) partition of every transaction.
+    :param branch_names: Dictionary of branch_id -> branch name, updated from tables['branches'].
+    :return: Dictionary of payment_id -> partition path.
+    """
+    for branch in tables['branches']:
+        branch_names[branch['branch_id']] = branch['name']
+
+    column_names = ['payment_id', 'branch_id', 'timestamp']
+    # A file holds a few branches and days, so each path is only built once
+    paths = {}
+    payment_partitions = {}
+    for payment_id, branch_id, timestamp in columnar.table_rows(tables['transactions'], column_names):
+        # Both 'YYYY-MM-DD HH:MM:SS' text and datetimes start with the date once str()'d
+        key = (branch_id, timestamp[:10] if type(timestamp) is str else str(timestamp)[:10])
+        path = paths.get(key)
+        if path is None:
+            path = paths[key] = _partition_path(branch_names[branch_id], key[1])
+        payment_partitions[payment_id] = path
+    return payment_partitions
+
+
+def _write_file(pq, arrow_table, directory, compression):
+    os.makedirs(directory, exist_ok=True)
+    file_path = os.path.join(directory, f'part-{uuid.uuid4().hex}.parquet')
+    pq.write_table(arrow_table, file_path, compression=compression, use_dictionary=True,
+                   row_group_size=ROW_GROUP_SIZE)
+    return file_path
+
+
+def new_load_id():
+    return uuid.uuid4().hex
+
+
+def write_table(table_name, data, out_dir, load_id, payment_partitions=None, compression=DEFAULT_COMPRESSION):
+    """
+    Writes one normalized table under out_dir/table_name/load=<load_id>.
+    :param payment_partitions: Dictionary of payment_id -> partition path from partition_keys;
+        when given, one file is written per partition.
+    :return: List of the written file paths.
+    """
+    import pyarrow.parquet as pq
+
+    if not len(data):
+        return []
+
+    arrow_table = to_arrow_table(table_name, data)
+    table_dir = os.path.join(out_dir, table_name, f'load={load_id}')
+    if payment_partitions is None:
+        return [_write_file(pq, arrow_table, table_dir, compression)]
+
+    row_indices = {}
+    for index, payment_id in enumerate(columnar.table_rows(data, ['payment_id'])):
+        row_indices.setdefault(payment_partitions[payment_id[0]], []).append(index)
+
+    return [
+        _write_file(pq, arrow_table.take(indices), os.path.join(table_dir, partition), compression)
+        for partition, indices in row_indices.items()
+    ]
+
+
+def write_tables(tables, out_dir, branch_names=None, load_id=None, compression=DEFAULT_COMPRESSION):
+    """
+    Writes a dictionary of normalized tables (from etl.normalize, etl.iter_normalize or
+    normalise_data) as Parquet, partitioning the fact tables by branch and date.
+    Every call adds new part files, so batches and files can be written one after another.
+    :param branch_names: Dictionary shared by every batch of one load; iter_normalize only emits
+        a branch in the first batch that uses it, so later batches need its name.
+    :param load_id: Load the tables' ids belong to, shared by every batch of one
+        iter_normalize stream; defaults to a new load per call.
+    :return: List of the written file paths.
+    """
+    branch_names = {} if branch_names is None else branch_names
+    load_id = load_id or new_load_id()
+    payment_partitions = partition_keys(tables, branch_names)
+
+    file_paths = []
+    for table_name, data in tables.items():
+        partitions = payment_partitions if table_name in PARTITIONED_TABLES else None
+        file_paths.extend(write_table(table_name, data, out_dir, load_id, partitions, compression))
+    LOGGER.info(f'write_tables: wrote {len(file_paths)} files to {out_dir}')
+    return file_paths
+
+
+def read_table(out_dir, table_name):
+    """
+    Reads a table written by write_tables back, with load as an extra column, and branch
+    and date as well for the partitioned tables. Join tables on load and id.
+    :return: pyarrow.Table.
+    """
+    import pyarrow.dataset as ds
+
+    dataset = ds.dataset(os.path.join(out_dir, table_name), format='parquet', partitioning='hive')
+    return dataset.to_table()
@@ -0,0 +1,144 @@
+# Daily sales rollups for the Grafana dashboards, so panels read a few hundred summary rows
+# instead of aggregating the fact tables on every refresh.
+#
+#   daily_branch_sales   - per day, branch and payment method: revenue, transactions, items
+#   daily_product_sales  - per day, branch and product: quantity sold and revenue
+#
+# The rows of the days a load touched are recomputed from the fact tables, so a retried load
+# is never counted twice. rebuild_rollups recomputes both tables from the fact tables, for
+# the first migration and for repairs.
+#
+# Both join product_transactions to transactions on payment_id. Loads before the per-event
+# unit of work (utils/load_utils) stored batch-local payment_ids in product_transactions,
+# so on a warehouse loaded that way item_count and daily_product_sales come out wrong;
+# revenue and transaction_count only read transactions and are right.
+
+import logging
+
+LOGGER = logging.getLogger()
+LOGGER.setLevel(logging.INFO)
+
+ROLLUPS = {
+    'daily_branch_sales': {
+        'key_columns': ['sales_date', 'branch_id', 'payment_method'],
+        'value_columns': ['revenue', 'transaction_count', 'item_count'],
+    },
+    'daily_product_sales': {
+        'key_columns': ['sales_date', 'branch_id', 'product_id'],
+        'value_columns': ['quantity', 'revenue'],
+    },
+}
+
+ROLLUP_TABLES_DDL = [
+    '''
+    CREATE TABLE IF NOT EXISTS daily_branch_sales (
+        sales_date DATE NOT NULL,
+        branch_id INT NOT NULL,
+        payment_method VARCHAR(50) NOT NULL,
+        revenue NUMERIC(12, 2) NOT NULL,
+        transaction_count INT NOT NULL,
+        item_count INT NOT NULL,
+        PRIMARY KEY (sales_date, branch_id, payment_method)
+    );
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS daily_product_sales (
+        sales_date DATE NOT NULL,
+        branch_id INT NOT NULL,
+        product_id INT NOT NULL,
+        quantity INT NOT NULL,
+        revenue NUMERIC(12, 2) NOT NULL,
+        PRIMARY KEY (sales_date, branch_id, product_id)
+    );
+    ''',
+]
+
+# The daily aggregates, over everything in the fact tables
+REBUILD_QUERIES = {
+    'daily_branch_sales': '''
+        SELECT CAST(t.timestamp AS DATE), t.branch_id, t.payment_method,
+               SUM(t.total_amount), COUNT(*), COALESCE(SUM(items.item_count), 0)
+        FROM transactions t
+        LEFT JOIN (
+            SELECT payment_id, SUM(quantity) AS item_count FROM product_transactions GROUP BY payment_id
+        ) items ON items.payment_id = t.payment_id
+        GROUP BY 1, 2, 3
+    ''',
+    'daily_product_sales': '''
+        SELECT CAST(t.timestamp AS DATE), t.branch_id, pt.product_id, SUM(pt.quantity), SUM(pt.quantity * p.price)
+        FROM product_transactions pt
+        JOIN transactions t ON t.payment_id = pt.payment_id
+        JOIN products p ON p.product_id = pt.product_id
+        GROUP BY 1, 2, 3
+    ''',
+}
+
+# Session temp table of the (sales_date, branch_id) days a load touched; may hold repeats
+ROLLUP_DAYS_TABLE = 'rollup_days'
+ROLLUP_DAYS_DDL = f'DROP TABLE IF EXISTS {ROLLUP_DAYS_TABLE}; CREATE TEMP TABLE {ROLLUP_DAYS_TABLE} (sales_date DATE, branch_id INT);'
+
+# The same aggregates again, only for the days and branches listed in rollup_days
+_DAY_TRANSACTIONS = f'''
+        FROM (SELECT DISTINCT sales_date, branch_id FROM {ROLLUP_DAYS_TABLE}) d
+        JOIN transactions t ON t.branch_id = d.branch_id
+            AND t.timestamp >= d.sales_date AND t.timestamp < d.sales_date + INTERVAL '1 day'
+'''
+REFRESH_QUERIES = {
+    'daily_branch_sales': f'''
+        SELECT d.sales_date, t.branch_id, t.payment_method,
+               SUM(t.total_amount), COUNT(*), COALESCE(SUM(items.item_count), 0)
+        {_DAY_TRANSACTIONS}
+        LEFT JOIN (
+            SELECT pt.payment_id, SUM(pt.quantity) AS item_count
+            {_DAY_TRANSACTIONS}
+            JOIN product_transactions pt ON pt.payment_id = t.payment_id
+            GROUP BY pt.payment_id
+        ) items ON items.payment_id = t.payment_id
+        GROUP BY 1, 2, 3
+    ''',
+    'daily_product_sales': f'''
+        SELECT d.sales_date, t.branch_id, pt.product_id, SUM(pt.quantity), SUM(pt.quantity * p.price)
+        {_DAY_TRANSACTIONS}
+        JOIN product_transactions pt ON pt.payment_id = t.payment_id
+        JOIN products p ON p.product_id = pt.product_id
+        GROUP BY 1, 2, 3
+    ''',
+}
+
+
+def create_rollup_tables(connection, cursor):
+    # Basket figures are only right where product_transactions.payment_id was loaded
+    # correctly, see the note at the top of this file
+    LOGGER.info('create_rollup_tables: creating daily_branch_sales and daily_product_sales tables')
+    for ddl in ROLLUP_TABLES_DDL:
+        cursor.execute(ddl)
+    rebuild_rollups(connection, cursor)
+
+
+def rebuild_rollups(connection, cursor):
+    """
+    Replaces the rollups with a full aggregate of the fact tables. Safe to re-run.
+    """
+    for table_name, query in REBUILD_QUERIES.items():
+        rollup = ROLLUPS[table_name]
+        columns = ', '.join(rollup['key_columns'] + rollup['value_columns'])
+        cursor.execute(f'DELETE FROM {table_name};')
+        cursor.execute(f'INSERT INTO {table_name} ({columns}) {query};')
+    connection.commit()
+    LOGGER.info('rebuild_rollups: rebuilt daily rollups from the fact tables')
+
+
+def refresh_statements():
+    """
+    :return: Statements that recompute the rollup rows of the days in rollup_days from the fact tables.
+    """
+    statements = []
+    for table_name, query in REFRESH_QUERIES.items():
+        rollup = ROLLUPS[table_name]
+        columns = ', '.join(rollup['key_columns'] + rollup['value_columns'])
+        statements.append(
+            f'DELETE FROM {table_name} USING {ROLLUP_DAYS_TABLE} d '
+            f'WHERE {table_name}.sales_date = d.sales_date AND {table_name}.branch_id = d.branch_id;'
+        )
+        statements.append(f'INSERT INTO {table_name} ({columns}) {query};')
+    return statements
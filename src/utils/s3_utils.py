@@ -1,26 +1,144 @@
-import boto3
+import codecs
+import io
 import logging
+import threading
+from urllib.parse import unquote_plus
+
+from utils import metrics_utils
 
 LOGGER = logging.getLogger()
 LOGGER.setLevel(logging.INFO)
 
-s3_client = boto3.client('s3')
+_s3_client = None
+# Creating a client from boto3's default session is not thread-safe, and the first call
+# can come from several pipeline worker threads at once
+_s3_client_lock = threading.Lock()
+
+# Bytes pulled off the StreamingBody per read when streaming a file.
+STREAM_CHUNK_SIZE = 64 * 1024
+
+
+def get_s3_client():
+    # boto3 is imported and the client created on first use, then reused by warm invocations
+    global _s3_client
+    if _s3_client is None:
+        with _s3_client_lock:
+            if _s3_client is None:
+                import boto3
+                _s3_client = boto3.client('s3')
+    return _s3_client
 
 
 def get_file_info(event):
     LOGGER.info('get_file_info: starting')
-    first_record = event['Records'][0]
-    bucket_name = first_record['s3']['bucket']['name']
-    file_name = first_record['s3']['object']['key']
+    bucket_name, file_name = get_file_infos(event)[0]
 
     LOGGER.info(f'get_file_info: file={file_name}, bucket_name={bucket_name}')
     return bucket_name, file_name
 
 
+def get_file_infos(event):
+    """
+    Reads every object-created record in an S3 event, as S3 may batch several together.
+    Object keys arrive URL-encoded (e.g. spaces as '+') and are decoded here.
+    :param event: The S3 event passed to the Lambda handler.
+    :return: List of (bucket_name, file_name) tuples in event order.
+    """
+    records = event.get('Records') or []
+    if not records:
+        raise KeyError('No Records found in the event payload')
+
+    file_infos = [
+        (record['s3']['bucket']['name'], unquote_plus(record['s3']['object']['key']))
+        for record in records
+    ]
+    LOGGER.info(f'get_file_infos: files={len(file_infos)}')
+    return file_infos
+
+
+def get_file_fingerprints(event):
+    """
+    Identifies the exact version of every object in an S3 event without downloading it.
+    :param event: The S3 event passed to the Lambda handler.
+    :return: List of "<etag>:<size>" strings, in the same order as get_file_infos.
+    """
+    return [
+        f"{record['s3']['object'].get('eTag', '')}:{record['s3']['object'].get('size', '')}"
+        for record in event.get('Records') or []
+    ]
+
+
+@metrics_utils.timed('s3')
 def load_file(bucket_name, s3_key):
     LOGGER.info(f'load_file: loading s3_key={s3_key} from bucket_name={bucket_name}')
-    response = s3_client.get_object(Bucket=bucket_name, Key=s3_key)
-    body_text = response['Body'].read().decode('utf-8').split('\n')
+    response = get_s3_client().get_object(Bucket=bucket_name, Key=s3_key)
+    body = response['Body'].read()
+    metrics_utils.add('s3', bytes=len(body))
+    body_text = body.decode('utf-8').split('\n')
 
     LOGGER.info(f'load_file: done: s3_key={s3_key} result_chars={len(body_text)}')
     return body_text
+
+
+def iter_lines(body, chunk_size=STREAM_CHUNK_SIZE):
+    """
+    Yields decoded lines from a file-like body, reading chunk_size bytes at a time.
+    Multi-byte UTF-8 sequences split across chunks are held back by an incremental
+    decoder, and only complete lines (line endings kept) are yielded, so csv.reader
+    can re-join quoted fields that contain newlines however the chunks fall.
+    :param body: Object with a read(size) method returning bytes, e.g. a StreamingBody.
+    :param chunk_size: Number of bytes to read per chunk.
+    :return: Generator of lines as str.
+    """
+    decoder = codecs.getincrementaldecoder('utf-8')()
+    pending = ''
+    while True:
+        chunk = body.read(chunk_size)
+        if not chunk:
+            break
+        pending += decoder.decode(chunk)
+        end = pending.rfind('\n') + 1
+        if end:
+            # newline='' splits like open(newline='') does for csv
+            yield from io.StringIO(pending[:end], newline='')
+            pending = pending[end:]
+
+    pending += decoder.decode(b'', final=True)
+    if pending:
+        yield pending
+
+
+@metrics_utils.timed('s3')
+def stream_file(bucket_name, s3_key, chunk_size=STREAM_CHUNK_SIZE):
+    """
+    Streams an S3 object as decoded lines without holding the whole file in memory.
+    Feed the result straight into etl.extract.
+    :param bucket_name: Name of the S3 bucket.
+    :param s3_key: Key of the object to stream.
+    :param chunk_size: Number of bytes to read per chunk.
+    :return: Generator of lines as str.
+    """
+    LOGGER.info(f'stream_file: streaming s3_key={s3_key} from bucket_name={bucket_name}')
+    response = get_s3_client().get_object(Bucket=bucket_name, Key=s3_key)
+    body = response['Body']
+    content_length = response.get('ContentLength', 0)
+    metrics_utils.add('s3', bytes=content_length)
+    line_count = 0
+    try:
+        for line in iter_lines(body, chunk_size):
+            line_count += 1
+            yield line
+    finally:
+        body.close()
+
+    LOGGER.info(f'stream_file: done: s3_key={s3_key} result_lines={line_count} bytes={content_length}')
+
+
+def upload_text(bucket_name, s3_key, text):
+    LOGGER.info(f'upload_text: uploading s3_key={s3_key} to bucket_name={bucket_name}')
+    get_s3_client().put_object(Bucket=bucket_name, Key=s3_key, Body=text.encode('utf-8'))
+
+
+def delete_file(bucket_name, s3_key):
+    LOGGER.info(f'delete_file: deleting s3_key={s3_key} from bucket_name={bucket_name}')
+    get_s3_client().delete_object(Bucket=bucket_name, Key=s3_key)
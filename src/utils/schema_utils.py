@@ -0,0 +1,174 @@
+# Physical layout of the core tables for each warehouse dialect.
+#
+# Redshift: the small dimensions are copied to every node (DISTSTYLE ALL) and both fact tables
+# are distributed on payment_id, so the transactions/product_transactions join stays node-local.
+# transactions is sorted on (branch_id, timestamp), the order the loader writes each batch in,
+# so date and branch filters skip blocks and loads do not leave unsorted regions behind.
+#
+# Postgres: transactions is range-partitioned by month on timestamp, so date filters only
+# touch the months they ask for. The join columns of product_transactions are indexed.
+# A partitioned table's keys must include the partition column, so the primary key is
+# (payment_id, timestamp) and product_transactions cannot declare a foreign key to it.
+
+REDSHIFT = 'redshift'
+POSTGRES = 'postgresql'
+
+IDENTITY_TYPES = {
+    REDSHIFT: 'INT IDENTITY(1, 1)',
+    POSTGRES: 'SERIAL',
+}
+
+# Tables without a distkey are copied to every node
+REDSHIFT_LAYOUT = {
+    'branches': {},
+    'transactions': {'distkey': 'payment_id', 'sortkey': ['branch_id', 'timestamp']},
+    'products': {},
+    'product_transactions': {'distkey': 'payment_id', 'sortkey': ['payment_id', 'product_id']},
+}
+
+POSTGRES_INDEXES = [
+    'CREATE INDEX IF NOT EXISTS transactions_branch_timestamp_idx ON transactions (branch_id, timestamp);',
+    'CREATE INDEX IF NOT EXISTS product_transactions_payment_id_idx ON product_transactions (payment_id);',
+    'CREATE INDEX IF NOT EXISTS product_transactions_product_id_idx ON product_transactions (product_id);',
+]
+
+# Order in which each table's rows are loaded; matches the Redshift sort key
+LOAD_SORT_COLUMNS = {
+    'transactions': REDSHIFT_LAYOUT['transactions']['sortkey'],
+}
+
+# Turns an existing unpartitioned transactions table into the partitioned layout, keeping
+# every payment_id. Does nothing once transactions is partitioned, so it is safe to re-run.
+POSTGRES_PARTITION_TRANSACTIONS = '''
+    DO $$
+    DECLARE
+        month_start DATE;
+    BEGIN
+        IF (SELECT relkind FROM pg_class WHERE oid = to_regclass('transactions')) = 'r' THEN
+            ALTER TABLE product_transactions DROP CONSTRAINT IF EXISTS product_transactions_payment_id_fkey;
+            ALTER TABLE transactions RENAME TO transactions_unpartitioned;
+            ALTER TABLE transactions_unpartitioned RENAME CONSTRAINT transactions_pkey TO transactions_unpartitioned_pkey;
+            CREATE TABLE transactions (
+                payment_id SERIAL,
+                branch_id INT NOT NULL,
+                timestamp TIMESTAMP NOT NULL,
+                total_amount NUMERIC(10, 2) NOT NULL,
+                payment_method VARCHAR(50) NOT NULL,
+                PRIMARY KEY (payment_id, timestamp),
+                FOREIGN KEY (branch_id) REFERENCES branches(branch_id)
+            ) PARTITION BY RANGE (timestamp);
+            FOR month_start IN SELECT DISTINCT CAST(date_trunc('month', timestamp) AS DATE) FROM transactions_unpartitioned LOOP
+                EXECUTE format('CREATE TABLE %I PARTITION OF transactions FOR VALUES FROM (%L) TO (%L)',
+                               'transactions_' || to_char(month_start, 'YYYY_MM'),
+                               month_start, CAST(month_start + INTERVAL '1 month' AS DATE));
+            END LOOP;
+            INSERT INTO transactions SELECT * FROM transactions_unpartitioned;
+            PERFORM setval(pg_get_serial_sequence('transactions', 'payment_id'), COALESCE(MAX(payment_id), 0) + 1, false)
+                FROM transactions;
+            DROP TABLE transactions_unpartitioned;
+        END IF;
+    END $$;
+'''
+
+
+def create_table_statements(dialect):
+    """
+    :param dialect: REDSHIFT or POSTGRES, see sql_utils.get_dialect.
+    :return: List of CREATE TABLE (and, for Postgres, CREATE INDEX) statements for the core tables.
+    """
+    identity = IDENTITY_TYPES[dialect]
+    postgres = dialect == POSTGRES
+    columns = {
+        'branches': [
+            f'branch_id {identity} PRIMARY KEY',
+            'name VARCHAR(255) NOT NULL',
+            'location VARCHAR(255) NOT NULL',
+        ],
+        'transactions': [
+            f'payment_id {identity}',
+            'branch_id INT NOT NULL',
+            'timestamp TIMESTAMP NOT NULL',
+            'total_amount NUMERIC(10, 2) NOT NULL',
+            'payment_method VARCHAR(50) NOT NULL',
+            'occurrence INT NOT NULL DEFAULT 1',
+            'PRIMARY KEY (payment_id, timestamp)' if postgres else 'PRIMARY KEY (payment_id)',
+            'FOREIGN KEY (branch_id) REFERENCES branches(branch_id)',
+        ],
+        'products': [
+            f'product_id {identity} PRIMARY KEY',
+            'name VARCHAR(255) NOT NULL',
+            'variant VARCHAR(255)',
+            'size VARCHAR(50)',
+            'price NUMERIC(10, 2) NOT NULL',
+        ],
+        'product_transactions': [
+            f'product_transactions_id {identity} PRIMARY KEY',
+            'payment_id INT NOT NULL',
+            'product_id INT NOT NULL',
+            'quantity INT NOT NULL',
+            'FOREIGN KEY (product_id) REFERENCES products(product_id)',
+        ],
+    }
+    if not postgres:
+        columns['product_transactions'].append('FOREIGN KEY (payment_id) REFERENCES transactions(payment_id)')
+
+    statements = []
+    for table_name, definitions in columns.items():
+        statement = f'CREATE TABLE IF NOT EXISTS {table_name} (\n    ' + ',\n    '.join(definitions) + '\n)'
+        if not postgres:
+            statement += ' ' + _redshift_attributes(REDSHIFT_LAYOUT[table_name])
+        elif table_name == 'transactions':
+            statement += ' PARTITION BY RANGE (timestamp)'
+        statements.append(statement + ';')
+    return statements + (POSTGRES_INDEXES if postgres else [])
+
+
+def _redshift_attributes(layout):
+    if 'distkey' not in layout:
+        return 'DISTSTYLE ALL'
+    return f"DISTKEY ({layout['distkey']}) COMPOUND SORTKEY ({', '.join(layout['sortkey'])})"
+
+
+def redshift_alter_statements(table_info):
+    """
+    :param table_info: Dictionary of table name -> (diststyle, sortkey1) from svv_table_info.
+    :return: ALTER TABLE statements that move existing tables to REDSHIFT_LAYOUT.
+        svv_table_info leaves out empty tables, i.e. the ones create_db_tables has just made
+        in REDSHIFT_LAYOUT, so tables missing from table_info are taken to match it.
+    """
+    statements = []
+    for table_name, layout in REDSHIFT_LAYOUT.items():
+        if table_name not in table_info:
+            continue
+        diststyle, first_sort_column = table_info[table_name]
+        if 'distkey' not in layout:
+            if diststyle != 'ALL':
+                statements.append(f'ALTER TABLE {table_name} ALTER DISTSTYLE ALL;')
+            continue
+        if diststyle != f"KEY({layout['distkey']})":
+            statements.append(f"ALTER TABLE {table_name} ALTER DISTKEY {layout['distkey']};")
+        if first_sort_column != layout['sortkey'][0]:
+            statements.append(f"ALTER TABLE {table_name} ALTER COMPOUND SORTKEY ({', '.join(layout['sortkey'])});")
+    return statements
+
+
+def month_start(timestamp):
+    """
+    :param timestamp: 'YYYY-MM-DD HH:MM:SS' text or a datetime.
+    :return: 'YYYY-MM-01' of the timestamp's month.
+    """
+    text = timestamp if type(timestamp) is str else str(timestamp)
+    return f'{text[:7]}-01'
+
+
+def month_partition_statement(first_day):
+    """
+    :param first_day: 'YYYY-MM-01'.
+    :return: CREATE TABLE statement for that month's transactions partition.
+    """
+    year, month = int(first_day[:4]), int(first_day[5:7])
+    next_year, next_month = (year + 1, 1) if month == 12 else (year, month + 1)
+    return (
+        f'CREATE TABLE IF NOT EXISTS transactions_{year:04d}_{month:02d} PARTITION OF transactions '
+        f"FOR VALUES FROM ('{first_day}') TO ('{next_year:04d}-{next_month:02d}-01');"
+    )
@@ -2,68 +2,98 @@
 # from functions here that only care about the Connection and Cursor - this makes these easier to unit test.
 
 
-import uuid
+import csv
+import io
+import itertools
 import logging
+import os
+import uuid
+import warnings
+
+import columnar
+from utils import manifest_utils, metrics_utils, rollup_utils, s3_utils, schema_utils
 
 
 LOGGER = logging.getLogger()
 LOGGER.setLevel(logging.INFO)
 
+# Load strategies picked by get_load_strategy
+LOAD_COPY = 'copy'  # COPY ... FROM STDIN (Postgres)
+LOAD_S3_COPY = 's3_copy'  # stage CSV in S3, then COPY ... FROM 's3://...' (Redshift)
+LOAD_INSERT = 'insert'  # parameterised INSERT, works everywhere
+
+# Optional overrides; empty values mean "pick automatically"
+LOAD_STRATEGY_ENV_VAR_NAME = 'DB_LOAD_STRATEGY'
+DIALECT_ENV_VAR_NAME = 'DB_DIALECT'
+# Redshift COPY from S3 needs somewhere to stage files and a role Redshift can assume
+COPY_STAGING_BUCKET_ENV_VAR_NAME = 'COPY_STAGING_BUCKET'
+COPY_STAGING_PREFIX_ENV_VAR_NAME = 'COPY_STAGING_PREFIX'
+COPY_IAM_ROLE_ENV_VAR_NAME = 'COPY_IAM_ROLE'
+
+# Rows per multi-row INSERT statement; tune against Lambda timeout and statement size limits
+INSERT_PAGE_SIZE_ENV_VAR_NAME = 'INSERT_PAGE_SIZE'
+DEFAULT_INSERT_PAGE_SIZE = 500
+
+# Redshift still reports itself as PostgreSQL 8.0.2 (server_version 80002)
+REDSHIFT_MAX_SERVER_VERSION = 90000
+
+# Identity columns the warehouse allocates itself, so they are never loaded
+IDENTITY_COLUMNS = {
+    'branches': ['branch_id'],
+    'transactions': ['payment_id'],
+    'products': ['product_id'],
+    'product_transactions': ['product_transactions_id'],
+}
+
+# Natural keys that several rows can share: timestamps only have minute precision, so two
+# identical sales in a minute look the same. Such rows also store an occurrence, their
+# position among the rows of their batch with that key in batch-local id order. It travels
+# with the row, so re-merging a batch never depends on the order IDENTITY values come in.
+OCCURRENCE_COLUMN = 'occurrence'
+REPEATABLE_KEYS = {
+    'transactions': ['branch_id', 'timestamp', 'total_amount', 'payment_method'],
+}
+
+# Columns that identify a row without its identity column, used by the load_utils merges
+MERGE_KEYS = {
+    'branches': ['name'],
+    'transactions': REPEATABLE_KEYS['transactions'] + [OCCURRENCE_COLUMN],
+    'products': ['name', 'variant', 'size', 'price'],
+    'product_transactions': ['payment_id', 'product_id'],
+}
+NULLABLE_COLUMNS = {'variant', 'size'}
+
+# Session temp tables of batch-local -> warehouse ids (local_id, warehouse_id), written by
+# a table's merge and read by the merges of the tables that reference it
+ID_MAP_TABLES = {
+    'branches': 'branch_ids',
+    'transactions': 'payment_ids',
+    'products': 'product_ids',
+}
+REFERENCES = {
+    'transactions': {'branch_id': 'branches'},
+    'product_transactions': {'payment_id': 'transactions', 'product_id': 'products'},
+}
+
+# Bump together with the '-- schema_version:' marker in database/create_schema.sql
+# whenever the schema changes, and register the step that upgrades to it below.
+SCHEMA_VERSION = 5
+
+# Version this container has already checked, so the catalog is only queried once
+_schema_version_ready = None
+
+# Months whose transactions partition this container has already created (Postgres)
+_partitions_ready = set()
+
 
 def create_db_tables(connection, cursor):
     LOGGER.info('create_db_tables: started')
     try:
-        # Create branches table
-        LOGGER.info('create_db_tables: creating branches table')
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS branches (
-                branch_id INT IDENTITY(1, 1) PRIMARY KEY,
-                name VARCHAR(255) NOT NULL,
-                location VARCHAR(255) NOT NULL
-            );
-        ''')
-
-
-        # Create transactions table
-        LOGGER.info('create_db_tables: creating transactions table')
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS transactions (
-                payment_id INT IDENTITY(1, 1) PRIMARY KEY,
-                branch_id INT NOT NULL,
-                timestamp TIMESTAMP NOT NULL,
-                total_amount NUMERIC(10, 2) NOT NULL,
-                payment_method VARCHAR(50) NOT NULL,
-                FOREIGN KEY (branch_id) REFERENCES branches(branch_id)
-            );
-        ''')
-
-
-        # Create products table
-        LOGGER.info('create_db_tables: creating products table')
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS products (
-                product_id INT IDENTITY(1, 1) PRIMARY KEY,
-                name VARCHAR(255) NOT NULL,
-                variant VARCHAR(255),
-                size VARCHAR(50),
-                price NUMERIC(10, 2) NOT NULL
-            );
-        ''')
-
-
-        # Create product_transactions table
-        LOGGER.info('create_db_tables: creating product_transactions table')
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS product_transactions (
-                product_transactions_id INT IDENTITY(1, 1) PRIMARY KEY,
-                payment_id INT NOT NULL,
-                product_id INT NOT NULL,
-                quantity INT NOT NULL,
-                FOREIGN KEY (payment_id) REFERENCES transactions(payment_id),
-                FOREIGN KEY (product_id) REFERENCES products(product_id)
-            );
-        ''')
-
+        # Sort/dist keys on Redshift, partitioning and indexes on Postgres
+        dialect = get_dialect(connection)
+        for statement in schema_utils.create_table_statements(dialect):
+            LOGGER.info(f'create_db_tables: {dialect}: {statement.splitlines()[0]}')
+            cursor.execute(statement)
 
         LOGGER.info('create_db_tables: committing changes')
         connection.commit()
@@ -73,6 +103,115 @@ def create_db_tables(connection, cursor):
         raise ex
 
 
+def apply_physical_layout(connection, cursor):
+    """
+    Moves tables created by an earlier schema version to the layout of create_db_tables.
+    """
+    dialect = get_dialect(connection)
+    if dialect == schema_utils.POSTGRES:
+        LOGGER.info('apply_physical_layout: partitioning transactions and indexing join columns')
+        cursor.execute(schema_utils.POSTGRES_PARTITION_TRANSACTIONS)
+        for statement in schema_utils.POSTGRES_INDEXES:
+            cursor.execute(statement)
+        connection.commit()
+        return
+
+    cursor.execute(
+        'SELECT "table", diststyle, sortkey1 FROM svv_table_info WHERE "table" IN %s;',
+        (tuple(schema_utils.REDSHIFT_LAYOUT),),
+    )
+    table_info = {table_name: (diststyle, sortkey) for table_name, diststyle, sortkey in cursor.fetchall()}
+    statements = schema_utils.redshift_alter_statements(table_info)
+    # Redshift refuses ALTER DISTKEY/SORTKEY inside a transaction block
+    connection.commit()
+    connection.autocommit = True
+    try:
+        for statement in statements:
+            LOGGER.info(f'apply_physical_layout: {statement}')
+            cursor.execute(statement)
+    finally:
+        connection.autocommit = False
+
+
+def add_transaction_occurrence(connection, cursor):
+    """
+    Adds the occurrence column (REPEATABLE_KEYS) to a transactions table created before it,
+    numbering the stored sales that share a key in payment_id order.
+    """
+    cursor.execute(
+        "SELECT 1 FROM information_schema.columns WHERE table_schema = current_schema() "
+        "AND table_name = 'transactions' AND column_name = %s;",
+        (OCCURRENCE_COLUMN,),
+    )
+    if cursor.fetchone():
+        return
+    LOGGER.info('add_transaction_occurrence: numbering stored transactions')
+    cursor.execute(f'ALTER TABLE transactions ADD COLUMN {OCCURRENCE_COLUMN} INT NOT NULL DEFAULT 1;')
+    cursor.execute(occurrence_statement('transactions'))
+    connection.commit()
+
+
+def get_schema_version(connection, cursor):
+    """
+    Reads the version marker recorded in the warehouse, creating the marker table if needed.
+    :return: The recorded schema version, or 0 if none has been recorded.
+    """
+    cursor.execute('CREATE TABLE IF NOT EXISTS schema_version (version INT NOT NULL);')
+    cursor.execute('SELECT MAX(version) FROM schema_version;')
+    row = cursor.fetchone()
+    return row[0] if row and row[0] is not None else 0
+
+
+def set_schema_version(connection, cursor, version):
+    cursor.execute('DELETE FROM schema_version;')
+    cursor.execute('INSERT INTO schema_version (version) VALUES (%s);', (version,))
+    connection.commit()
+
+
+# Upgrade steps keyed by the version they bring the warehouse to.
+# Each step takes (connection, cursor) and must be safe to re-run.
+SCHEMA_MIGRATIONS = {
+    1: create_db_tables,
+    2: manifest_utils.create_manifest_table,
+    3: rollup_utils.create_rollup_tables,
+    4: apply_physical_layout,
+    5: add_transaction_occurrence,
+}
+
+
+def ensure_db_schema(connection, cursor):
+    """
+    Makes sure the warehouse schema is at SCHEMA_VERSION, at most once per container.
+    DDL is only issued when the recorded version is behind.
+    :return: True if any migration was applied.
+    """
+    global _schema_version_ready
+    if _schema_version_ready == SCHEMA_VERSION:
+        LOGGER.info(f'ensure_db_schema: schema version {SCHEMA_VERSION} already checked')
+        return False
+
+    try:
+        current_version = get_schema_version(connection, cursor)
+        LOGGER.info(f'ensure_db_schema: warehouse at version {current_version}, code at {SCHEMA_VERSION}')
+        applied = False
+        for version in sorted(SCHEMA_MIGRATIONS):
+            if current_version < version <= SCHEMA_VERSION:
+                LOGGER.info(f'ensure_db_schema: migrating to version {version}')
+                SCHEMA_MIGRATIONS[version](connection, cursor)
+                applied = True
+        if current_version < SCHEMA_VERSION:
+            set_schema_version(connection, cursor, SCHEMA_VERSION)
+        else:
+            connection.commit()
+    except Exception as ex:
+        LOGGER.error(f'ensure_db_schema: failed to check schema: {ex}')
+        connection.rollback()
+        raise ex
+
+    _schema_version_ready = SCHEMA_VERSION
+    return applied
+
+
 def create_guid():
     """
     Generate a GUID for unique identifiers (if required).
@@ -80,47 +219,274 @@ def create_guid():
     return str(uuid.uuid4())
 
 
-def save_data_in_db(connection, cursor, table_name, data):
-    
-    LOGGER.info(f'save_data_in_db: inserting into table {table_name}')
-    if not data:
-        LOGGER.info(f'save_data_in_db: no data to insert into {table_name}')
-        return
+def get_dialect(connection):
+    """
+    Works out whether the connection points at Redshift or Postgres.
+    :return: 'redshift' or 'postgresql'.
+    """
+    dialect = os.environ.get(DIALECT_ENV_VAR_NAME)
+    if dialect:
+        return dialect
+    server_version = getattr(connection, 'server_version', None)
+    if isinstance(server_version, int) and server_version >= REDSHIFT_MAX_SERVER_VERSION:
+        return 'postgresql'
+    return 'redshift'
 
 
+def get_load_strategy(connection):
+    """
+    Picks the fastest load strategy available for the connection.
+    :return: One of LOAD_COPY, LOAD_S3_COPY or LOAD_INSERT.
+    """
+    strategy = os.environ.get(LOAD_STRATEGY_ENV_VAR_NAME)
+    if strategy:
+        return strategy
+    if get_dialect(connection) == 'postgresql':
+        return LOAD_COPY
+    if os.environ.get(COPY_STAGING_BUCKET_ENV_VAR_NAME) and os.environ.get(COPY_IAM_ROLE_ENV_VAR_NAME):
+        return LOAD_S3_COPY
+    return LOAD_INSERT
+
+
+def get_columns_and_rows(table_name, data):
+    """
+    Drops the identity columns from a normalized table.
+    :param data: List of row dictionaries or a columnar.ColumnarTable.
+    :return: Tuple of (column names, iterable of row tuples).
+    """
+    excluded_columns = IDENTITY_COLUMNS.get(table_name, [])
+    columns = [key for key in columnar.table_columns(data) if key not in excluded_columns]
+    return columns, columnar.table_rows(data, columns)
+
+
+def ensure_month_partitions(cursor, data):
+    """
+    Creates the monthly transactions partitions a batch needs and this container has not
+    created yet (Postgres only).
+    :param data: Transactions rows, as dictionaries or a columnar.ColumnarTable.
+    """
+    months = {schema_utils.month_start(row[0]) for row in columnar.table_rows(data, ['timestamp'])}
+    for first_day in sorted(months - _partitions_ready):
+        LOGGER.info(f'ensure_month_partitions: month={first_day}')
+        cursor.execute(schema_utils.month_partition_statement(first_day))
+        _partitions_ready.add(first_day)
+
+
+def rows_to_csv_buffer(rows):
+    """
+    Writes rows as CSV into an in-memory buffer; None becomes an empty (NULL) field.
+    :return: io.StringIO positioned at the start.
+    """
+    buffer = io.StringIO()
+    csv.writer(buffer, lineterminator='\n').writerows(rows)
+    buffer.seek(0)
+    return buffer
+
+
+def get_insert_page_size():
+    return int(os.environ.get(INSERT_PAGE_SIZE_ENV_VAR_NAME) or DEFAULT_INSERT_PAGE_SIZE)
+
+
+def insert_rows(cursor, table_name, columns, rows, page_size=None):
+    """
+    Inserts rows as multi-row INSERT ... VALUES (...), (...) statements of page_size rows.
+    The statement is built once per table and only rebuilt for a short final page.
+    :return: Number of statements sent, i.e. round trips to the database.
+    """
+    page_size = page_size or get_insert_page_size()
+    row_placeholders = '(' + ', '.join(['%s'] * len(columns)) + ')'
+    query_prefix = f'INSERT INTO {table_name} ({", ".join(columns)}) VALUES '
+    page_query = query_prefix + ', '.join([row_placeholders] * page_size)
+
+    round_trips = 0
+    rows = iter(rows)
+    while True:
+        page = list(itertools.islice(rows, page_size))
+        if not page:
+            break
+        if len(page) < page_size:
+            page_query = query_prefix + ', '.join([row_placeholders] * len(page))
+        cursor.execute(page_query, [value for row in page for value in row])
+        round_trips += 1
+    return round_trips
+
+
+def copy_rows_from_stdin(cursor, table_name, columns, rows):
+    copy_query = f'COPY {table_name} ({", ".join(columns)}) FROM STDIN WITH (FORMAT csv)'
+    cursor.copy_expert(copy_query, rows_to_csv_buffer(rows))
+    return 1
+
+
+def copy_rows_from_s3(cursor, table_name, columns, rows):
+    bucket_name = os.environ[COPY_STAGING_BUCKET_ENV_VAR_NAME]
+    iam_role = os.environ[COPY_IAM_ROLE_ENV_VAR_NAME]
+    prefix = os.environ.get(COPY_STAGING_PREFIX_ENV_VAR_NAME, 'staging/')
+    s3_key = f'{prefix}{table_name}/{create_guid()}.csv'
+
+    s3_utils.upload_text(bucket_name, s3_key, rows_to_csv_buffer(rows).getvalue())
     try:
-        # Get column names excluding identity columns
-        if table_name == "branches":
-            excluded_columns = ["branch_id"]
-        elif table_name == "transactions":
-            excluded_columns = ["payment_id"]
-        elif table_name == "products":
-            excluded_columns = ["product_id"]
-        elif table_name == "product_transactions":
-            excluded_columns = ["product_transactions_id"]
-        else:
-            excluded_columns = []
+        cursor.execute(
+            f"COPY {table_name} ({', '.join(columns)}) FROM 's3://{bucket_name}/{s3_key}' "
+            f"IAM_ROLE '{iam_role}' FORMAT AS CSV EMPTYASNULL TIMEFORMAT 'auto';"
+        )
+    finally:
+        s3_utils.delete_file(bucket_name, s3_key)
+    return 1
+
+
+LOADERS = {
+    LOAD_COPY: copy_rows_from_stdin,
+    LOAD_S3_COPY: copy_rows_from_s3,
+    LOAD_INSERT: insert_rows,
+}
+
+
+def _key_match(left, right, key_columns):
+    # NULL = NULL is not true, so nullable key columns also match when both sides are NULL
+    conditions = []
+    for column in key_columns:
+        condition = f'{left}.{column} = {right}.{column}'
+        if column in NULLABLE_COLUMNS:
+            condition = f'({condition} OR ({left}.{column} IS NULL AND {right}.{column} IS NULL))'
+        conditions.append(condition)
+    return ' AND '.join(conditions)
+
+
+def _numbered(table_name, source, columns):
+    # columns of source, with the position of each row among those sharing its
+    # REPEATABLE_KEYS key, in identity column order
+    return (
+        f'SELECT {", ".join(columns)}, ROW_NUMBER() OVER (PARTITION BY {", ".join(REPEATABLE_KEYS[table_name])} '
+        f'ORDER BY {IDENTITY_COLUMNS[table_name][0]}) AS {OCCURRENCE_COLUMN} FROM {source}'
+    )
+
+
+def occurrence_statement(table_name):
+    """
+    :return: UPDATE statement numbering the stored rows of table_name that share a
+        REPEATABLE_KEYS key, in identity column order.
+    """
+    id_column = IDENTITY_COLUMNS[table_name][0]
+    return (
+        f'UPDATE {table_name} SET {OCCURRENCE_COLUMN} = numbered.{OCCURRENCE_COLUMN} '
+        f'FROM ({_numbered(table_name, table_name, [id_column])}) numbered '
+        f'WHERE {table_name}.{id_column} = numbered.{id_column};'
+    )
+
+
+def _staged_rows(table_name, columns):
+    # The staged rows, numbered in batch-local id order when their key can repeat
+    if table_name not in REPEATABLE_KEYS:
+        return f'{table_name}_stage'
+    return f'({_numbered(table_name, f"{table_name}_stage", columns)})'
+
 
+def stage_statement(table_name, columns):
+    """
+    :return: CREATE TEMP TABLE statement for the staging table of table_name, with its column types.
+    """
+    return f'CREATE TEMP TABLE {table_name}_stage AS SELECT {", ".join(columns)} FROM {table_name} WHERE 1 = 0;'
+
+
+def id_map_statement(table_name):
+    """
+    :return: Statements that (re)create the empty id mapping table of table_name.
+    """
+    id_map = ID_MAP_TABLES[table_name]
+    return f'DROP TABLE IF EXISTS {id_map}; CREATE TEMP TABLE {id_map} (local_id INT, warehouse_id INT);'
+
+
+def known_ids_statement(table_name, ids):
+    """
+    :param ids: Dictionary of batch-local id -> warehouse id, e.g. from dimension_utils.known_ids.
+    :return: INSERT statement adding ids to the id mapping table of table_name.
+    """
+    values = ', '.join(f'({int(local_id)}, {int(warehouse_id)})' for local_id, warehouse_id in ids.items())
+    return f'INSERT INTO {ID_MAP_TABLES[table_name]} (local_id, warehouse_id) VALUES {values};'
 
-        # Exclude identity columns from data
-        filtered_data = [
-            {key: value for key, value in row.items() if key not in excluded_columns}
-            for row in data
-        ]
+
+def remap_statement(table_name, column):
+    """
+    :return: UPDATE statement pointing a staged foreign key column at warehouse ids.
+    """
+    stage_name = f'{table_name}_stage'
+    id_map = ID_MAP_TABLES[REFERENCES[table_name][column]]
+    return (
+        f'UPDATE {stage_name} SET {column} = {id_map}.warehouse_id FROM {id_map} '
+        f'WHERE {stage_name}.{column} = {id_map}.local_id;'
+    )
 
 
-        # Generate column names and placeholders dynamically
-        columns = ', '.join(filtered_data[0].keys())
-        placeholders = ', '.join(['%s'] * len(filtered_data[0]))
-        insert_query = f'INSERT INTO {table_name} ({columns}) VALUES ({placeholders})'
+def merge_statement(table_name, columns):
+    """
+    Rows whose key can repeat (REPEATABLE_KEYS) are numbered in batch-local id order, i.e.
+    file order, and the number is stored with them, so the n-th staged row only ever
+    matches the stored row that was the n-th one of its batch.
+    :param columns: Staged column names, including the identity column with batch-local ids.
+    :return: INSERT ... SELECT statement adding the staged rows whose natural key (MERGE_KEYS)
+        is not stored yet.
+    """
+    id_column = IDENTITY_COLUMNS[table_name][0]
+    insert_columns = [column for column in columns if column != id_column]
+    if table_name in REPEATABLE_KEYS:
+        insert_columns.append(OCCURRENCE_COLUMN)
+    order_columns = schema_utils.LOAD_SORT_COLUMNS.get(table_name, []) + [id_column]
+    return (
+        f'INSERT INTO {table_name} ({", ".join(insert_columns)}) '
+        f'SELECT {", ".join(f"stage.{column}" for column in insert_columns)} '
+        f'FROM {_staged_rows(table_name, columns)} stage '
+        f'LEFT JOIN {table_name} stored ON {_key_match("stored", "stage", MERGE_KEYS[table_name])} '
+        f'WHERE stored.{id_column} IS NULL '
+        f'ORDER BY {", ".join(f"stage.{column}" for column in order_columns)};'
+    )
 
 
-        # Batch insert rows for better performance
-        rows = [tuple(row.values()) for row in filtered_data]
-        cursor.executemany(insert_query, rows)
+def record_ids_statement(table_name, columns):
+    """
+    :return: INSERT statement recording the warehouse id of every staged row in the id
+        mapping table of table_name. Run it after merge_statement.
+    """
+    id_column = IDENTITY_COLUMNS[table_name][0]
+    return (
+        f'INSERT INTO {ID_MAP_TABLES[table_name]} (local_id, warehouse_id) '
+        f'SELECT stage.{id_column}, stored.{id_column} FROM {_staged_rows(table_name, columns)} stage '
+        f'JOIN {table_name} stored ON {_key_match("stored", "stage", MERGE_KEYS[table_name])};'
+    )
+
+
+@metrics_utils.timed('load')
+def save_data_in_db(connection, cursor, table_name, data):
+    """
+    Deprecated: load the normalized tables together with load_utils.begin_load, load_batch
+    and commit_load, which merge by natural key and map the batch-local foreign keys.
+    This only appends the rows of a table that references no other, e.g. branches or
+    products; the fact tables are refused because their foreign keys mean nothing on their own.
+    """
+    warnings.warn(
+        'save_data_in_db is deprecated, load the tables with load_utils.begin_load/load_batch/commit_load',
+        DeprecationWarning, stacklevel=2
+    )
+    if table_name in REFERENCES:
+        raise ValueError(f'save_data_in_db: {table_name} references batch-local ids, load it with load_utils')
+
+    LOGGER.info(f'save_data_in_db: inserting into table {table_name}')
+    if not data:
+        LOGGER.info(f'save_data_in_db: no data to insert into {table_name}')
+        return
+
+
+    try:
+        strategy = get_load_strategy(connection)
+        columns, rows = get_columns_and_rows(table_name, data)
+        round_trips = LOADERS[strategy](cursor, table_name, columns, rows)
         connection.commit()
-        LOGGER.info(f'save_data_in_db: successfully inserted {len(filtered_data)} rows into {table_name}')
+        metrics_utils.add('load', rows=len(data))
+        LOGGER.info(
+            f'save_data_in_db: successfully inserted {len(data)} rows into {table_name} '
+            f'using {strategy}: round_trips={round_trips}'
+        )
+        return round_trips
     except Exception as ex:
         LOGGER.error(f'save_data_in_db: failed to insert data into {table_name}: {ex}')
         connection.rollback()
-        raise ex
\ No newline at end of file
+        raise ex